@@ -7,8 +7,6 @@ from utils import (
     store_course_feedback 
 )
 
-client = TestClient(fastapi_app)
-
 def process_course_data(
     codigo_nome, natureza, carga_horaria_semestral,
     carga_horaria_semanal, perfil_docente, area_tematica,
@@ -29,21 +27,22 @@ def process_course_data(
                     bibliografia_complementar, form_file, plan_file]):
             return "Por favor, preencha todos os campos e envie os arquivos."
 
-        with open(form_file.name, "rb") as f:
-            form_content = f.read()
-        with open(plan_file.name, "rb") as f:
-            plan_content = f.read()
-
-        response = client.post(
-            "/generate_course/",
-            files={
-                "form_file": (form_file.name, form_content, form_file.type),
-                "plan_file": (plan_file.name, plan_content, plan_file.type),
-            },
-        )
+        # The files are passed as open handles, so they are streamed instead of read into memory.
+        with open(form_file.name, "rb") as form_content, open(plan_file.name, "rb") as plan_content:
+            response = client.post(
+                "/generate_course/",
+                files={
+                    "form_file": (form_file.name, form_content, form_file.type),
+                    "plan_file": (plan_file.name, plan_content, plan_file.type),
+                },
+            )
 
         if response.status_code == 202:
-            return "Curso enviado com sucesso! Aguarde o processamento."
+            job = response.json()
+            return (
+                f"Curso enviado com sucesso! Job {job['job_id']} (curso {job['course_id']}); "
+                f"acompanhe o processamento em {job['status_url']}."
+            )
         else:
             return f"Erro ao enviar o curso: {response.text}"
 
@@ -118,4 +117,7 @@ with gr.Blocks(
 
     # ... (Event handlers for feedback submission, saving edited content)
 
-demo.launch()
+# Entering the client runs the startup handlers of the API (inference worker and job queue), which
+# process the submitted courses for as long as the interface is up.
+with TestClient(fastapi_app) as client:
+    demo.launch()
@@ -0,0 +1,188 @@
+######## Imports & Initializations #########
+from dataclasses import dataclass
+# Importing dataclass to declare the artifacts generated for each Nucleo Conceitual.
+
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+# Importing typing helpers for type hinting.
+
+from data_models import CursoData, MetadadosCurso, Modulo, NucleoConceitual
+# Importing data models representing the course data structure.
+
+from batch_inference import BatchInferenceEngine, DEFAULT_BATCH_SIZE
+# Importing the batching engine that sends each wave of prompts to the generator.
+
+######## ArtifactSpec Dataclass ##########
+# Declares an artifact generated for every Nucleo Conceitual: the NucleoConceitual field it
+# is stored in, how its prompt is built, its generation parameters, the artifacts whose
+# outputs its prompt consumes (read from the same NucleoConceitual), the MetadadosCurso
+# fields its prompt uses (besides the module and núcleo titles) and, optionally, how its
+# generation parameters depend on the course (e.g. max_new_tokens from the workload).
+@dataclass(frozen=True)
+class ArtifactSpec:
+    name: str
+    build_prompt: Callable[[MetadadosCurso, Modulo, NucleoConceitual], str]
+    params: Dict
+    depends_on: Tuple[str, ...] = ()
+    metadata_fields: Tuple[str, ...] = ()
+    course_params: Optional[Callable[[CursoData], Dict]] = None
+
+    def params_for(self, course_data: CursoData) -> Dict:
+        """Returns the generation parameters of the artifact for a course."""
+        return self.course_params(course_data) if self.course_params is not None else self.params
+
+######## Dependency Levels ##########
+def dependency_levels(specs: Iterable[ArtifactSpec]) -> List[List[ArtifactSpec]]:
+    """Orders the artifacts in levels: each level only depends on the previous ones.
+    specs: The artifact declarations.
+    Returns: The list of levels, each one a list of mutually independent artifacts.
+    Raises:
+        ValueError: If a dependency is unknown or the dependencies form a cycle.
+    """
+    remaining = {spec.name: spec for spec in specs}
+    for spec in remaining.values():
+        unknown = set(spec.depends_on) - set(remaining)
+        if unknown:
+            raise ValueError(f"O artefato '{spec.name}' depende de artefatos desconhecidos: {sorted(unknown)}")
+
+    levels: List[List[ArtifactSpec]] = []
+    done: Set[str] = set()
+    while remaining:
+        level = [spec for spec in remaining.values() if set(spec.depends_on) <= done]
+        if not level:
+            raise ValueError(f"Dependência circular entre os artefatos: {sorted(remaining)}")
+        levels.append(level)
+        for spec in level:
+            done.add(spec.name)
+            del remaining[spec.name]
+    return levels
+
+######## Incremental Regeneration ##########
+def carry_over_artifacts(previous: CursoData, current: CursoData, specs: Iterable[ArtifactSpec]) -> int:
+    """Copies to `current` the artifacts of `previous` whose prompt inputs did not change.
+
+    Núcleos are matched by module title and núcleo title. An artifact is carried over when the
+    metadata fields its prompt uses and its generation parameters for the course (e.g. the
+    max_new_tokens derived from the workload) are unchanged; artifacts depending on one that is not
+    carried over are regenerated by the scheduler anyway.
+    previous: The stored version of the course, with its generated artifacts.
+    current: The new version of the course, whose artifacts are filled in place.
+    specs: The artifact declarations.
+    Returns: The number of artifacts carried over.
+    """
+    specs = list(specs)
+    unchanged_specs = [
+        spec for spec in specs
+        if all(getattr(previous.metadata, field) == getattr(current.metadata, field) for field in spec.metadata_fields)
+        and spec.params_for(previous) == spec.params_for(current)
+    ]
+    if not unchanged_specs:
+        return 0
+
+    # Previous núcleos by (module title, núcleo title); repeated titles are matched in order.
+    previous_nucleos: Dict[Tuple[str, str], List[NucleoConceitual]] = {}
+    for modulo in previous.modulos:
+        for nucleo_conceitual in modulo.nucleos_conceituais:
+            previous_nucleos.setdefault((modulo.titulo, nucleo_conceitual.titulo), []).append(nucleo_conceitual)
+
+    carried = 0
+    for modulo in current.modulos:
+        for nucleo_conceitual in modulo.nucleos_conceituais:
+            matches = previous_nucleos.get((modulo.titulo, nucleo_conceitual.titulo))
+            if not matches:
+                continue
+            previous_nucleo = matches.pop(0)
+            for spec in unchanged_specs:
+                text = getattr(previous_nucleo, spec.name)
+                if text is not None and getattr(nucleo_conceitual, spec.name) is None:
+                    setattr(nucleo_conceitual, spec.name, text)
+                    carried += 1
+    return carried
+
+######## ArtifactScheduler Class ##########
+class ArtifactScheduler:
+    """Generates the artifacts of every Nucleo Conceitual of a course following their dependencies.
+
+    The artifacts of a level are independent, so all their prompts (for every núcleo of the
+    course) are sent to the generator together; the next level only starts once the outputs it
+    consumes are stored on the núcleos. An artifact is generated only if it is missing, or if one
+    of its dependencies was (re)generated in the same run, so nothing is generated twice.
+    """
+
+    def __init__(self, specs: Iterable[ArtifactSpec]):
+        self.specs = list(specs)
+        self.levels = dependency_levels(self.specs)
+
+    def plan(self, course_data: CursoData) -> Set[Tuple[int, int, str]]:
+        """Lists the artifacts a run would generate: the missing ones and everything downstream of them.
+        course_data: The course data containing metadata and modules.
+        Returns: The set of (module index, núcleo index, artifact name) to be generated.
+        """
+        planned: Set[Tuple[int, int, str]] = set()
+        for modulo_index, modulo in enumerate(course_data.modulos):
+            for nucleo_index, nucleo_conceitual in enumerate(modulo.nucleos_conceituais):
+                for level in self.levels:
+                    for spec in level:
+                        upstream_changed = any(
+                            (modulo_index, nucleo_index, dependency) in planned for dependency in spec.depends_on
+                        )
+                        if getattr(nucleo_conceitual, spec.name) is None or upstream_changed:
+                            planned.add((modulo_index, nucleo_index, spec.name))
+        return planned
+
+    async def run(
+        self,
+        course_data: CursoData,
+        generator,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        use_cache: bool = True,
+        on_result: Optional[Callable[[int, int, str, str], None]] = None,
+        on_progress: Optional[Callable[[int, int], None]] = None
+    ) -> int:
+        """Generates the missing artifacts of the course, writing each result to its núcleo.
+        course_data: The course data containing metadata and modules.
+        generator: An InferenceWorker, or a text generation pipeline.
+        batch_size: Maximum number of prompts sent to a plain pipeline in a single call.
+        use_cache: When False, the generation cache is bypassed and refreshed with the new results.
+        on_result: Optional callback called with (module index, núcleo index, artifact name, text).
+        on_progress: Optional callback called with (núcleos done, total núcleos) whenever a núcleo is complete.
+        Returns: The number of artifacts generated.
+        """
+        engine = BatchInferenceEngine(generator, batch_size=batch_size, use_cache=use_cache)
+        metadata = course_data.metadata
+        planned = self.plan(course_data)
+
+        # Artifacts still to be generated per núcleo, to report the progress in núcleos.
+        remaining: Dict[Tuple[int, int], int] = {}
+        for modulo_index, nucleo_index, _ in planned:
+            remaining[(modulo_index, nucleo_index)] = remaining.get((modulo_index, nucleo_index), 0) + 1
+        total_nucleos = sum(len(modulo.nucleos_conceituais) for modulo in course_data.modulos)
+        progress = {"done": total_nucleos - len(remaining)}
+        if on_progress is not None:
+            on_progress(progress["done"], total_nucleos)
+
+        def store(modulo_index: int, nucleo_index: int, nucleo_conceitual: NucleoConceitual, name: str):
+            def callback(text: str):
+                setattr(nucleo_conceitual, name, text)
+                if on_result is not None:
+                    on_result(modulo_index, nucleo_index, name, text)
+                remaining[(modulo_index, nucleo_index)] -= 1
+                if remaining[(modulo_index, nucleo_index)] == 0:
+                    progress["done"] += 1
+                    if on_progress is not None:
+                        on_progress(progress["done"], total_nucleos)
+            return callback
+
+        params = {spec.name: spec.params_for(course_data) for spec in self.specs}
+        for level in self.levels:
+            for modulo_index, modulo in enumerate(course_data.modulos):
+                for nucleo_index, nucleo_conceitual in enumerate(modulo.nucleos_conceituais):
+                    for spec in level:
+                        if (modulo_index, nucleo_index, spec.name) not in planned:
+                            continue
+                        engine.add(
+                            spec.build_prompt(metadata, modulo, nucleo_conceitual),
+                            params[spec.name],
+                            store(modulo_index, nucleo_index, nucleo_conceitual, spec.name)
+                        )
+            await engine.flush()
+        return len(planned)
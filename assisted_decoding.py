@@ -0,0 +1,142 @@
+######## Imports & Initializations #########
+import os
+# Importing os to read the assisted decoding configuration from the environment.
+
+import time
+# Importing time to measure the latency of the assisted generations.
+
+import logging
+# Importing logging to report the loading of the draft model.
+
+from typing import Any, Dict, List, Optional, Union
+# Importing typing helpers for type hinting.
+
+from prefix_cache import PIPELINE_ONLY_PARAMS
+# Importing the pipeline arguments that model.generate does not accept.
+
+from inference_worker import ASSISTED_PARAM, bind_prompt_length
+# Importing the generation parameter requesting assisted decoding, and the helper starting the stop
+# criteria after the prompt (assisted steps add several tokens at once).
+
+###### Assisted Decoding Configuration ######
+# The draft model proposing tokens for the main model to verify (disabled when empty). It must share
+# the tokenizer of the main model (e.g. a small model of the same family), and the artifacts generated
+# with it, as a comma-separated list of artifact names.
+ASSISTANT_MODEL_ID = os.environ.get("EDU_ASSISTANT_MODEL_ID", "")
+ASSISTED_ARTIFACTS = tuple(
+    artifact.strip() for artifact in os.environ.get(
+        "EDU_ASSISTED_ARTIFACTS", "conteudo,video_script,teleprompter_text"
+    ).split(",") if artifact.strip()
+)
+
+def load_assistant_model(model_id: str, device):
+    """Loads the draft model on the device of the main model."""
+    from transformers import AutoModelForCausalLM
+    logging.info("Loading draft model %s for assisted decoding", model_id)
+    model = AutoModelForCausalLM.from_pretrained(model_id)
+    model.to(device)
+    model.eval()
+    return model
+
+######## AssistedGenerator Class ##########
+class AssistedGenerator:
+    """Wraps a text generation pipeline (or a PrefixCachingGenerator) to decode some calls with a draft model.
+
+    Calls carrying the `assisted` parameter (whose value names the statistics they are counted in,
+    e.g. the artifact) run one prompt at a time through model.generate with the draft model as
+    assistant: the draft proposes a few tokens, the main model verifies them all in one forward pass
+    and keeps the longest prefix it agrees with, plus one token of its own. With greedy decoding the
+    output is identical to the baseline; with sampling it follows the same distribution. Other calls
+    go to the wrapped generator unchanged (assisted calls do not reuse its cached prompt prefixes).
+
+    The acceptance statistics are counted with forward hooks: each main model pass yields one token
+    of its own, so the accepted draft tokens are the new tokens minus the main model passes, and
+    each draft pass proposes one token.
+    """
+
+    def __init__(self, generator, assistant_model):
+        self.generator = generator
+        self.assistant_model = assistant_model
+        self._counting = False
+        self._passes = {"target": 0, "draft": 0}
+        self._stats: Dict[str, Dict[str, float]] = {}
+        self.model.register_forward_hook(self._count_pass("target"))
+        self.assistant_model.register_forward_hook(self._count_pass("draft"))
+
+    @property
+    def model(self):
+        return self.generator.model
+
+    @property
+    def tokenizer(self):
+        return self.generator.tokenizer
+
+    def _count_pass(self, name: str):
+        def hook(module, inputs, outputs):
+            if self._counting:
+                self._passes[name] += 1
+        return hook
+
+    def _generate(self, prompt: str, params: Dict) -> str:
+        import torch
+        input_ids = self.tokenizer(prompt, return_tensors="pt")["input_ids"].to(self.model.device)
+        # The assisted marker only names the statistics: model.generate rejects unknown arguments.
+        generate_params = bind_prompt_length({
+            key: value for key, value in params.items() if key not in PIPELINE_ONLY_PARAMS and key != ASSISTED_PARAM
+        }, input_ids.shape[1])
+        self._passes = {"target": 0, "draft": 0}
+        self._counting = True
+        start = time.perf_counter()
+        try:
+            with torch.no_grad():
+                outputs = self.model.generate(
+                    input_ids=input_ids,
+                    attention_mask=torch.ones_like(input_ids),
+                    assistant_model=self.assistant_model,
+                    pad_token_id=self.tokenizer.pad_token_id,
+                    **generate_params
+                )
+        finally:
+            self._counting = False
+        self._record(params[ASSISTED_PARAM], outputs.shape[1] - input_ids.shape[1], time.perf_counter() - start)
+        completion = self.tokenizer.decode(outputs[0][input_ids.shape[1]:], skip_special_tokens=True)
+        return prompt + completion if params.get("return_full_text", True) else completion
+
+    def _record(self, name: str, new_tokens: int, seconds: float):
+        stats = self._stats.setdefault(
+            name, {"calls": 0, "new_tokens": 0, "target_passes": 0, "draft_tokens": 0, "accepted_tokens": 0, "seconds": 0.0}
+        )
+        stats["calls"] += 1
+        stats["new_tokens"] += new_tokens
+        stats["target_passes"] += self._passes["target"]
+        stats["draft_tokens"] += self._passes["draft"]
+        stats["accepted_tokens"] += max(new_tokens - self._passes["target"], 0)
+        stats["seconds"] += seconds
+
+    def __call__(self, prompts: Union[str, List[str]], **params) -> List:
+        if params.get(ASSISTED_PARAM) is None:
+            params.pop(ASSISTED_PARAM, None)
+            return self.generator(prompts, **params)
+        # Assisted generation verifies the draft tokens of a single sequence at a time.
+        if isinstance(prompts, str):
+            return [{'generated_text': self._generate(prompts, params)}]
+        return [[{'generated_text': self._generate(prompt, params)}] for prompt in prompts]
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns the acceptance statistics per assisted artifact, and those of the wrapped generator."""
+        assisted = {}
+        for name, stats in self._stats.items():
+            assisted[name] = {
+                **stats,
+                "acceptance_rate": stats["accepted_tokens"] / stats["draft_tokens"] if stats["draft_tokens"] else None,
+                "tokens_per_target_pass": stats["new_tokens"] / stats["target_passes"] if stats["target_passes"] else None,
+                "seconds_per_call": stats["seconds"] / stats["calls"],
+            }
+        wrapped = self.generator.stats() if hasattr(self.generator, "stats") else None
+        return {"assisted_decoding": assisted, "wrapped": wrapped}
+
+def with_assistant(generator, assistant_model_id: Optional[str] = ASSISTANT_MODEL_ID):
+    """Wraps a loaded generator for assisted decoding when a draft model is configured."""
+    if not assistant_model_id:
+        return generator
+    return AssistedGenerator(generator, load_assistant_model(assistant_model_id, generator.model.device))
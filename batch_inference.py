@@ -0,0 +1,86 @@
+######## Imports & Initializations #########
+from dataclasses import dataclass
+# Importing dataclass to describe the prompts waiting to be sent to the model.
+
+from typing import Callable, Dict, List, Tuple
+# Importing typing helpers for type hinting.
+
+import asyncio
+# Importing asyncio to send the groups of prompts to the generator concurrently.
+
+import logging
+# Importing logging to report the size of each group sent to the model.
+
+from generation_cache import generate_texts_cached
+# Importing the helper that runs prompts through the inference worker (or a plain pipeline), skipping the cached ones.
+
+# Default number of prompts sent to the text generation pipeline in a single forward pass.
+DEFAULT_BATCH_SIZE = 8
+
+######## PendingPrompt Dataclass ##########
+# A prompt waiting for generation, the parameters it must be generated with and the
+# callback that writes the generated text back to its destination (e.g. a Nucleo Conceitual).
+@dataclass
+class PendingPrompt:
+    prompt: str
+    params: Dict
+    on_result: Callable[[str], None]
+
+######## BatchInferenceEngine Class ##########
+class BatchInferenceEngine:
+    """Collects the pending prompts of a course and sends them to the generator in batches.
+
+    Prompts are grouped by their generation parameters, since a single pipeline call can only
+    use one set of parameters, and each group is split into padded batches of `batch_size`.
+    The generator may be a plain pipeline or an InferenceWorker, which batches the queued
+    prompts on its own thread. Cached prompts never reach the generator unless `use_cache` is False.
+    """
+
+    def __init__(self, generator, batch_size: int = DEFAULT_BATCH_SIZE, use_cache: bool = True):
+        if batch_size < 1:
+            raise ValueError("batch_size deve ser maior que zero.")
+        self.generator = generator
+        self.batch_size = batch_size
+        self.use_cache = use_cache
+        self._pending: List[PendingPrompt] = []
+
+    def add(self, prompt: str, params: Dict, on_result: Callable[[str], None]):
+        """Adds a prompt to the queue of pending generations.
+        prompt: The prompt to be sent to the generator.
+        params: The generation parameters (e.g. max_new_tokens, temperature).
+        on_result: Callback receiving the generated text.
+        """
+        self._pending.append(PendingPrompt(prompt, dict(params), on_result))
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def _group_by_params(self) -> Dict[Tuple, List[PendingPrompt]]:
+        groups: Dict[Tuple, List[PendingPrompt]] = {}
+        for pending in self._pending:
+            key = tuple(sorted(pending.params.items()))
+            groups.setdefault(key, []).append(pending)
+        return groups
+
+    async def _run_group(self, pending_prompts: List[PendingPrompt]):
+        """Generates a group of prompts sharing the same parameters and delivers the results."""
+        params = pending_prompts[0].params
+        logging.info("Generating %d prompts with parameters %s", len(pending_prompts), params)
+        texts = await generate_texts_cached(
+            self.generator,
+            [pending.prompt for pending in pending_prompts],
+            params,
+            batch_size=self.batch_size,
+            use_cache=self.use_cache
+        )
+        for pending, text in zip(pending_prompts, texts):
+            pending.on_result(text)
+
+    async def flush(self) -> int:
+        """Generates every pending prompt and delivers the results to their callbacks.
+        Returns: The number of prompts processed.
+        """
+        groups = self._group_by_params()
+        self._pending = []
+        await asyncio.gather(*(self._run_group(group) for group in groups.values()))
+        return sum(len(group) for group in groups.values())
@@ -0,0 +1,81 @@
+######## Imports & Initializations #########
+import os
+import sys
+# Importing os and sys to import the application modules from the repository root.
+
+import json
+# Importing json to write the results.
+
+import time
+# Importing time to measure the latency of each artifact.
+
+import argparse
+# Importing argparse to choose the main and draft models and the workload.
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from assisted_decoding import AssistedGenerator, load_assistant_model
+# Importing the assisted decoding wrapper used by the model registry.
+
+from inference_worker import ASSISTED_PARAM, prepare_generator_for_batching
+# Importing the assisted decoding request and the pipeline preparation of the inference worker.
+
+######## Workload ##########
+# Prompts shaped like the artifact prompts: course context, instruction, then the núcleo.
+PROMPTS = [
+    f"### Materiais educacionais de um curso universitário.\n**Nome do Curso:** {course}\n"
+    f"**Título do Módulo:** {module}\n### Gere um conteúdo educacional sobre o Núcleo Conceitual: {nucleo}\n\n## Introdução\n"
+    for course, module, nucleo in [
+        ("Redes de Computadores", "Camada de enlace", "Ethernet e quadros"),
+        ("Cálculo I", "Limites", "Limites laterais"),
+        ("Biologia Celular", "Membrana plasmática", "Transporte ativo"),
+        ("História do Brasil", "República Velha", "A política do café com leite"),
+    ]
+]
+
+def run(generator, params: dict):
+    """Generates every prompt one at a time. Returns: the texts and the mean latency in seconds."""
+    texts, elapsed = [], 0.0
+    for prompt in PROMPTS:
+        start = time.perf_counter()
+        texts.append(generator(prompt, **params)[0]['generated_text'])
+        elapsed += time.perf_counter() - start
+    return texts, elapsed / len(PROMPTS)
+
+######## Main ##########
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compares greedy decoding with and without a draft model.")
+    parser.add_argument("--model", default="HuggingFaceTB/SmolLM2-360M-Instruct")
+    parser.add_argument("--assistant", default="HuggingFaceTB/SmolLM2-135M-Instruct", help="Draft model sharing the tokenizer of --model.")
+    parser.add_argument("--max-new-tokens", type=int, default=128)
+    parser.add_argument("--json", help="Also writes the results to this file.")
+    args = parser.parse_args()
+
+    from transformers import pipeline
+    baseline = prepare_generator_for_batching(pipeline('text-generation', model=args.model))
+    assisted = AssistedGenerator(baseline, load_assistant_model(args.assistant, baseline.model.device))
+
+    params = {"max_new_tokens": args.max_new_tokens, "do_sample": False, "return_full_text": False}
+    # The first call of each mode warms the models up and is not measured.
+    run(baseline, {**params, "max_new_tokens": 4})
+    baseline_texts, baseline_latency = run(baseline, params)
+    run(assisted, {**params, "max_new_tokens": 4, ASSISTED_PARAM: "warm-up"})
+    assisted_texts, assisted_latency = run(assisted, {**params, ASSISTED_PARAM: "benchmark"})
+
+    stats = assisted.stats()["assisted_decoding"]["benchmark"]
+    results = {
+        "model": args.model,
+        "assistant": args.assistant,
+        "baseline_seconds_per_artifact": round(baseline_latency, 3),
+        "assisted_seconds_per_artifact": round(assisted_latency, 3),
+        "speedup": round(baseline_latency / assisted_latency, 2),
+        "identical_outputs": sum(1 for a, b in zip(baseline_texts, assisted_texts) if a == b),
+        "prompts": len(PROMPTS),
+        "acceptance_rate": stats["acceptance_rate"],
+        "tokens_per_target_pass": stats["tokens_per_target_pass"],
+    }
+    for name, value in results.items():
+        print(f"{name:>32}: {value}")
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
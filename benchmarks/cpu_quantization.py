@@ -0,0 +1,151 @@
+######## Imports & Initializations #########
+import os
+import sys
+# Importing os and sys to import the application modules from the repository root.
+
+import json
+# Importing json to write the results.
+
+import math
+# Importing math to derive the perplexity from the loss.
+
+import time
+# Importing time to measure the loads and the generations.
+
+import argparse
+# Importing argparse to choose the model, the threads and the workload.
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from cpu_inference import (
+    CPU_INTRA_OP_THREADS,
+    load_cpu_pipeline,
+    memory_report,
+    QUANTIZATION_NONE,
+    QUANTIZATION_DYNAMIC_INT8,
+)
+# Importing the CPU pipeline loader, its default thread count and the memory report used by the cpu backends.
+
+######## Workload ##########
+# Prompts shaped like the artifact prompts (course context, instruction, núcleo), and reference texts
+# whose perplexity measures how much the quantization degrades the model.
+PROMPTS = [
+    f"### Materiais educacionais de um curso universitário.\n**Nome do Curso:** {course}\n"
+    f"**Título do Módulo:** {module}\n### Gere um conteúdo educacional sobre o Núcleo Conceitual: {nucleo}\n\n## Introdução\n"
+    for course, module, nucleo in [
+        ("Redes de Computadores", "Camada de enlace", "Ethernet e quadros"),
+        ("Cálculo I", "Limites", "Limites laterais"),
+        ("Biologia Celular", "Membrana plasmática", "Transporte ativo"),
+        ("História do Brasil", "República Velha", "A política do café com leite"),
+    ]
+]
+REFERENCE_TEXTS = [
+    "A camada de enlace é responsável por transferir quadros entre nós vizinhos de uma rede, detectando e, "
+    "em alguns casos, corrigindo erros ocorridos na camada física.",
+    "O limite lateral de uma função descreve o valor do qual a função se aproxima quando a variável tende a "
+    "um ponto apenas pela esquerda ou apenas pela direita.",
+    "No transporte ativo, a célula gasta energia, geralmente na forma de ATP, para mover substâncias contra o "
+    "seu gradiente de concentração através da membrana plasmática.",
+    "The quick brown fox jumps over the lazy dog while the students take notes about the lecture.",
+]
+
+######## Measurements ##########
+def measure_throughput(generator, max_new_tokens: int, repeat: int):
+    """Generates every prompt greedily. Returns: new tokens per second, and the generated token ids."""
+    tokenizer = generator.tokenizer
+    outputs = []
+    new_tokens = 0
+    elapsed = 0.0
+    for _ in range(repeat):
+        outputs = []
+        for prompt in PROMPTS:
+            input_ids = tokenizer(prompt, return_tensors="pt")["input_ids"]
+            start = time.perf_counter()
+            generated = generator.model.generate(
+                input_ids, max_new_tokens=max_new_tokens, do_sample=False, pad_token_id=tokenizer.eos_token_id
+            )
+            elapsed += time.perf_counter() - start
+            completion = generated[0, input_ids.shape[1]:].tolist()
+            new_tokens += len(completion)
+            outputs.append(completion)
+    return new_tokens / elapsed, outputs
+
+def measure_accuracy(generator):
+    """Returns the perplexity on the reference texts and the greedy next-token predictions of each text."""
+    import torch
+    tokenizer = generator.tokenizer
+    total_loss, total_tokens = 0.0, 0
+    predictions = []
+    with torch.no_grad():
+        for text in REFERENCE_TEXTS:
+            input_ids = tokenizer(text, return_tensors="pt")["input_ids"]
+            outputs = generator.model(input_ids, labels=input_ids)
+            tokens = input_ids.shape[1] - 1
+            total_loss += outputs.loss.item() * tokens
+            total_tokens += tokens
+            predictions.append(outputs.logits[0, :-1].argmax(dim=-1).tolist())
+    return math.exp(total_loss / total_tokens), predictions
+
+def agreement(reference, candidate) -> float:
+    """Fraction of positions where two lists of token sequences agree."""
+    same = total = 0
+    for first, second in zip(reference, candidate):
+        total += max(len(first), len(second))
+        same += sum(1 for a, b in zip(first, second) if a == b)
+    return same / total if total else 1.0
+
+def run_mode(model_id: str, quantization: str, threads: int, max_new_tokens: int, repeat: int) -> dict:
+    start = time.perf_counter()
+    generator = load_cpu_pipeline(model_id, quantization, threads)
+    load_seconds = time.perf_counter() - start
+    memory = memory_report(generator)
+    # The first generation pays for the lazy initializations (e.g. the quantized kernels), so it is not measured.
+    generator.model.generate(generator.tokenizer("Olá", return_tensors="pt")["input_ids"], max_new_tokens=4,
+                             do_sample=False, pad_token_id=generator.tokenizer.eos_token_id)
+    tokens_per_second, outputs = measure_throughput(generator, max_new_tokens, repeat)
+    perplexity, predictions = measure_accuracy(generator)
+    return {
+        "quantization": quantization,
+        "load_seconds": round(load_seconds, 2),
+        "weights_mb": memory["weights_mb"],
+        "process_rss_mb": memory["process_rss_mb"],
+        "tokens_per_second": round(tokens_per_second, 2),
+        "perplexity": round(perplexity, 3),
+        "_outputs": outputs,
+        "_predictions": predictions,
+    }
+
+######## Main ##########
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Compares the fp32 and dynamic int8 CPU backends on a small model: memory, throughput and accuracy."
+    )
+    parser.add_argument("--model", default="HuggingFaceTB/SmolLM2-135M-Instruct", help="A small causal LM to compare on.")
+    parser.add_argument("--threads", type=int, default=0, help="Intra-op threads (all available cores by default).")
+    parser.add_argument("--max-new-tokens", type=int, default=64)
+    parser.add_argument("--repeat", type=int, default=2)
+    parser.add_argument("--json", help="Also writes the results to this file.")
+    args = parser.parse_args()
+
+    # The modes run one after the other in this process, so process_rss_mb also holds what the previous
+    # mode left allocated; weights_mb is the exact size of each model.
+    results = [
+        run_mode(args.model, quantization, args.threads or CPU_INTRA_OP_THREADS, args.max_new_tokens, args.repeat)
+        for quantization in (QUANTIZATION_NONE, QUANTIZATION_DYNAMIC_INT8)
+    ]
+    baseline = results[0]
+    baseline_outputs, baseline_predictions = baseline["_outputs"], baseline["_predictions"]
+    for result in results:
+        # Accuracy relative to fp32: agreement of the greedy completions and of the next-token predictions.
+        result["greedy_agreement"] = round(agreement(baseline_outputs, result.pop("_outputs")), 3)
+        result["next_token_agreement"] = round(agreement(baseline_predictions, result.pop("_predictions")), 3)
+        result["speedup"] = round(result["tokens_per_second"] / baseline["tokens_per_second"], 2)
+
+    columns = ["quantization", "load_seconds", "weights_mb", "process_rss_mb", "tokens_per_second",
+               "speedup", "perplexity", "greedy_agreement", "next_token_agreement"]
+    print(" ".join(f"{column:>20}" for column in columns))
+    for result in results:
+        print(" ".join(f"{str(result[column]):>20}" for column in columns))
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"model": args.model, "results": results}, f, indent=2)
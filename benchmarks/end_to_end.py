@@ -0,0 +1,245 @@
+######## Imports & Initializations #########
+import os
+import sys
+# Importing os and sys to isolate the benchmark storage and to import the application modules.
+
+import io
+# Importing io to hand the synthetic documents to the extractors as files.
+
+import json
+# Importing json to write the results.
+
+import time
+# Importing time to measure the stages and the requests.
+
+import asyncio
+# Importing asyncio to run the generation and the concurrent requests.
+
+import platform
+# Importing platform to record the environment of the results.
+
+import argparse
+# Importing argparse to configure the courses and the load.
+
+import statistics
+# Importing statistics to summarize the timings.
+
+import subprocess
+# Importing subprocess to record the commit the results belong to.
+
+import tempfile
+# Importing tempfile to keep the benchmark caches and databases out of the working directory.
+
+from datetime import datetime
+# Importing datetime to timestamp the results.
+
+from typing import Callable, Dict, List, Optional
+# Importing typing helpers for type hinting.
+
+REPOSITORY_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, REPOSITORY_ROOT)
+
+# The benchmark uses the deterministic stub generator and its own caches and databases, so it never
+# loads a model, never reuses earlier results and leaves the working directory untouched. These
+# must be set before the application modules read their configuration.
+BENCHMARK_DIR = tempfile.mkdtemp(prefix="edu-benchmark-")
+os.environ.setdefault("EDU_MODEL_BACKEND", "stub")
+os.environ.setdefault("EDU_COURSES_DB", os.path.join(BENCHMARK_DIR, "courses.db"))
+os.environ.setdefault("EDU_JOBS_DB", os.path.join(BENCHMARK_DIR, "jobs.db"))
+os.environ.setdefault("EDU_GENERATION_CACHE_DIR", os.path.join(BENCHMARK_DIR, "generation"))
+os.environ.setdefault("EDU_EXTRACTION_CACHE_DIR", os.path.join(BENCHMARK_DIR, "extraction"))
+os.environ.setdefault("EDU_BULK_INGESTION_ROOT", os.path.join(BENCHMARK_DIR, "ingestion"))
+
+from synthetic_courses import CourseShape, build_form, build_plan
+# Importing the synthetic form and plan documents.
+
+from data_extraction import (
+    extract_text_from_pdf,
+    extract_text_from_docx,
+    extract_course_metadata,
+    extract_modulos,
+    build_course_metadata,
+    shutdown_extraction_pool,
+)
+# Importing the extraction, parsing and validation stages.
+
+from data_models import CursoData, Modulo, NucleoConceitual
+# Importing data models representing the course data structure.
+
+from model_registry import StubGenerator
+# Importing the deterministic stub generator.
+
+from utils import process_and_generate_content, store_course_data
+# Importing the generation and storage stages.
+
+######## Timing Helpers ##########
+def summarize(samples: List[float]) -> Dict[str, float]:
+    """Summarizes durations in seconds as milliseconds."""
+    ordered = sorted(samples)
+    def percentile(fraction: float) -> float:
+        return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+    return {
+        "count": len(ordered),
+        "min_ms": round(ordered[0] * 1000, 3),
+        "median_ms": round(statistics.median(ordered) * 1000, 3),
+        "mean_ms": round(statistics.mean(ordered) * 1000, 3),
+        "p95_ms": round(percentile(0.95) * 1000, 3),
+        "max_ms": round(ordered[-1] * 1000, 3),
+    }
+
+def timed(samples: Dict[str, List[float]], stage: str, function: Callable, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    samples.setdefault(stage, []).append(time.perf_counter() - start)
+    return result
+
+async def timed_async(samples: Dict[str, List[float]], stage: str, coroutine):
+    start = time.perf_counter()
+    result = await coroutine
+    samples.setdefault(stage, []).append(time.perf_counter() - start)
+    return result
+
+######## Stage Benchmark ##########
+async def run_stages(shape: CourseShape, form_format: str, repeat: int) -> Dict[str, Dict[str, float]]:
+    """Runs every stage of a course `repeat` times, each time on a new course, timing each stage."""
+    samples: Dict[str, List[float]] = {}
+    generator = StubGenerator("benchmark")
+    for index in range(repeat):
+        form, plan = build_form(index, shape, form_format), build_plan(index, shape)
+        if form_format == "docx":
+            form_text = timed(samples, "extract_text_from_docx", extract_text_from_docx, io.BytesIO(form))
+        else:
+            form_text = timed(samples, "extract_text_from_pdf (form)", extract_text_from_pdf, io.BytesIO(form))
+        plan_text = timed(samples, "extract_text_from_pdf", extract_text_from_pdf, io.BytesIO(plan))
+        metadata = timed(samples, "extract_course_metadata", extract_course_metadata, form_text)
+        modulos = timed(samples, "extract_modulos", extract_modulos, plan_text)
+        course_metadata = timed(samples, "validation", build_course_metadata, metadata)
+
+        course_data = CursoData(metadata=course_metadata, modulos=[
+            Modulo(titulo=m['titulo'], nucleos_conceituais=[NucleoConceitual(**nc) for nc in m['nucleos_conceituais']])
+            for m in modulos
+        ])
+        nucleos = sum(len(modulo.nucleos_conceituais) for modulo in course_data.modulos)
+        if nucleos != shape.modules * shape.nucleos:
+            raise RuntimeError(f"O plano sintético tem {nucleos} núcleos, {shape.modules * shape.nucleos} esperados.")
+        await timed_async(samples, "process_and_generate_content",
+                          process_and_generate_content(course_data, generator, use_cache=False))
+        await timed_async(samples, "store_course_data", store_course_data(course_data))
+    return {stage: summarize(durations) for stage, durations in samples.items()}
+
+######## Load Benchmark ##########
+async def run_load(shape: CourseShape, form_format: str, courses: int, concurrency: int, url: Optional[str]) -> Dict:
+    """Submits courses to /generate_course/ with bounded concurrency and waits for their jobs.
+
+    Without a url the application runs in-process (through its ASGI interface, with its background
+    services started), so the measure covers the endpoint, the job queue and the inference worker.
+    """
+    import httpx
+    from job_queue import FINISHED_STATUSES, SUCCEEDED
+
+    app = None
+    if url is None:
+        import main
+        app = main.app
+        await main.start_background_services()
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://benchmark", timeout=None)
+    else:
+        client = httpx.AsyncClient(base_url=url, timeout=None)
+
+    documents = [(build_form(index, shape, form_format), build_plan(index, shape)) for index in range(courses)]
+    slots = asyncio.Semaphore(concurrency)
+    accept_latencies: List[float] = []
+    completion_latencies: List[float] = []
+    statuses: Dict[str, int] = {}
+
+    async def submit(form: bytes, plan: bytes):
+        async with slots:
+            start = time.perf_counter()
+            response = await client.post("/generate_course/", files={
+                "form_file": (f"form.{form_format}", form),
+                "plan_file": ("plan.pdf", plan, "application/pdf"),
+            })
+            accept_latencies.append(time.perf_counter() - start)
+            if response.status_code != 202:
+                statuses[f"http_{response.status_code}"] = statuses.get(f"http_{response.status_code}", 0) + 1
+                return
+            job_url = response.json()["status_url"]
+            while True:
+                job = (await client.get(job_url)).json()
+                if job["status"] in FINISHED_STATUSES:
+                    break
+                await asyncio.sleep(0.02)
+            completion_latencies.append(time.perf_counter() - start)
+            statuses[job["status"]] = statuses.get(job["status"], 0) + 1
+
+    start = time.perf_counter()
+    try:
+        await asyncio.gather(*(submit(form, plan) for form, plan in documents))
+    finally:
+        await client.aclose()
+        if app is not None:
+            await main.stop_background_services()
+    wall_seconds = time.perf_counter() - start
+
+    return {
+        "courses": courses,
+        "concurrency": concurrency,
+        "target": url or "in-process",
+        "statuses": statuses,
+        "succeeded": statuses.get(SUCCEEDED, 0),
+        "wall_seconds": round(wall_seconds, 3),
+        "courses_per_second": round(statuses.get(SUCCEEDED, 0) / wall_seconds, 3),
+        "accept_latency": summarize(accept_latencies) if accept_latencies else None,
+        "completion_latency": summarize(completion_latencies) if completion_latencies else None,
+    }
+
+######## Main ##########
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], cwd=REPOSITORY_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+async def run_benchmark(args: argparse.Namespace) -> Dict:
+    shape = CourseShape(modules=args.modules, nucleos=args.nucleos, plan_pages=args.pages, list_items=args.list_items)
+    results = {
+        "commit": git_commit(),
+        "timestamp": datetime.utcnow().isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "config": {**vars(args), "model_backend": os.environ["EDU_MODEL_BACKEND"]},
+        "stages": await run_stages(shape, args.form_format, args.repeat),
+    }
+    if args.load_courses:
+        results["load"] = await run_load(shape, args.form_format, args.load_courses, args.concurrency, args.url)
+    return results
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Times every stage of the course pipeline on synthetic courses and drives /generate_course/ under load."
+    )
+    parser.add_argument("--modules", type=int, default=4)
+    parser.add_argument("--nucleos", type=int, default=3, help="Núcleos per module.")
+    parser.add_argument("--pages", type=int, default=10, help="Minimum number of pages of each plan.")
+    parser.add_argument("--list-items", type=int, default=5, help="Items of each list section of the forms.")
+    parser.add_argument("--form-format", choices=("docx", "pdf"), default="docx")
+    parser.add_argument("--repeat", type=int, default=5, help="Courses run through the stages.")
+    parser.add_argument("--load-courses", type=int, default=20, help="Courses submitted to /generate_course/ (0 skips the load test).")
+    parser.add_argument("--concurrency", type=int, default=8, help="Requests in flight during the load test.")
+    parser.add_argument("--url", help="Base URL of a running server to load instead of the in-process application.")
+    parser.add_argument("--json", help="Writes the results to this file instead of printing them.")
+    args = parser.parse_args()
+
+    try:
+        results = asyncio.run(run_benchmark(args))
+    finally:
+        shutdown_extraction_pool()
+    output = json.dumps(results, ensure_ascii=False, indent=2)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            f.write(output)
+    else:
+        print(output)
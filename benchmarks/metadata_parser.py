@@ -0,0 +1,67 @@
+######## Imports & Initializations #########
+import os
+import sys
+# Importing os and sys to import the application modules from the repository root.
+
+import re
+# Importing the regex library for the per-field baseline.
+
+import time
+# Importing time to measure the parsers.
+
+import argparse
+# Importing argparse to configure the size of the generated forms.
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_extraction import METADATA_SECTIONS, extract_course_metadata
+# Importing the single-pass parser and the section headings it recognizes.
+
+######## Synthetic Forms ##########
+def build_form(lines_per_section: int) -> str:
+    """Builds a form with every metadata section, each one holding `lines_per_section` lines."""
+    parts = ["Formulário de proposta de disciplina"]
+    for number, (field, kind, headings) in enumerate(METADATA_SECTIONS, start=1):
+        parts.append(f"### {number} {headings[0].capitalize()}")
+        if kind == "int":
+            parts.append("60 horas")
+        elif kind == "date":
+            parts.append("16/07/2030")
+        else:
+            parts.extend(f"- Item {index} da seção {field}, com algum texto de exemplo." for index in range(lines_per_section))
+    return "\n".join(parts) + "\n"
+
+######## Per-Field Baseline ##########
+def extract_course_metadata_per_field(text: str) -> dict:
+    """The previous approach extended to every field: one DOTALL search over the whole text per heading."""
+    metadata = {}
+    for number, (field, _, headings) in enumerate(METADATA_SECTIONS, start=1):
+        pattern = r"###\s*" + str(number) + r"\s*" + r"\s*".join(map(re.escape, headings[0].split())) + r"\n(.*?)(?=\n###|\Z)"
+        match = re.search(pattern, text, re.IGNORECASE | re.DOTALL)
+        if match:
+            metadata[field] = match.group(1).strip()
+    return metadata
+
+def measure(function, text: str, repeat: int) -> float:
+    """Returns the best time of `repeat` runs, in milliseconds."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(text)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+######## Main ##########
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compares the metadata parsers on large synthetic forms.")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10, 100, 1000, 5000], help="Lines per section.")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'lines/section':>14} {'size (KB)':>10} {'fields':>7} {'single-pass (ms)':>17} {'per-field (ms)':>15}")
+    for lines_per_section in args.sizes:
+        form = build_form(lines_per_section)
+        fields = len(extract_course_metadata(form))
+        single_pass = measure(extract_course_metadata, form, args.repeat)
+        per_field = measure(extract_course_metadata_per_field, form, args.repeat)
+        print(f"{lines_per_section:>14} {len(form) // 1024:>10} {fields:>7} {single_pass:>17.2f} {per_field:>15.2f}")
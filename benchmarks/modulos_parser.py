@@ -0,0 +1,76 @@
+######## Imports & Initializations #########
+import os
+import sys
+# Importing os and sys to import the application modules from the repository root.
+
+import re
+# Importing the regex library for the previous parser.
+
+import time
+# Importing time to measure the parsers.
+
+import argparse
+# Importing argparse to configure the size of the generated plans.
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from data_extraction import ModulosParser, extract_modulos
+# Importing the line-based module parser.
+
+######## Synthetic Plans ##########
+# Lines of a page of the generated plans.
+LINES_PER_PAGE = 50
+
+def build_plan(pages: int) -> str:
+    """Builds a plan of about `pages` pages: metadata sections, then modules with núcleos and long descriptions."""
+    lines = ["Plano de ensino", "### 9 Ementa", "Termos chave da disciplina."]
+    modulo = 0
+    while len(lines) < pages * LINES_PER_PAGE:
+        modulo += 1
+        lines.append(f"### {modulo} Módulo {modulo}: fundamentos e práticas")
+        for nucleo in range(1, 6):
+            lines.append(f"{modulo}.{nucleo} Núcleo {nucleo} do módulo {modulo}")
+            lines.extend(f"Descrição detalhada do núcleo, parágrafo {paragraph}, com referências e exemplos." for paragraph in range(8))
+    return "\n".join(lines) + "\n"
+
+######## Previous Parser ##########
+def extract_modulos_findall(text: str) -> list:
+    """The previous parser: a lazy DOTALL findall for the modules, then a findall per module for the núcleos."""
+    modulos = []
+    for modulo_match in re.findall(r'###\s*(\d+)\s*(.*?)\n(.*?)(?=\n###|\Z)', text, re.IGNORECASE | re.DOTALL):
+        nucleos_conceituais = [{'titulo': nucleo.strip()} for nucleo in re.findall(r'\d+\.\d+\s*(.*?)\n', modulo_match[2], re.IGNORECASE)]
+        modulos.append({'titulo': modulo_match[1].strip(), 'nucleos_conceituais': nucleos_conceituais})
+    return modulos
+
+def extract_modulos_by_page(text: str) -> list:
+    """Feeds the line-based parser page by page, as the pages would be extracted."""
+    parser = ModulosParser()
+    step = LINES_PER_PAGE * 80
+    for start in range(0, len(text), step):
+        parser.feed(text[start:start + step])
+    return parser.close()
+
+def measure(function, text: str, repeat: int) -> float:
+    """Returns the best time of `repeat` runs, in milliseconds."""
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function(text)
+        best = min(best, time.perf_counter() - start)
+    return best * 1000
+
+######## Main ##########
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compares the module parsers on synthetic plans of growing size.")
+    parser.add_argument("--pages", type=int, nargs="+", default=[50, 100, 250, 500])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'pages':>6} {'modules':>8} {'line-based (ms)':>16} {'per page (ms)':>14} {'fed by page (ms)':>17} {'findall (ms)':>13}")
+    for pages in args.pages:
+        plan = build_plan(pages)
+        modules = len(extract_modulos(plan))
+        line_based = measure(extract_modulos, plan, args.repeat)
+        by_page = measure(extract_modulos_by_page, plan, args.repeat)
+        findall = measure(extract_modulos_findall, plan, args.repeat)
+        print(f"{pages:>6} {modules:>8} {line_based:>16.2f} {line_based / pages:>14.3f} {by_page:>17.2f} {findall:>13.2f}")
@@ -0,0 +1,148 @@
+######## Imports & Initializations #########
+import io
+# Importing io to build the documents in memory.
+
+from dataclasses import dataclass
+# Importing dataclass to describe the size of a synthetic course.
+
+from typing import List
+# Importing typing helpers for type hinting.
+
+from docx import Document
+# Importing python-docx to write the DOCX forms.
+
+######## CourseShape Dataclass ##########
+# The size of a synthetic course: its modules, the núcleos of each module, the minimum number of
+# pages of its plan (filled with description paragraphs) and the items of each list section of its form.
+@dataclass
+class CourseShape:
+    modules: int = 4
+    nucleos: int = 3
+    plan_pages: int = 10
+    list_items: int = 5
+
+# Lines of a page of the generated PDFs.
+LINES_PER_PAGE = 45
+
+# Form sections, in the order of the form: (heading, kind). Lists take `list_items` lines.
+FORM_SECTIONS = (
+    ("Código e nome da disciplina", "text"),
+    ("Natureza", "natureza"),
+    ("Carga horária semestral", "int"),
+    ("Carga horária semanal", "int"),
+    ("Perfil docente", "text"),
+    ("Área temática", "text"),
+    ("Linha/eixo de extensão e pesquisa", "text"),
+    ("Competências", "list"),
+    ("Ementa", "list"),
+    ("Objetivos", "list"),
+    ("Objetivos sociocomunitários", "list"),
+    ("Descrição do público envolvido", "text"),
+    ("Justificativa", "text"),
+    ("Procedimentos de ensino-aprendizagem", "list"),
+    ("Temas de aprendizagem", "list"),
+    ("Procedimentos de avaliação", "list"),
+    ("Bibliografia básica", "list"),
+    ("Bibliografia complementar", "list"),
+    ("Data de início", "date"),
+)
+
+######## Synthetic Texts ##########
+def form_sections(index: int, shape: CourseShape) -> List[tuple]:
+    """Returns the (heading, value lines) of every section of a valid form."""
+    sections = []
+    for heading, kind in FORM_SECTIONS:
+        if kind == "natureza":
+            lines = ["Extensão"]
+        elif kind == "int":
+            lines = ["60" if "semestral" in heading else "4"]
+        elif kind == "date":
+            lines = ["16/07/2099"]
+        elif kind == "list":
+            lines = [f"{heading} {item + 1} do curso {index}, descrito com algumas palavras." for item in range(shape.list_items)]
+        else:
+            lines = [f"{heading} do curso sintético {index}."]
+        sections.append((heading, lines))
+    return sections
+
+def form_text_lines(index: int, shape: CourseShape) -> List[str]:
+    """The form as numbered markdown sections ("### 1 Código e nome da disciplina"), one value per line."""
+    lines = [f"Formulário de proposta do curso {index}"]
+    for number, (heading, values) in enumerate(form_sections(index, shape), start=1):
+        lines.append(f"### {number} {heading}")
+        lines.extend(values)
+    return lines
+
+def plan_text_lines(index: int, shape: CourseShape) -> List[str]:
+    """The plan: modules ("### 1 Título") with their núcleos ("1.1 Título"), padded to `plan_pages` pages."""
+    target_lines = shape.plan_pages * LINES_PER_PAGE
+    nucleo_count = shape.modules * shape.nucleos
+    # Description lines after each núcleo, so the plan reaches its number of pages.
+    description_lines = max(1, (target_lines - 1 - shape.modules - nucleo_count) // max(nucleo_count, 1))
+    lines = [f"Plano de ensino do curso {index}"]
+    for modulo in range(1, shape.modules + 1):
+        lines.append(f"### {modulo} Módulo {modulo} do curso {index}: fundamentos e práticas")
+        for nucleo in range(1, shape.nucleos + 1):
+            lines.append(f"{modulo}.{nucleo} Núcleo {nucleo} do módulo {modulo}")
+            lines.extend(
+                f"Descrição do núcleo, parágrafo {paragraph}, com referências, exemplos e exercícios."
+                for paragraph in range(description_lines)
+            )
+    return lines
+
+######## Documents ##########
+def pdf_string(text: str) -> bytes:
+    """Encodes a line as a PDF string of the WinAnsi (cp1252) font encoding."""
+    encoded = text.encode("cp1252", errors="replace")
+    return b"(" + encoded.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)") + b")"
+
+def build_pdf(lines: List[str]) -> bytes:
+    """Writes a minimal PDF with a text layer: the lines, LINES_PER_PAGE per page, in Helvetica."""
+    pages = [lines[start:start + LINES_PER_PAGE] for start in range(0, len(lines), LINES_PER_PAGE)] or [[]]
+    font_number = 3 + 2 * len(pages)
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [" + b" ".join(b"%d 0 R" % (3 + 2 * i) for i in range(len(pages))) + b"] /Count %d >>" % len(pages),
+    ]
+    for i, page_lines in enumerate(pages):
+        objects.append(
+            b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents %d 0 R "
+            b"/Resources << /Font << /F1 %d 0 R >> >> >>" % (4 + 2 * i, font_number)
+        )
+        content = b"BT /F1 10 Tf 14 TL 50 750 Td\n" + b"".join(pdf_string(line) + b" Tj T*\n" for line in page_lines) + b"ET"
+        objects.append(b"<< /Length %d >>\nstream\n" % len(content) + content + b"\nendstream")
+    objects.append(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>")
+
+    output = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(output)
+    output += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    output += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    output += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(output)
+
+def build_form_docx(index: int, shape: CourseShape) -> bytes:
+    """Writes the form as most forms are filled in: a table with a label cell and a value cell per section."""
+    document = Document()
+    document.add_paragraph(f"Formulário de proposta do curso {index}")
+    sections = form_sections(index, shape)
+    table = document.add_table(rows=len(sections), cols=2)
+    for row, (heading, values) in zip(table.rows, sections):
+        row.cells[0].text = heading
+        row.cells[1].text = "\n".join(values)
+    buffer = io.BytesIO()
+    document.save(buffer)
+    return buffer.getvalue()
+
+def build_form(index: int, shape: CourseShape, file_format: str = "docx") -> bytes:
+    """Builds the form of a synthetic course, as a DOCX table or as a PDF of numbered sections."""
+    if file_format == "docx":
+        return build_form_docx(index, shape)
+    return build_pdf(form_text_lines(index, shape))
+
+def build_plan(index: int, shape: CourseShape) -> bytes:
+    """Builds the plan of a synthetic course as a PDF."""
+    return build_pdf(plan_text_lines(index, shape))
@@ -0,0 +1,312 @@
+######## Imports & Initializations #########
+import os
+# Importing os to find the form/plan pairs and to read the ingestion configuration from the environment.
+
+import json
+# Importing json to read the manifests and to write the ingestion state and report.
+
+import time
+# Importing time to measure the extraction and generation of each course.
+
+import asyncio
+# Importing asyncio to pipeline the extraction and the generation of the courses.
+
+import logging
+# Importing logging to report the ingested and failed courses.
+
+import tempfile
+# Importing tempfile to write the state and report through a temporary file of their own.
+
+import argparse
+# Importing argparse for the command line interface.
+
+from dataclasses import dataclass
+# Importing dataclass to describe the form/plan pairs to be ingested.
+
+from datetime import datetime
+# Importing datetime to timestamp the ingestion report.
+
+from typing import Any, Callable, Dict, List, Optional, Tuple
+# Importing typing helpers for type hinting.
+
+from data_models import CursoData
+# Importing data models representing the course data structure.
+
+from data_extraction import TEXT_EXTRACTORS, extract_text_cached, course_data_from_texts, shutdown_extraction_pool
+# Importing the cached text extraction and the construction of the course data from the extracted texts.
+
+from utils import process_and_generate_content, store_course_data
+# Importing the generation of the course content and the course storage.
+
+from course_storage import get_course_store
+# Importing the per-course storage, to resume the courses already extracted.
+
+###### Ingestion Configuration ######
+# Number of courses extracted at the same time (the extraction itself runs in the extraction process
+# pool) and number of courses whose content is generated at the same time (their prompts share the
+# model queue). The limits are independent, so the next courses are extracted while others generate.
+BULK_EXTRACTION_CONCURRENCY = int(os.environ.get("EDU_BULK_EXTRACTION_CONCURRENCY", "4"))
+BULK_GENERATION_CONCURRENCY = int(os.environ.get("EDU_BULK_GENERATION_CONCURRENCY", "2"))
+
+# Item statuses recorded in the ingestion state.
+PENDING = "pending"
+EXTRACTED = "extracted"
+DONE = "done"
+FAILED = "failed"
+
+######## IngestionItem Dataclass ##########
+# A course to be ingested: its name (unique in the batch), its form and plan files and optional
+# metadata fields taking precedence over the ones extracted from the form.
+@dataclass
+class IngestionItem:
+    name: str
+    form_path: str
+    plan_path: str
+    form_data: Optional[Dict] = None
+
+def find_file(directory: str, stem: str) -> Optional[str]:
+    """Returns the file of a directory named `stem` with a supported extension, if any."""
+    for entry in sorted(os.listdir(directory)):
+        name, extension = os.path.splitext(entry)
+        if name.lower() == stem and extension[1:].lower() in TEXT_EXTRACTORS:
+            return os.path.join(directory, entry)
+    return None
+
+def contained_path(base: str, path: str) -> str:
+    """Resolves a path of a batch, which must stay inside the batch directory (symbolic links included).
+    Raises:
+        ValueError: If the path resolves outside of `base`.
+    """
+    base = os.path.realpath(base)
+    resolved = os.path.realpath(os.path.join(base, path))
+    if os.path.commonpath([base, resolved]) != base:
+        raise ValueError(f"O arquivo '{path}' está fora do diretório do lote.")
+    return resolved
+
+def discover_items(source: str) -> List[IngestionItem]:
+    """Lists the courses of a batch.
+    source: Either a JSON manifest (a list of {"name", "form", "plan", "form_data"}, paths relative
+        to the manifest), or a directory with one subdirectory per course holding a "form" and a
+        "plan" file (e.g. form.docx and plan.pdf) and optionally a form_data.json file.
+    Returns: The courses, in order.
+    Raises:
+        ValueError: If the manifest is invalid, a course misses its form or plan file, or one of its
+            files is outside the manifest (or batch) directory.
+    """
+    if os.path.isfile(source):
+        base = os.path.dirname(os.path.abspath(source))
+        with open(source, "r", encoding="utf-8") as f:
+            entries = json.load(f)
+        if not isinstance(entries, list):
+            raise ValueError("O manifesto deve ser uma lista de cursos.")
+        items = []
+        for index, entry in enumerate(entries):
+            try:
+                items.append(IngestionItem(
+                    name=str(entry.get("name", index)),
+                    form_path=contained_path(base, entry["form"]),
+                    plan_path=contained_path(base, entry["plan"]),
+                    form_data=entry.get("form_data")
+                ))
+            except (KeyError, AttributeError, TypeError):
+                raise ValueError(f"Entrada inválida no manifesto: {entry}")
+    else:
+        items = []
+        for name in sorted(os.listdir(source)):
+            directory = os.path.join(source, name)
+            if not os.path.isdir(directory):
+                continue
+            form_path, plan_path = find_file(directory, "form"), find_file(directory, "plan")
+            if form_path is None or plan_path is None:
+                raise ValueError(f"O curso '{name}' deve ter um arquivo 'form' e um arquivo 'plan'.")
+            form_path = contained_path(source, os.path.relpath(form_path, source))
+            plan_path = contained_path(source, os.path.relpath(plan_path, source))
+            form_data = None
+            if os.path.isfile(os.path.join(directory, "form_data.json")):
+                with open(os.path.join(directory, "form_data.json"), "r", encoding="utf-8") as f:
+                    form_data = json.load(f)
+            items.append(IngestionItem(name, form_path, plan_path, form_data))
+
+    names = [item.name for item in items]
+    if len(set(names)) != len(names):
+        raise ValueError("Os nomes dos cursos do lote devem ser únicos.")
+    return items
+
+def default_state_path(source: str) -> str:
+    """The state of a batch is kept next to its manifest, or inside its directory."""
+    if os.path.isfile(source):
+        return f"{os.path.splitext(source)[0]}.state.json"
+    return os.path.join(source, "ingestion_state.json")
+
+def write_json(path: str, value: Any):
+    """Writes a JSON file atomically, so an interruption never leaves it truncated."""
+    # Each write has its own temporary file, so concurrent writers never interleave their contents.
+    with tempfile.NamedTemporaryFile(
+        "w", encoding="utf-8", dir=os.path.dirname(os.path.abspath(path)), suffix=".tmp", delete=False
+    ) as f:
+        temporary_path = f.name
+        try:
+            json.dump(value, f, ensure_ascii=False, indent=2)
+        except BaseException:
+            f.close()
+            os.unlink(temporary_path)
+            raise
+    os.replace(temporary_path, path)
+
+######## BulkIngestion Class ##########
+class BulkIngestion:
+    """Ingests a batch of courses: extracts each form/plan pair, stores the course and generates its content.
+
+    Extraction and generation are separate stages with their own concurrency limits: as soon as a
+    course is extracted it waits for a generation slot, and the next courses are extracted meanwhile.
+    The status of every course is saved in a state file after each stage, so an interrupted batch
+    resumes where it stopped: finished courses are skipped, and extracted ones go straight to
+    generation (which only generates their missing artifacts).
+    """
+
+    def __init__(
+        self,
+        items: List[IngestionItem],
+        generator,
+        state_path: str,
+        extraction_concurrency: int = BULK_EXTRACTION_CONCURRENCY,
+        generation_concurrency: int = BULK_GENERATION_CONCURRENCY,
+        use_cache: bool = True,
+        on_progress: Optional[Callable[[int, int], None]] = None
+    ):
+        self.items = items
+        self.generator = generator
+        self.state_path = state_path
+        self.use_cache = use_cache
+        self.on_progress = on_progress
+        self._extraction_slots = asyncio.Semaphore(extraction_concurrency)
+        self._generation_slots = asyncio.Semaphore(generation_concurrency)
+        self.state: Dict[str, Dict[str, Any]] = {}
+        if os.path.isfile(state_path):
+            with open(state_path, "r", encoding="utf-8") as f:
+                self.state = json.load(f)
+
+    def _update(self, item: IngestionItem, **fields):
+        self.state.setdefault(item.name, {"status": PENDING}).update(fields)
+        write_json(self.state_path, self.state)
+
+    def _report_progress(self):
+        if self.on_progress is not None:
+            done = sum(1 for item in self.items if self.state.get(item.name, {}).get("status") in (DONE, FAILED))
+            self.on_progress(done, len(self.items))
+
+    async def _extract(self, item: IngestionItem) -> Tuple[str, CursoData]:
+        """Extracts and stores the course. Returns: The course id and the course data."""
+        def extract_file(path: str) -> str:
+            with open(path, "rb") as f:
+                return extract_text_cached(f, os.path.splitext(path)[1][1:].lower())
+
+        start = time.perf_counter()
+        form_text, plan_text = await asyncio.gather(
+            asyncio.to_thread(extract_file, item.form_path),
+            asyncio.to_thread(extract_file, item.plan_path)
+        )
+        course_data = course_data_from_texts(form_text, plan_text, item.form_data)
+        course_id = await store_course_data(course_data)
+        self._update(item, status=EXTRACTED, course_id=course_id, extraction_seconds=time.perf_counter() - start)
+        return course_id, course_data
+
+    async def _ingest(self, item: IngestionItem):
+        state = self.state.get(item.name, {})
+        if state.get("status") == DONE:
+            return
+        try:
+            course_data = get_course_store().get_course(state["course_id"]) if state.get("course_id") else None
+            if course_data is not None:
+                course_id = state["course_id"]
+            else:
+                async with self._extraction_slots:
+                    course_id, course_data = await self._extract(item)
+
+            async with self._generation_slots:
+                start = time.perf_counter()
+                await process_and_generate_content(
+                    course_data, self.generator, use_cache=self.use_cache, course_id=course_id
+                )
+                self._update(item, status=DONE, error=None, generation_seconds=time.perf_counter() - start)
+            logging.info("Ingested course %s (%s)", item.name, course_id)
+        except Exception as exc:
+            logging.exception("Failed to ingest course %s", item.name)
+            self._update(item, status=FAILED, error=str(exc))
+        finally:
+            self._report_progress()
+
+    async def run(self) -> Dict[str, Any]:
+        """Ingests the courses not finished yet. Returns: The summary report of the batch."""
+        started_at = datetime.utcnow()
+        start = time.perf_counter()
+        self._report_progress()
+        await asyncio.gather(*(self._ingest(item) for item in self.items))
+
+        items = [{"name": item.name, **self.state.get(item.name, {"status": PENDING})} for item in self.items]
+        return {
+            "started_at": started_at.isoformat(),
+            "finished_at": datetime.utcnow().isoformat(),
+            "duration_seconds": time.perf_counter() - start,
+            "total": len(items),
+            "done": sum(1 for item in items if item["status"] == DONE),
+            "failed": sum(1 for item in items if item["status"] == FAILED),
+            "items": items,
+        }
+
+async def ingest(
+    source: str,
+    generator,
+    state_path: Optional[str] = None,
+    report_path: Optional[str] = None,
+    **options
+) -> Dict[str, Any]:
+    """Ingests the batch of a manifest or directory and writes its summary report.
+    source: The manifest or directory of the batch (see discover_items).
+    generator: An InferenceWorker, or a text generation pipeline.
+    state_path: The state file of the batch; next to the source by default.
+    report_path: The summary report; next to the state file by default.
+    options: The BulkIngestion options (concurrency limits, use_cache, on_progress).
+    Returns: The summary report, with the path it was written to.
+    """
+    state_path = state_path or default_state_path(source)
+    report_path = report_path or os.path.join(os.path.dirname(os.path.abspath(state_path)), "ingestion_report.json")
+    report = await BulkIngestion(discover_items(source), generator, state_path, **options).run()
+    report["report_path"] = report_path
+    write_json(report_path, report)
+    return report
+
+######## Command Line Interface ##########
+async def run_cli(args: argparse.Namespace) -> Dict[str, Any]:
+    # Imported here so that importing this module does not configure the model.
+    from model_server import create_inference_worker
+
+    # The batch uses the shared model server when one is configured, like the API.
+    worker = create_inference_worker()
+    await worker.start()
+    try:
+        return await ingest(
+            args.source,
+            worker,
+            state_path=args.state,
+            report_path=args.report,
+            extraction_concurrency=args.extraction_concurrency,
+            generation_concurrency=args.generation_concurrency,
+            use_cache=not args.no_cache,
+            on_progress=lambda done, total: logging.info("Ingested %d/%d courses", done, total)
+        )
+    finally:
+        await worker.shutdown()
+        shutdown_extraction_pool()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingests a batch of form/plan pairs and generates the content of each course.")
+    parser.add_argument("source", help="JSON manifest, or directory with one subdirectory (form.*, plan.*) per course.")
+    parser.add_argument("--state", help="State file used to resume an interrupted batch.")
+    parser.add_argument("--report", help="Path of the summary report.")
+    parser.add_argument("--extraction-concurrency", type=int, default=BULK_EXTRACTION_CONCURRENCY)
+    parser.add_argument("--generation-concurrency", type=int, default=BULK_GENERATION_CONCURRENCY)
+    parser.add_argument("--no-cache", action="store_true", help="Regenerate every artifact, refreshing the generation cache.")
+    logging.basicConfig(level=logging.INFO)
+    report = asyncio.run(run_cli(parser.parse_args()))
+    print(f"{report['done']}/{report['total']} cursos ingeridos, {report['failed']} com falha. Relatório: {report['report_path']}")
@@ -1,81 +1,144 @@
 ######## Imports & Initializations #########
-from transformers import pipeline
-# Importing the pipeline function from the transformers library to create a text generation pipeline.
-
 import asyncio
 # Importing asyncio for asynchronous programming.
 
-from typing import List, Dict
-# Importing List and Dict from the typing module for type hinting.
-
-from data_models import MetadadosCurso, Modulo, NucleoConceitual
-# Importing data models for course metadata, modules, and conceptual nuclei.
+import math
+# Importing math to round the new token budgets.
+
+from typing import List, Dict, Optional
+# Importing List, Dict and Optional from the typing module for type hinting.
+
+from data_models import CursoData, MetadadosCurso, Modulo, NucleoConceitual
+# Importing data models for course data, course metadata, modules, and conceptual nuclei.
+
+from inference_worker import STOP_PATTERNS_PARAM, ASSISTED_PARAM, ARTIFACT_PARAM
+# Importing the names of the generation parameters holding the stop patterns, the assisted decoding and the name of an artifact.
+
+from assisted_decoding import ASSISTANT_MODEL_ID, ASSISTED_ARTIFACTS
+# Importing the draft model configuration and the artifacts decoded with it.
+
+from generation_cache import generate_texts_cached
+# Importing the helper that submits prompts to the inference worker (or runs a plain pipeline off the event loop),
+# skipping the model for the prompts already in the generation cache.
+
+from artifact_scheduler import ArtifactSpec
+# Importing the declaration of the artifacts generated for each Nucleo Conceitual.
+
+from prompt_templates import get_prompt_engine
+# Importing the prompt engine rendering the templates of prompts.txt within their token budgets.
+
+###### Text Generation Pipeline #######
+# The text generation pipeline (Mistral-7B-Instruct-v0.3 by default) is loaded lazily, or at startup
+# through a warm-up, by model_registry, which also selects the model from the configuration.
+# The generate_* functions receive the generator (a pipeline or an InferenceWorker) as an argument.
+
+###### Generation Parameters ######
+# Model hyperparameters used for each generated artifact of a Nucleo Conceitual.
+# Prompts sharing the same parameters can be sent to the model in the same batch.
+# Only the completion is returned (return_full_text=False), and it ends where one of its stop
+# patterns matches (see inference_worker): the content and the video script end with their
+# "Conclusão" section (at the next markdown heading, bold text inside the section is kept), and any
+# artifact ends if the model starts repeating the prompt labels.
+# max_new_tokens is the ceiling of each artifact; courses get a budget from their workload below.
+# The artifact name labels the token counts and the throughput of its model calls (see metrics).
+CONCLUSION_END_PATTERN = r"(#+[ \t]*Conclus[ãa]o\b.*?\n)[ \t]*#"
+PROMPT_LABEL_PATTERN = r"\n[ \t]*\*\*(?:Informações|Exemplo|Conteúdo|Roteiro|Texto para Teleprompter)[^\n]*:\*\*"
+GENERATION_PARAMS: Dict[str, Dict] = {
+    'conteudo': {
+        ARTIFACT_PARAM: 'conteudo',
+        'max_new_tokens': 1024, 'num_return_sequences': 1, 'temperature': 0.7, 'return_full_text': False,
+        STOP_PATTERNS_PARAM: (CONCLUSION_END_PATTERN, PROMPT_LABEL_PATTERN),
+    },
+    'video_script': {
+        ARTIFACT_PARAM: 'video_script',
+        'max_new_tokens': 768, 'num_return_sequences': 1, 'temperature': 0.75, 'return_full_text': False,
+        STOP_PATTERNS_PARAM: (CONCLUSION_END_PATTERN, PROMPT_LABEL_PATTERN),
+    },
+    'teleprompter_text': {
+        ARTIFACT_PARAM: 'teleprompter_text',
+        'max_new_tokens': 768, 'num_return_sequences': 1, 'temperature': 0.7, 'return_full_text': False,
+        # The teleprompter text is plain speech: a heading or a bold label means it is over.
+        STOP_PATTERNS_PARAM: (r"\n[ \t]*(?:#|\*\*)",),
+    },
+}
+
+# With a draft model configured, the selected artifacts are decoded with it (assisted decoding),
+# and their acceptance statistics are reported under the artifact name.
+if ASSISTANT_MODEL_ID:
+    for artifact in ASSISTED_ARTIFACTS:
+        if artifact not in GENERATION_PARAMS:
+            raise ValueError(f"Artefato desconhecido em EDU_ASSISTED_ARTIFACTS: {artifact}. Opções: {sorted(GENERATION_PARAMS)}")
+        GENERATION_PARAMS[artifact][ASSISTED_PARAM] = artifact
+
+# New tokens per hour of course workload spent on each núcleo, and the minimum number of new tokens
+# of each artifact (the maximum is its max_new_tokens above).
+NEW_TOKENS_PER_HOUR: Dict[str, int] = {'conteudo': 160, 'video_script': 96, 'teleprompter_text': 128}
+MIN_NEW_TOKENS: Dict[str, int] = {'conteudo': 384, 'video_script': 256, 'teleprompter_text': 320}
+# The budgets are rounded up to a multiple of this, so courses of similar workload share batches.
+NEW_TOKENS_STEP = 64
+
+def course_generation_params(artifact: str, course_data: CursoData) -> Dict:
+    """Derives the generation parameters of an artifact from the course workload.
+
+    The semester workload is split evenly among the núcleos of the course, and each artifact gets
+    a number of new tokens proportional to the hours of its núcleo, within its minimum and maximum.
+    artifact: The artifact name.
+    course_data: The course data containing metadata and modules.
+    Returns: The generation parameters, with the max_new_tokens of the course.
+    """
+    params = GENERATION_PARAMS[artifact]
+    total_nucleos = sum(len(modulo.nucleos_conceituais) for modulo in course_data.modulos) or 1
+    hours = course_data.metadata.carga_horaria_semestral / total_nucleos
+    tokens = math.ceil(hours * NEW_TOKENS_PER_HOUR[artifact] / NEW_TOKENS_STEP) * NEW_TOKENS_STEP
+    return {**params, 'max_new_tokens': min(max(tokens, MIN_NEW_TOKENS[artifact]), params['max_new_tokens'])}
+
+######### Prompt Builders #####
+# The prompts are rendered from the templates of prompts.txt, compiled once by the prompt engine,
+# which starts every prompt with the course and module context and fits the course fields and the
+# núcleo content to the token budget of each artifact.
+
+# Function to build the prompt used to generate educational content for a conceptual nucleus.
+def build_content_prompt(
+    metadata: MetadadosCurso, 
+    modulo: Modulo, 
+    nucleo_conceitual: NucleoConceitual
+) -> str:
+    """Builds the educational content prompt for a Nucleo Conceitual."""
+    return get_prompt_engine().render('conteudo', metadata, modulo, nucleo_conceitual)
 
-###### Initialize the Text Generation Pipeline #######
-# Initialize the text generation pipeline using the Mistral version 3 model
-# This pipeline will be used to generate text using the Mistral-7B-Instruct-v0.3 
-# model. It handles the setup for generating educational content.
-# requires export HUGGING_FACE_HUB_TOKEN="", since all powerful LLMs became gated models
-generator = pipeline('text-generation', model='mistralai/Mistral-7B-Instruct-v0.3')
+# Function to build the prompt used to generate a video script for a conceptual nucleus.
+def build_video_script_prompt(
+    metadata: MetadadosCurso,
+    modulo: Modulo,
+    nucleo_conceitual: NucleoConceitual
+) -> str:
+    """Builds the video script prompt for a Nucleo Conceitual."""
+    return get_prompt_engine().render('video_script', metadata, modulo, nucleo_conceitual)
 
-# TODO: option to the previous
+# Function to build the prompt used to generate teleprompter text from the content of a 
+# conceptual nucleus.
+def build_teleprompter_prompt(
+    metadata: MetadadosCurso,
+    modulo: Modulo,
+    nucleo_conceitual: NucleoConceitual,
+    content: str
+) -> str:
+    """Builds the teleprompter text prompt for a Nucleo Conceitual."""
+    return get_prompt_engine().render('teleprompter_text', metadata, modulo, nucleo_conceitual, conteudo=content)
 
 ######### Generate Educational Content #####
 # Function to generate educational content for a conceptual nucleus within a course module.
-# Creating a detailed prompt with course, module, and conceptual nucleus information to 
-# guide the text generation.
 async def generate_content_for_nucleo_conceitual(
     generator, 
     metadata: MetadadosCurso, 
     modulo: Modulo, 
-    nucleo_conceitual: NucleoConceitual
+    nucleo_conceitual: NucleoConceitual,
+    use_cache: bool = True
 ) -> str:
     """Generates educational content for a Nucleo Conceitual."""
-    # Creating a detailed prompt with course, module, and conceptual nucleus information to 
-    # guide the text generation.
-    prompt = f"""
-    ### Gere um conteúdo educacional para um Núcleo Conceitual de um curso universitário.
-
-    **Informações do Curso:**
-    * **Nome do Curso:** {metadata.codigo_nome}
-    * **Descrição do Público:** {metadata.descricao_publico}
-    * **Objetivos de Aprendizagem:** {', '.join(metadata.objetivos)}
-
-    **Informações do Módulo:**
-    * **Título do Módulo:** {modulo.titulo}
-
-    **Informações do Núcleo Conceitual:**
-    * **Título do Núcleo Conceitual:** {nucleo_conceitual.titulo}
-
-    **Exemplo de Conteúdo:**
-
-    ## Introdução
-    Este Núcleo Conceitual aborda... 
-
-    ### Subtópico 1
-    * Detalhe 1
-    * Detalhe 2 
-    * Exemplo: ...
-
-    ## Conclusão
-    Em resumo... 
-
-    **Conteúdo Gerado:**
-
-    ## {nucleo_conceitual.titulo}
-
-    (Insira aqui o conteúdo educacional. Siga o exemplo acima.
-    Seja conciso, claro e envolvente.) 
-    """
-
-    # Model hyperparameters to generate educational content.
-    result = generator(
-        prompt,
-        max_new_tokens=1024,
-        num_return_sequences=1,
-        temperature=0.7
-    )
-    return result[0]['generated_text']
+    prompt = build_content_prompt(metadata, modulo, nucleo_conceitual)
+    texts = await generate_texts_cached(generator, [prompt], GENERATION_PARAMS['conteudo'], use_cache=use_cache)
+    return texts[0]
 
 ###### Generate Video Script ######
 # Function to generate a video script for a conceptual nucleus within a course module.
@@ -83,106 +146,64 @@ async def generate_video_script(
     generator,
     metadata: MetadadosCurso,
     modulo: Modulo,
-    nucleo_conceitual: NucleoConceitual
+    nucleo_conceitual: NucleoConceitual,
+    use_cache: bool = True
 ) -> str:
     """Generates a video script for a Nucleo Conceitual."""
-    # Creating a detailed prompt with course, module, and conceptual nucleus information to guide 
-    # the text generation for a video script.
-    prompt = f"""
-    ### Crie um roteiro para um vídeo educacional curto e envolvente.
-
-    **Informações do Curso:**
-    * **Nome do Curso:** {metadata.codigo_nome}
-    * **Descrição do Público:** {metadata.descricao_publico}
-    * **Objetivos de Aprendizagem:** {', '.join(metadata.objetivos)}
-
-    **Informações do Módulo:**
-    * **Título do Módulo:** {modulo.titulo}
-
-    **Informações do Núcleo Conceitual:**
-    * **Título do Núcleo Conceitual:** {nucleo_conceitual.titulo}
-
-    **Exemplo de Roteiro:**
-
-    ## Introdução (0:00-0:30)
-    * **Visual:** Uma animação do título do curso e do módulo.
-    * **Narração:** Olá! Bem-vindos ao curso {metadata.codigo_nome}. Neste vídeo, vamos explorar {nucleo_conceitual.titulo}, um tópico fundamental em {modulo.titulo}.
-
-    ## Conceitos-Chave (0:30-3:00)
-    * **Visual:** Gráficos e diagramas ilustrando os conceitos-chave.
-    * **Narração:** (Explique os conceitos-chave de forma clara e concisa, usando exemplos relevantes para o público-alvo.)
-
-    ## Aplicação Prática (3:00-4:00)
-    * **Visual:** Cenas mostrando exemplos práticos da aplicação dos conceitos.
-    * **Narração:** (Demonstre como os conceitos aprendidos podem ser aplicados na prática.)
-
-    ## Conclusão (4:00-4:30)
-    * **Visual:** Um resumo dos pontos principais abordados no vídeo.
-    * **Narração:** (Recapitule os pontos-chave e incentive os alunos a explorar mais o assunto.)
-
-    **Roteiro Gerado:**
-
-    ## {nucleo_conceitual.titulo}
-
-    (Insira aqui o roteiro do vídeo. Siga o exemplo acima.
-    Seja criativo e envolvente.)
-    """
-
-    # Model hyperparameters to generate educational content.
-    result = generator(
-        prompt,
-        max_new_tokens=1024,
-        num_return_sequences=1,
-        temperature=0.75
-    )
-    return result[0]['generated_text']
+    prompt = build_video_script_prompt(metadata, modulo, nucleo_conceitual)
+    texts = await generate_texts_cached(generator, [prompt], GENERATION_PARAMS['video_script'], use_cache=use_cache)
+    return texts[0]
 
-###### GGenerate Teleprompter Text ######
-# Function to generate a video script for a conceptual nucleus within a course module.
+###### Generate Teleprompter Text ######
+# Function to generate teleprompter text for a conceptual nucleus within a course module.
 async def generate_teleprompter_text(
     generator,
     metadata: MetadadosCurso,
     modulo: Modulo,
-    nucleo_conceitual: NucleoConceitual
+    nucleo_conceitual: NucleoConceitual,
+    content: Optional[str] = None,
+    use_cache: bool = True
 ) -> str:
-    """Generates teleprompter text for a Nucleo Conceitual."""
-
-    # First, generate the content for the Núcleo Conceitual
-    content = await generate_content_for_nucleo_conceitual(generator, metadata, modulo, nucleo_conceitual)
-    # Creating a detailed prompt with course, module, and conceptual nucleus information to 
-    # guide the text generation for teleprompter text.
-    prompt = f"""
-    ### Crie um texto para teleprompter para um vídeo educacional.
-
-    **Informações do Curso:**
-    * **Nome do Curso:** {metadata.codigo_nome}
-    * **Descrição do Público:** {metadata.descricao_publico}
-
-    **Informações do Módulo:**
-    * **Título do Módulo:** {modulo.titulo}
-
-    **Informações do Núcleo Conceitual:**
-    * **Título do Núcleo Conceitual:** {nucleo_conceitual.titulo}
-
-    **Conteúdo do Núcleo Conceitual:**
-    {content}
-
-    **Exemplo de Texto para Teleprompter:**
-
-    Olá a todos! Sejam bem-vindos ao curso {metadata.codigo_nome}. Hoje, vamos mergulhar em {nucleo_conceitual.titulo}, um tópico essencial em {modulo.titulo}. 
-    (Continue o texto para teleprompter, adaptando o conteúdo do Núcleo Conceitual. 
-    Seja claro, conciso e mantenha um tom amigável e convidativo.)
-
-    **Texto para Teleprompter Gerado:**
-
-    (Insira aqui o texto para teleprompter. Siga o exemplo acima.
-    Mantenha um tom natural e fácil de ler em voz alta.)
-    """
-
-    result = generator(
-        prompt,
-        max_new_tokens=1024,
-        num_return_sequences=1,
-        temperature=0.7
-    )
-    return result[0]['generated_text']
+    """Generates teleprompter text for a Nucleo Conceitual, based on its educational content."""
+
+    # Reuse the content already generated for the Núcleo Conceitual; generate it only if missing.
+    if content is None:
+        content = nucleo_conceitual.conteudo
+    if content is None:
+        content = await generate_content_for_nucleo_conceitual(generator, metadata, modulo, nucleo_conceitual, use_cache)
+    prompt = build_teleprompter_prompt(metadata, modulo, nucleo_conceitual, content)
+    texts = await generate_texts_cached(generator, [prompt], GENERATION_PARAMS['teleprompter_text'], use_cache=use_cache)
+    return texts[0]
+
+###### Artifacts of a Nucleo Conceitual ######
+# The artifacts generated for each Nucleo Conceitual, in the NucleoConceitual fields they are stored in.
+# The teleprompter text is adapted from the educational content, so it is generated after it.
+# metadata_fields must list the MetadadosCurso fields used by each template (see prompts.txt), since they
+# decide which artifacts can be carried over when a course is regenerated. The single-núcleo generate_*
+# functions above do not know the whole course, so they use the maximum new tokens of each artifact.
+ARTIFACT_SPECS = (
+    ArtifactSpec(
+        'conteudo',
+        build_content_prompt,
+        GENERATION_PARAMS['conteudo'],
+        course_params=lambda course_data: course_generation_params('conteudo', course_data),
+        metadata_fields=('codigo_nome', 'area_tematica', 'descricao_publico', 'objetivos')
+    ),
+    ArtifactSpec(
+        'video_script',
+        build_video_script_prompt,
+        GENERATION_PARAMS['video_script'],
+        course_params=lambda course_data: course_generation_params('video_script', course_data),
+        metadata_fields=('codigo_nome', 'area_tematica', 'descricao_publico', 'objetivos')
+    ),
+    ArtifactSpec(
+        'teleprompter_text',
+        lambda metadata, modulo, nucleo_conceitual: build_teleprompter_prompt(
+            metadata, modulo, nucleo_conceitual, nucleo_conceitual.conteudo
+        ),
+        GENERATION_PARAMS['teleprompter_text'],
+        course_params=lambda course_data: course_generation_params('teleprompter_text', course_data),
+        depends_on=('conteudo',),
+        metadata_fields=('codigo_nome', 'area_tematica', 'descricao_publico', 'objetivos')
+    ),
+)
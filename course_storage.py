@@ -0,0 +1,209 @@
+######## Imports & Initializations #########
+import os
+# Importing os to read the storage configuration from the environment.
+
+import json
+# Importing json to store the course metadata.
+
+import uuid
+# Importing uuid to generate the course ids.
+
+import sqlite3
+# Importing sqlite3 to store each course, module and núcleo in its own row.
+
+import threading
+# Importing threading to serialize the access to the SQLite connection.
+
+from datetime import datetime
+# Importing datetime to timestamp the courses.
+
+from typing import Any, Dict, List, Optional
+# Importing typing helpers for type hinting.
+
+from data_models import CursoData, MetadadosCurso, Modulo, NucleoConceitual
+# Importing data models representing the course data structure.
+
+###### Storage Configuration ######
+# SQLite database holding the courses.
+COURSES_DB_PATH = os.environ.get("EDU_COURSES_DB", "courses.db")
+
+# NucleoConceitual fields holding generated artifacts, which can be written one at a time.
+ARTIFACT_COLUMNS = ("conteudo", "video_script", "teleprompter_text")
+
+######## CourseStore Class ##########
+class CourseStore:
+    """Stores the courses keyed by id, with one row per course, module and núcleo.
+
+    Each generated artifact is written to its núcleo row as soon as it is ready, and a module or
+    a núcleo can be read without loading the rest of the course.
+    """
+
+    def __init__(self, path: str = COURSES_DB_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.row_factory = sqlite3.Row
+        with self._lock, self._connection:
+            # WAL lets readers proceed while a generation is writing its artifacts.
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.executescript(
+                """CREATE TABLE IF NOT EXISTS courses (
+                    id TEXT PRIMARY KEY,
+                    metadata TEXT NOT NULL,
+                    created_at TEXT NOT NULL,
+                    updated_at TEXT NOT NULL
+                );
+                CREATE TABLE IF NOT EXISTS modulos (
+                    course_id TEXT NOT NULL REFERENCES courses (id) ON DELETE CASCADE,
+                    position INTEGER NOT NULL,
+                    titulo TEXT NOT NULL,
+                    PRIMARY KEY (course_id, position)
+                );
+                CREATE TABLE IF NOT EXISTS nucleos (
+                    course_id TEXT NOT NULL REFERENCES courses (id) ON DELETE CASCADE,
+                    modulo_position INTEGER NOT NULL,
+                    position INTEGER NOT NULL,
+                    titulo TEXT NOT NULL,
+                    conteudo TEXT,
+                    video_script TEXT,
+                    teleprompter_text TEXT,
+                    PRIMARY KEY (course_id, modulo_position, position)
+                );"""
+            )
+
+    def _write_course(self, course_id: str, course_data: CursoData):
+        """Writes the metadata, modules and núcleos of a course (inside a transaction)."""
+        metadata = json.dumps(course_data.metadata.dict(), ensure_ascii=False, default=str)
+        now = datetime.utcnow().isoformat()
+        self._connection.execute(
+            """INSERT INTO courses (id, metadata, created_at, updated_at) VALUES (?, ?, ?, ?)
+               ON CONFLICT (id) DO UPDATE SET metadata = excluded.metadata, updated_at = excluded.updated_at""",
+            (course_id, metadata, now, now)
+        )
+        self._connection.execute("DELETE FROM modulos WHERE course_id = ?", (course_id,))
+        self._connection.execute("DELETE FROM nucleos WHERE course_id = ?", (course_id,))
+        self._connection.executemany(
+            "INSERT INTO modulos (course_id, position, titulo) VALUES (?, ?, ?)",
+            [(course_id, modulo_index, modulo.titulo) for modulo_index, modulo in enumerate(course_data.modulos)]
+        )
+        self._connection.executemany(
+            """INSERT INTO nucleos (course_id, modulo_position, position, titulo, conteudo, video_script, teleprompter_text)
+               VALUES (?, ?, ?, ?, ?, ?, ?)""",
+            [
+                (
+                    course_id, modulo_index, nucleo_index, nucleo.titulo,
+                    nucleo.conteudo, nucleo.video_script, nucleo.teleprompter_text
+                )
+                for modulo_index, modulo in enumerate(course_data.modulos)
+                for nucleo_index, nucleo in enumerate(modulo.nucleos_conceituais)
+            ]
+        )
+
+    def save_course(self, course_data: CursoData, course_id: Optional[str] = None) -> str:
+        """Stores a whole course, replacing it if the id already exists.
+        course_data: The course data to be stored.
+        course_id: The id of the course; a new one is generated when omitted.
+        Returns: The course id.
+        """
+        course_id = course_id or uuid.uuid4().hex
+        with self._lock, self._connection:
+            self._write_course(course_id, course_data)
+        return course_id
+
+    def save_artifact(self, course_id: str, modulo_index: int, nucleo_index: int, artifact: str, text: str):
+        """Writes a single generated artifact of a núcleo, without touching the rest of the course."""
+        if artifact not in ARTIFACT_COLUMNS:
+            raise ValueError(f"Artefato desconhecido: {artifact}")
+        with self._lock, self._connection:
+            self._connection.execute(
+                f"UPDATE nucleos SET {artifact} = ? WHERE course_id = ? AND modulo_position = ? AND position = ?",
+                (text, course_id, modulo_index, nucleo_index)
+            )
+            self._connection.execute(
+                "UPDATE courses SET updated_at = ? WHERE id = ?", (datetime.utcnow().isoformat(), course_id)
+            )
+
+    @staticmethod
+    def _row_to_nucleo(row: sqlite3.Row) -> NucleoConceitual:
+        return NucleoConceitual(
+            titulo=row["titulo"],
+            conteudo=row["conteudo"],
+            video_script=row["video_script"],
+            teleprompter_text=row["teleprompter_text"]
+        )
+
+    def get_metadata(self, course_id: str) -> Optional[MetadadosCurso]:
+        """Returns the metadata of a course, or None if it does not exist."""
+        with self._lock:
+            row = self._connection.execute("SELECT metadata FROM courses WHERE id = ?", (course_id,)).fetchone()
+        return MetadadosCurso(**json.loads(row["metadata"])) if row is not None else None
+
+    def get_nucleo(self, course_id: str, modulo_index: int, nucleo_index: int) -> Optional[NucleoConceitual]:
+        """Returns a single núcleo, or None if it does not exist."""
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT * FROM nucleos WHERE course_id = ? AND modulo_position = ? AND position = ?",
+                (course_id, modulo_index, nucleo_index)
+            ).fetchone()
+        return self._row_to_nucleo(row) if row is not None else None
+
+    def get_modulo(self, course_id: str, modulo_index: int) -> Optional[Modulo]:
+        """Returns a single module with its núcleos, or None if it does not exist."""
+        with self._lock:
+            modulo = self._connection.execute(
+                "SELECT titulo FROM modulos WHERE course_id = ? AND position = ?", (course_id, modulo_index)
+            ).fetchone()
+            if modulo is None:
+                return None
+            nucleos = self._connection.execute(
+                "SELECT * FROM nucleos WHERE course_id = ? AND modulo_position = ? ORDER BY position",
+                (course_id, modulo_index)
+            ).fetchall()
+        return Modulo(titulo=modulo["titulo"], nucleos_conceituais=[self._row_to_nucleo(row) for row in nucleos])
+
+    def get_course(self, course_id: str) -> Optional[CursoData]:
+        """Returns a whole course, or None if it does not exist."""
+        metadata = self.get_metadata(course_id)
+        if metadata is None:
+            return None
+        with self._lock:
+            modulos = self._connection.execute(
+                "SELECT position, titulo FROM modulos WHERE course_id = ? ORDER BY position", (course_id,)
+            ).fetchall()
+            nucleos = self._connection.execute(
+                "SELECT * FROM nucleos WHERE course_id = ? ORDER BY modulo_position, position", (course_id,)
+            ).fetchall()
+        nucleos_by_modulo: Dict[int, List[NucleoConceitual]] = {}
+        for row in nucleos:
+            nucleos_by_modulo.setdefault(row["modulo_position"], []).append(self._row_to_nucleo(row))
+        return CursoData(
+            metadata=metadata,
+            modulos=[
+                Modulo(titulo=row["titulo"], nucleos_conceituais=nucleos_by_modulo.get(row["position"], []))
+                for row in modulos
+            ]
+        )
+
+    def latest_course_id(self) -> Optional[str]:
+        """Returns the id of the most recently created course, or None if there is none."""
+        with self._lock:
+            row = self._connection.execute("SELECT id FROM courses ORDER BY created_at DESC LIMIT 1").fetchone()
+        return row["id"] if row is not None else None
+
+    def list_courses(self) -> List[Dict[str, Any]]:
+        """Lists the stored courses (id, name and timestamps), most recent first."""
+        with self._lock:
+            rows = self._connection.execute(
+                """SELECT id, json_extract(metadata, '$.codigo_nome') AS codigo_nome, created_at, updated_at
+                   FROM courses ORDER BY created_at DESC"""
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+_course_store: Optional[CourseStore] = None
+
+def get_course_store() -> CourseStore:
+    """Returns the course store, opening its database on first use."""
+    global _course_store
+    if _course_store is None:
+        _course_store = CourseStore()
+    return _course_store
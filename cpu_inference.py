@@ -0,0 +1,127 @@
+######## Imports & Initializations #########
+import os
+# Importing os to read the CPU configuration from the environment.
+
+import logging
+# Importing logging to report the thread configuration and the memory footprint of the model.
+
+from typing import Any, Dict, Optional
+# Importing typing helpers for type hinting.
+
+###### CPU Inference Configuration ######
+# Threads used by a single operator (matrix multiplications) and threads running independent
+# operators in parallel. On CPU-only nodes the intra-op threads should match the physical cores
+# (hyper-threads slow the matrix multiplications down); by default all the cores seen by the process.
+def available_cpus() -> int:
+    """Returns the number of cores the process may run on (its affinity, e.g. a container's cpuset)."""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+CPU_INTRA_OP_THREADS = int(os.environ.get("EDU_CPU_THREADS", "0")) or available_cpus()
+CPU_INTER_OP_THREADS = int(os.environ.get("EDU_CPU_INTEROP_THREADS", "1"))
+
+# Quantization modes of the CPU backends: none (fp32) or dynamic int8 (the weights of the linear
+# layers are stored in int8, the activations are quantized on the fly at each matrix multiplication).
+QUANTIZATION_NONE = "none"
+QUANTIZATION_DYNAMIC_INT8 = "dynamic-int8"
+
+######## Thread Configuration ##########
+def configure_cpu_threads(intra_op_threads: int = CPU_INTRA_OP_THREADS, inter_op_threads: int = CPU_INTER_OP_THREADS):
+    """Sets the intra-op and inter-op thread pools of torch.
+
+    The inter-op pool can only be sized before torch runs its first parallel work, so a late call
+    keeps the current inter-op size and only logs it.
+    """
+    import torch
+    torch.set_num_threads(intra_op_threads)
+    try:
+        torch.set_num_interop_threads(inter_op_threads)
+    except RuntimeError:
+        logging.warning("The inter-op threads of torch are already set to %d", torch.get_num_interop_threads())
+    logging.info("CPU inference with %d intra-op and %d inter-op threads",
+                 torch.get_num_threads(), torch.get_num_interop_threads())
+
+######## Quantization ##########
+def quantize_model(model, quantization: str):
+    """Quantizes the linear layers of a model for CPU inference.
+    model: The loaded torch model (in fp32).
+    quantization: QUANTIZATION_NONE or QUANTIZATION_DYNAMIC_INT8.
+    Returns: The model to be used (quantized in place when possible).
+    Raises:
+        ValueError: If the quantization mode is unknown.
+    """
+    if quantization == QUANTIZATION_NONE:
+        return model
+    if quantization != QUANTIZATION_DYNAMIC_INT8:
+        raise ValueError(f"Modo de quantização desconhecido: {quantization}")
+    import torch
+    # The linear layers hold nearly all the weights of a decoder-only model; the embeddings and the
+    # normalizations are kept in fp32.
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+
+######## Memory Report ##########
+def tensor_bytes(value: Any) -> int:
+    """Bytes held by the tensors of a state dict value (quantized layers store tuples of packed tensors)."""
+    if isinstance(value, (tuple, list)):
+        return sum(tensor_bytes(item) for item in value)
+    if hasattr(value, "element_size") and hasattr(value, "numel"):
+        return value.numel() * value.element_size()
+    return 0
+
+def process_rss_bytes() -> Optional[int]:
+    """Returns the resident memory of the process, if the platform reports it."""
+    try:
+        with open("/proc/self/status", "r") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        import resource
+        # ru_maxrss is the peak resident memory, in KB on Linux.
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    except (ImportError, OSError):
+        return None
+
+def memory_report(generator) -> Dict[str, Any]:
+    """Reports the memory footprint of a loaded generator: its weights by dtype and the process memory."""
+    model = getattr(generator, "model", None)
+    report: Dict[str, Any] = {"process_rss_mb": None, "weights_mb": None, "weights_by_dtype_mb": None}
+    rss = process_rss_bytes()
+    if rss is not None:
+        report["process_rss_mb"] = round(rss / 2 ** 20, 1)
+    if hasattr(model, "state_dict"):
+        by_dtype: Dict[str, int] = {}
+        for value in model.state_dict().values():
+            tensors = value if isinstance(value, (tuple, list)) else (value,)
+            for tensor in tensors:
+                size = tensor_bytes(tensor)
+                if size:
+                    dtype = str(getattr(tensor, "dtype", "other")).replace("torch.", "")
+                    by_dtype[dtype] = by_dtype.get(dtype, 0) + size
+        report["weights_mb"] = round(sum(by_dtype.values()) / 2 ** 20, 1)
+        report["weights_by_dtype_mb"] = {dtype: round(size / 2 ** 20, 1) for dtype, size in sorted(by_dtype.items())}
+    return report
+
+######## CPU Pipeline ##########
+def load_cpu_pipeline(model_id: str, quantization: str, intra_op_threads: int = CPU_INTRA_OP_THREADS):
+    """Loads a text generation pipeline tuned for CPU-only nodes.
+    model_id: A Hugging Face model id or local path.
+    quantization: QUANTIZATION_NONE or QUANTIZATION_DYNAMIC_INT8.
+    intra_op_threads: Threads of each operator.
+    Returns: The pipeline, on CPU, with its model quantized as requested.
+    """
+    # Imported here so that the other backends do not require torch or transformers.
+    import torch
+    from transformers import AutoModelForCausalLM, AutoTokenizer, pipeline
+
+    configure_cpu_threads(intra_op_threads)
+    tokenizer = AutoTokenizer.from_pretrained(model_id)
+    # low_cpu_mem_usage loads the weights once instead of initializing a random model first,
+    # halving the peak memory of the load.
+    model = AutoModelForCausalLM.from_pretrained(model_id, torch_dtype=torch.float32, low_cpu_mem_usage=True)
+    model.eval()
+    model = quantize_model(model, quantization)
+    return pipeline('text-generation', model=model, tokenizer=tokenizer, device=-1)
@@ -1,17 +1,32 @@
 ######## Imports & Initializations #########
 import io
-from typing import BinaryIO
+import os
+import shutil
+import tempfile
+import logging
+import threading
+from contextlib import contextmanager
+from typing import Any, BinaryIO, Callable, Dict, Iterable, List, Optional
 # Importing the necessary modules and libraries for handling various file types and validating data.
 
+from concurrent.futures import ProcessPoolExecutor
+# Importing ProcessPoolExecutor to extract the pages of large PDFs and to run OCR in parallel processes.
+
 import pytesseract
-from PIL import Image
+from PIL import Image, ImageSequence
 # Importing Pytesseract and PIL (Pillow) for OCR (Optical Character Recognition) to extract text from images.
 
 from pdfminer import high_level
-# Importing pdfminer for extracting text from PDF files.
+from pdfminer.layout import LAParams
+from pdfminer.pdfpage import PDFPage
+# Importing pdfminer for extracting text from PDF files, its layout analysis parameters and its page iterator.
 
 from docx import Document
-# Importing the python-docx library to read DOCX files.
+from docx.oxml.table import CT_Tbl
+from docx.oxml.text.paragraph import CT_P
+from docx.table import Table
+from docx.text.paragraph import Paragraph
+# Importing the python-docx library to read DOCX files, with its paragraphs and tables in body order.
 
 import re
 # Importing the regex library for pattern matching and text extraction.
@@ -19,87 +34,522 @@ import re
 from cerberus import Validator
 # Importing Cerberus for validating the extracted metadata against a predefined schema.
 
+from data_models import CursoData, MetadadosCurso, Modulo, NucleoConceitual
+# Importing the data models built from the validated metadata and the extracted modules.
+
 from datetime import datetime
 # Importing datetime to handle date and time fields.
 
+import hashlib
+# Importing hashlib to identify the uploads by the SHA-256 of their contents.
+
+from disk_cache import DiskCache, make_cache_key
+# Importing the persistent, size-bounded LRU cache storing the extraction results.
+
+from metrics import stage_timer
+# Importing the stage timer, to report the time spent extracting, parsing and validating.
+
+###### Extraction Configuration ######
+# Number of processes extracting PDF pages and running OCR, and number of pages each process
+# extracts per task. Documents with a single chunk of pages are extracted in the calling process.
+EXTRACTION_WORKERS = int(os.environ.get("EDU_EXTRACTION_WORKERS", os.cpu_count() or 1))
+PDF_PAGES_PER_CHUNK = int(os.environ.get("EDU_PDF_PAGES_PER_CHUNK", "8"))
+
+# PDF pages whose text layer has fewer characters than this are considered scanned and sent to OCR,
+# rasterized at OCR_DPI. OCR_PAGE_TIMEOUT (in seconds) bounds the rasterization and the OCR of a page.
+OCR_MIN_PAGE_CHARS = int(os.environ.get("EDU_OCR_MIN_PAGE_CHARS", "20"))
+OCR_LANGUAGE = os.environ.get("EDU_OCR_LANGUAGE", "por")
+OCR_DPI = int(os.environ.get("EDU_OCR_DPI", "300"))
+OCR_PAGE_TIMEOUT = float(os.environ.get("EDU_OCR_PAGE_TIMEOUT", "60"))
+
+# Image files accepted as uploads, whose text is extracted by OCR.
+IMAGE_EXTENSIONS = ("png", "jpg", "jpeg", "tif", "tiff")
+
+_extraction_pool: Optional[ProcessPoolExecutor] = None
+
+def get_extraction_pool() -> ProcessPoolExecutor:
+    """Returns the process pool extracting PDF pages and running OCR, starting it on first use."""
+    global _extraction_pool
+    if _extraction_pool is None:
+        _extraction_pool = ProcessPoolExecutor(max_workers=EXTRACTION_WORKERS)
+    return _extraction_pool
+
+def shutdown_extraction_pool():
+    """Stops the extraction processes, if they were started."""
+    global _extraction_pool
+    if _extraction_pool is not None:
+        _extraction_pool.shutdown(wait=True)
+        _extraction_pool = None
+
+def run_extraction_tasks(function: Callable, tasks: List[tuple]) -> list:
+    """Runs function(*task) for each task, in the process pool when there is more than one task.
+    Returns: The results, in the order of the tasks.
+    """
+    if len(tasks) <= 1 or EXTRACTION_WORKERS <= 1:
+        return [function(*task) for task in tasks]
+    pool = get_extraction_pool()
+    futures = [pool.submit(function, *task) for task in tasks]
+    return [future.result() for future in futures]
+
+# Function to count the pages of a PDF file.
+def count_pdf_pages(pdf_path: str) -> int:
+    # Iterating over the page tree only, without analyzing the page contents.
+    with open(pdf_path, "rb") as pdf_file:
+        return sum(1 for _ in PDFPage.get_pages(pdf_file))
+
+# Function to extract the text of some pages of a PDF file (run in the pool processes).
+def extract_text_from_pdf_pages(pdf_path: str, page_numbers: List[int], laparams: Optional[LAParams] = None) -> List[str]:
+    text = high_level.extract_text(pdf_path, page_numbers=page_numbers, laparams=laparams)
+    # pdfminer ends every page with a form feed.
+    return text.split("\x0c")[:len(page_numbers)]
+
+# Function to extract the text of a PDF page by OCR (run in the pool processes).
+def extract_text_from_pdf_page_image(pdf_path: str, page_number: int) -> str:
+    # Imported here since rasterizing requires poppler, which is only needed for scanned documents.
+    from pdf2image import convert_from_path
+    try:
+        images = convert_from_path(
+            pdf_path, dpi=OCR_DPI, first_page=page_number + 1, last_page=page_number + 1, timeout=OCR_PAGE_TIMEOUT
+        )
+    except Exception as exc:
+        logging.warning("Could not rasterize PDF page %d: %s", page_number + 1, exc)
+        return ""
+    return extract_text_from_image(images[0]) if images else ""
+
+@contextmanager
+def file_path(file: BinaryIO, suffix: str = ""):
+    """Yields a path to the contents of a file object, so that the pool processes read it from disk.
+    Files opened from disk are used in place; other file objects (e.g. spooled uploads) are copied in
+    chunks to a temporary file, removed on exit.
+    """
+    name = getattr(file, "name", None)
+    if isinstance(name, str) and os.path.isfile(name):
+        yield name
+        return
+    with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as copy:
+        file.seek(0)
+        shutil.copyfileobj(file, copy)
+    try:
+        yield copy.name
+    finally:
+        os.remove(copy.name)
+
 # Function to extract text from a PDF file.
-def extract_text_from_pdf(pdf_file: BinaryIO) -> str:
-    # Optimize pdfminer for performance (consider different parsing strategies) 
-    return high_level.extract_text(pdf_file) 
+def extract_text_from_pdf(
+    pdf_file: BinaryIO,
+    laparams: Optional[LAParams] = None,
+    max_pages: Optional[int] = None,
+    ocr: bool = True
+) -> str:
+    """Extracts the text of a PDF file, splitting large documents in page ranges extracted in parallel.
+    pdf_file: The PDF file.
+    laparams: The pdfminer layout analysis parameters (e.g. LAParams(boxes_flow=None) skips the
+        reading order analysis, which is faster on simple documents); pdfminer's defaults when omitted.
+    max_pages: Optional limit of pages to extract, from the start of the document.
+    ocr: Whether the pages without a text layer (scans) are rasterized and read by OCR.
+    Returns: The text of the pages, in order (each page ends with a form feed, as in pdfminer).
+    """
+    # The document is never loaded in memory as a whole: every process reads it from disk.
+    with file_path(pdf_file, suffix=".pdf") as pdf_path:
+        page_count = count_pdf_pages(pdf_path)
+        if max_pages is not None:
+            page_count = min(page_count, max_pages)
+        chunks = [
+            list(range(start, min(start + PDF_PAGES_PER_CHUNK, page_count)))
+            for start in range(0, page_count, PDF_PAGES_PER_CHUNK)
+        ]
+        # Each process parses the document again, but only lays out the pages of its chunk.
+        pages = [
+            page
+            for chunk_pages in run_extraction_tasks(extract_text_from_pdf_pages, [(pdf_path, chunk, laparams) for chunk in chunks])
+            for page in chunk_pages
+        ]
+
+        if ocr:
+            scanned = [index for index, page in enumerate(pages) if len(page.strip()) < OCR_MIN_PAGE_CHARS]
+            if scanned:
+                ocr_pages = run_extraction_tasks(extract_text_from_pdf_page_image, [(pdf_path, index) for index in scanned])
+                for index, text in zip(scanned, ocr_pages):
+                    if text.strip():
+                        pages[index] = text
+    return "".join(page + "\x0c" for page in pages)
 
 # Function to extract text from a DOCX file.
 def extract_text_from_docx(docx_file: BinaryIO) -> str:
     # Loading the DOCX file using python-docx.
     doc = Document(docx_file)
-    # Joining all paragraphs' text into a single string separated by newline characters.
-    return "\n".join([para.text for para in doc.paragraphs])
+    lines = []
+    # Walking the body in document order, since most forms keep their sections in tables.
+    for element in doc.element.body.iterchildren():
+        if isinstance(element, CT_P):
+            lines.append(Paragraph(element, doc).text)
+        elif isinstance(element, CT_Tbl):
+            for row in Table(element, doc).rows:
+                # Merged cells are repeated by python-docx; each one is read once, a cell per line
+                # (e.g. the section label, then its value).
+                seen = set()
+                for cell in row.cells:
+                    if id(cell._tc) not in seen:
+                        seen.add(id(cell._tc))
+                        lines.append(cell.text)
+    # Joining all paragraphs' and cells' text into a single string separated by newline characters.
+    return "\n".join(lines)
 
 # Function to extract text from an image file.
 def extract_text_from_image(image: Image.Image) -> str:
     # Using Pytesseract to perform OCR and extract text from the provided image.
-    return pytesseract.image_to_string(image)
+    try:
+        text = pytesseract.image_to_string(image, lang=OCR_LANGUAGE, timeout=OCR_PAGE_TIMEOUT)
+    except RuntimeError as exc:
+        # Raised by pytesseract when the page exceeds the timeout: the page is left empty.
+        logging.warning("OCR failed: %s", exc)
+        return ""
+    # Tesseract ends its output with a form feed.
+    return text.replace("\x0c", "")
+
+# Function to extract text from the encoded bytes of an image (run in the pool processes).
+def extract_text_from_image_bytes(data: bytes) -> str:
+    return extract_text_from_image(Image.open(io.BytesIO(data)))
+
+# Function to extract text from an uploaded image file (PNG, JPEG or TIFF, possibly with several pages).
+def extract_text_from_image_file(image_file: BinaryIO) -> str:
+    image = Image.open(image_file)
+    frames = []
+    for frame in ImageSequence.Iterator(image):
+        # Each page of a multi-page TIFF is encoded on its own, so the pages are read in parallel.
+        buffer = io.BytesIO()
+        frame.save(buffer, format="PNG")
+        frames.append((buffer.getvalue(),))
+    return "".join(page + "\x0c" for page in run_extraction_tasks(extract_text_from_image_bytes, frames))
+
+###### Extraction Cache ######
+# Bumped whenever the text extractors or the parsers change their output, so that stale cached
+# results are no longer used.
+EXTRACTOR_VERSION = "2"
+PARSER_VERSION = "4"
+
+# Directory of the extraction cache and maximum size of its entries (in bytes).
+EXTRACTION_CACHE_DIR = os.environ.get("EDU_EXTRACTION_CACHE_DIR", os.path.join(".cache", "extraction"))
+EXTRACTION_CACHE_MAX_BYTES = int(os.environ.get("EDU_EXTRACTION_CACHE_MAX_BYTES", 256 * 1024 * 1024))
+
+# The text extractor of each supported file extension.
+TEXT_EXTRACTORS = {
+    "pdf": extract_text_from_pdf,
+    "doc": extract_text_from_docx,
+    "docx": extract_text_from_docx,
+    **{extension: extract_text_from_image_file for extension in IMAGE_EXTENSIONS},
+}
+
+_extraction_cache: Optional[DiskCache] = None
+
+def get_extraction_cache() -> DiskCache:
+    """Returns the extraction cache, creating its directory on first use."""
+    global _extraction_cache
+    if _extraction_cache is None:
+        _extraction_cache = DiskCache(EXTRACTION_CACHE_DIR, EXTRACTION_CACHE_MAX_BYTES)
+    return _extraction_cache
+
+def file_sha256(file: BinaryIO, chunk_size: int = 1024 * 1024) -> str:
+    """Returns the SHA-256 hex digest of a file's contents, read in chunks from the start."""
+    digest = hashlib.sha256()
+    file.seek(0)
+    for chunk in iter(lambda: file.read(chunk_size), b""):
+        digest.update(chunk)
+    file.seek(0)
+    return digest.hexdigest()
+
+def extract_text_cached(file: BinaryIO, file_extension: str, sha256: Optional[str] = None) -> str:
+    """Extracts the text of an uploaded file, reusing the result of a previous upload of the same bytes.
+    file: The file (e.g. a spooled upload), read from the start.
+    file_extension: The lowercase extension of the file, one of TEXT_EXTRACTORS.
+    sha256: The SHA-256 hex digest of the contents, when already known; computed otherwise.
+    Returns: The extracted text.
+    """
+    # The OCR settings are part of the key, since they change the text of scanned documents.
+    key = make_cache_key(
+        "text", EXTRACTOR_VERSION, file_extension, sha256 or file_sha256(file),
+        OCR_LANGUAGE, OCR_DPI, OCR_MIN_PAGE_CHARS
+    )
+    cache = get_extraction_cache()
+    text = cache.get(key)
+    if text is None:
+        file.seek(0)
+        with stage_timer(f"extract_text_{file_extension}"):
+            text = TEXT_EXTRACTORS[file_extension](file)
+        cache.set(key, text)
+    return text
+
+def parse_text_cached(parser: Callable[[str], Any], text: str) -> Any:
+    """Parses an extracted text (e.g. with extract_modulos), reusing the result for a text already parsed.
+    parser: The parsing function; its result must be JSON-serializable.
+    text: The extracted text.
+    Returns: The parsed result.
+    """
+    key = make_cache_key("parsed", PARSER_VERSION, parser.__name__, hashlib.sha256(text.encode("utf-8")).hexdigest())
+    cache = get_extraction_cache()
+    parsed = cache.get(key)
+    if parsed is None:
+        with stage_timer(parser.__name__):
+            parsed = parser(text)
+        cache.set(key, parsed)
+    return parsed
+
+###### Metadata Sections ######
+# Headings of the form sections and the MetadadosCurso field each one fills, with the kind of value
+# it holds. The headings are written lowercase and without accents; they are matched regardless of
+# case, accents and of the separators between their words (e.g. "Linha/Eixo").
+METADATA_SECTIONS = (
+    ("codigo_nome", "text", ("codigo e nome da disciplina", "codigo e nome")),
+    ("natureza", "text", ("natureza",)),
+    ("carga_horaria_semestral", "int", ("carga horaria semestral",)),
+    ("carga_horaria_semanal", "int", ("carga horaria semanal",)),
+    ("perfil_docente", "text", ("perfil docente", "perfil do docente")),
+    ("area_tematica", "text", ("area tematica",)),
+    ("linha_eixo_extensao_pesquisa", "text", ("linha eixo de extensao e pesquisa", "linha eixo de extensao", "linha eixo")),
+    ("competencias", "list", ("competencias",)),
+    ("ementa", "list", ("ementa",)),
+    ("objetivos", "list", ("objetivos", "objetivos de aprendizagem")),
+    ("objetivos_sociocomunitarios", "list", ("objetivos sociocomunitarios",)),
+    ("descricao_publico", "text", ("descricao do publico envolvido", "descricao do publico", "publico envolvido")),
+    ("justificativa", "text", ("justificativa",)),
+    ("procedimentos_ensino", "list", ("procedimentos de ensino aprendizagem", "procedimentos de ensino")),
+    ("temas_aprendizagem", "list", ("temas de aprendizagem",)),
+    ("procedimentos_avaliacao", "list", ("procedimentos de avaliacao",)),
+    ("bibliografia_basica", "list", ("bibliografia basica",)),
+    ("bibliografia_complementar", "list", ("bibliografia complementar",)),
+    ("data_inicio", "date", ("data de inicio", "data de inicio do curso")),
+)
+METADATA_SECTION_KINDS = {field: kind for field, kind, _ in METADATA_SECTIONS}
+
+# Letters that may carry an accent in the headings, and the separators accepted between their words.
+ACCENTED_LETTERS = {"a": "aáàâã", "e": "eéê", "i": "ií", "o": "oóôõ", "u": "uúü", "c": "cç"}
+HEADING_WORD_SEPARATOR = r"[ \t/\-–]+"
+
+def heading_pattern(heading: str) -> str:
+    """Turns a heading into a pattern accepting its accented spellings and any word separator."""
+    return HEADING_WORD_SEPARATOR.join(
+        "".join(f"[{ACCENTED_LETTERS[char]}]" if char in ACCENTED_LETTERS else re.escape(char) for char in word)
+        for word in heading.split()
+    )
+
+# A heading line: optional markdown hashes and section number, the section title (one of the
+# METADATA_SECTIONS headings, optionally followed by a parenthesized note) and an optional inline value
+# after a colon; or any other markdown heading, which ends the current section. Compiled once as a
+# single pattern, so each line is matched a single time.
+METADATA_HEADING_PATTERN = re.compile(
+    r"[ \t]*(?:#{1,6}[ \t]*)?(?:\d{1,2}[ \t]*[.)]?[ \t]+)?(?:"
+    + "|".join(
+        f"(?P<{field}__{index}>{heading_pattern(heading)})"
+        for field, _, headings in METADATA_SECTIONS
+        for index, heading in enumerate(headings)
+    )
+    + r")[ \t]*(?:\([^)]*\))?[ \t]*(?::[ \t]*(?P<value>.*?))?[ \t]*$"
+    + r"|[ \t]*#{1,6}[ \t]",
+    re.IGNORECASE
+)
+# Bullets and enumerations starting the items of list sections.
+LIST_ITEM_MARKER_PATTERN = re.compile(r"^\s*(?:[-•*▪–]|\d{1,3}[.)]|[a-z][.)])\s+")
+INTEGER_PATTERN = re.compile(r"\d+")
+DATE_PATTERNS = (
+    (re.compile(r"(\d{4})-(\d{1,2})-(\d{1,2})"), ("year", "month", "day")),
+    (re.compile(r"(\d{1,2})/(\d{1,2})/(\d{4})"), ("day", "month", "year")),
+)
+
+def metadata_heading_field(match: re.Match) -> Optional[str]:
+    """Returns the field of a METADATA_HEADING_PATTERN match, or None for other markdown headings."""
+    name = next((name for name, value in match.groupdict().items() if value and "__" in name), None)
+    return name.split("__")[0] if name is not None else None
+
+def parse_metadata_value(kind: str, lines: List[str]) -> Any:
+    """Converts the lines of a section to the value of its field (None when the section is empty)."""
+    lines = [line.strip() for line in lines if line.strip()]
+    if not lines:
+        return None
+    if kind == "int":
+        match = INTEGER_PATTERN.search(" ".join(lines))
+        return int(match.group()) if match else None
+    if kind == "date":
+        text = " ".join(lines)
+        for pattern, parts in DATE_PATTERNS:
+            match = pattern.search(text)
+            if match:
+                date = dict(zip(parts, map(int, match.groups())))
+                return f"{date['year']:04d}-{date['month']:02d}-{date['day']:02d}"
+        return text
+    if kind == "list":
+        if len(lines) == 1 and ";" in lines[0]:
+            lines = lines[0].split(";")
+        items = [LIST_ITEM_MARKER_PATTERN.sub("", line).strip().rstrip(";") for line in lines]
+        return [item for item in items if item]
+    return "\n".join(lines)
 
 def extract_course_metadata(text: str) -> dict:
-    """Extracts course metadata using regex (with table handling).
+    """Extracts course metadata from the numbered sections of the form (with table handling).
+
+    The text is walked once, line by line: each heading line (e.g. "### 8 Competências", or a
+    "Competências" table label cell) opens the section of its MetadadosCurso field, and the
+    following lines, up to the next heading, are its value. List fields take one item per line.
     text: The text from which metadata is to be extracted.
-    Returns: A dictionary containing the extracted metadata.
+    Returns: A dictionary containing the extracted metadata (only the sections found).
     """
     metadata = {}
-    
-    # Example: Extract 'Código e nome da disciplina'
-    match = re.search(r'###\s*1\s*Código\s*e\s*nome\s*da\s*disciplina\n(.*?)\n', text, re.IGNORECASE | re.DOTALL)
-    if match:
-        metadata['codigo_nome'] = match.group(1).strip()
-    
-    # TODO: Add similar regex patterns for other metadata fields
-    # Options?
+    sections: Dict[str, List[str]] = {}
+    current: Optional[List[str]] = None
+
+    for line in text.splitlines():
+        match = METADATA_HEADING_PATTERN.match(line)
+        if match is None:
+            if current is not None:
+                current.append(line)
+            continue
+        field = metadata_heading_field(match)
+        # Other markdown headings close the section; the first section of a field wins, so repeated
+        # headings (e.g. page headers) are ignored.
+        current = None
+        if field is not None and field not in sections:
+            current = sections[field] = [match.group("value") or ""]
+
+    for field, lines in sections.items():
+        value = parse_metadata_value(METADATA_SECTION_KINDS[field], lines)
+        if value is not None:
+            metadata[field] = value
     
     # Returning the extracted metadata as a dictionary.
     return metadata
 
+###### Module Parsing ######
+# A module heading ("### 2 Título do módulo") and a núcleo line ("2.1 Título do núcleo").
+MODULE_HEADING_PATTERN = re.compile(r"[ \t]*#{1,6}[ \t]*(\d+)[ \t]*[.)\-–]?[ \t]*(.*?)[ \t]*$")
+NUCLEO_PATTERN = re.compile(r"[ \t]*\d+\.\d+\.?[ \t]+(.*?)[ \t]*$")
+
+class ModulosParser:
+    """Builds the module/núcleo tree of a plan in a single pass over its lines.
+
+    The text can be fed in pieces (e.g. page by page, as it is extracted); a line split between two
+    pieces is kept until it is complete. Modules and núcleos record the line they start on (1-based).
+    Headings of metadata sections (e.g. "### 9 Ementa") and other markdown headings close the current
+    module instead of opening one.
+    """
+
+    def __init__(self):
+        self.modulos: List[dict] = []
+        self._current: Optional[dict] = None
+        self._pending = ""
+        self._line_number = 0
+
+    def _parse_line(self, line: str):
+        self._line_number += 1
+        # A page starts with the form feed ending the previous one, which is not part of its first line.
+        line = line.lstrip("\x0c").rstrip()
+        # Only markdown headings open or close modules, so the other lines skip the heading patterns.
+        heading = METADATA_HEADING_PATTERN.match(line) if line.lstrip().startswith("#") else None
+        if heading is not None:
+            module = MODULE_HEADING_PATTERN.match(line)
+            if metadata_heading_field(heading) is None and module is not None and module.group(2):
+                self._current = {'titulo': module.group(2), 'linha': self._line_number, 'nucleos_conceituais': []}
+                self.modulos.append(self._current)
+            else:
+                self._current = None
+            return
+        if self._current is not None:
+            nucleo = NUCLEO_PATTERN.match(line)
+            if nucleo is not None and nucleo.group(1):
+                self._current['nucleos_conceituais'].append({'titulo': nucleo.group(1), 'linha': self._line_number})
+
+    def feed(self, text: str):
+        """Parses the complete lines of a piece of text, keeping its last line if unterminated."""
+        lines = (self._pending + text).split("\n")
+        self._pending = lines.pop()
+        for line in lines:
+            self._parse_line(line)
+
+    def close(self) -> List[dict]:
+        """Parses the last line and returns the modules."""
+        if self._pending:
+            self._parse_line(self._pending)
+            self._pending = ""
+        return self.modulos
+
 def extract_modulos(text: str) -> list:
     """Extracts modules and núcleos conceituais from the provided text.
     text: The text from which modules and conceptual nuclei are to be extracted.
-    Returns: A list of dictionaries, each containing the title and conceptual nuclei of a module.
+    Returns: A list of dictionaries, each containing the title, line and conceptual nuclei of a module.
     """
-    modulos = []
-    
-    # Example: Extract modules and their titles
-    for modulo_match in re.findall(r'###\s*(\d+)\s*(.*?)\n(.*?)(?=\n###|\Z)', text, re.IGNORECASE | re.DOTALL):
-        modulo_titulo = modulo_match[1].strip()
-        nucleos_conceituais = []
-        
-        # Example: Extract núcleos conceituais within each module
-        for nucleo_match in re.findall(r'\d+\.\d+\s*(.*?)\n', modulo_match[2], re.IGNORECASE):
-            nucleos_conceituais.append({'titulo': nucleo_match.strip()})
-        
-        modulos.append({'titulo': modulo_titulo, 'nucleos_conceituais': nucleos_conceituais})
-    
-    return modulos
+    parser = ModulosParser()
+    parser.feed(text)
+    return parser.close()
+
+###### Validation ######
+# Separators of the items of list fields given as a single string (e.g. typed in a form).
+LIST_SEPARATOR_PATTERN = re.compile(r"\s*[;,\n]\s*")
+DATE_FORMATS = ("%Y-%m-%d", "%Y-%m-%dT%H:%M:%S", "%d/%m/%Y")
+
+class CourseMetadataValidator(Validator):
+    """Cerberus validator of the course metadata, with the coercions of form values and the
+    time-relative rules, which are evaluated on every validation rather than when the schema is built."""
+
+    def _normalize_coerce_datetime(self, value):
+        if isinstance(value, str):
+            for date_format in DATE_FORMATS:
+                try:
+                    return datetime.strptime(value.strip(), date_format)
+                except ValueError:
+                    continue
+        return value
+
+    def _normalize_coerce_integer(self, value):
+        if isinstance(value, str):
+            match = INTEGER_PATTERN.search(value)
+            return int(match.group()) if match else value
+        if isinstance(value, float) and value.is_integer():
+            return int(value)
+        return value
+
+    def _normalize_coerce_list(self, value):
+        if isinstance(value, str):
+            return [item for item in LIST_SEPARATOR_PATTERN.split(value) if item]
+        return value
+
+    def _validate_not_in_past(self, not_in_past, field, value):
+        """ {'type': 'boolean'} """
+        if not_in_past and isinstance(value, datetime) and value.date() < datetime.now().date():
+            self._error(field, "não pode ser anterior à data atual")
 
 # Cerberus schema for validation 
 course_metadata_schema = {
     'codigo_nome': {'type': 'string', 'required': True},
     'natureza': {'type': 'string', 'required': True, 'allowed': ['Extensão', 'Aperfeiçoamento', 'Outro']},
-    'carga_horaria_semestral': {'type': 'integer', 'required': True, 'min': 1},
-    'carga_horaria_semanal': {'type': 'integer', 'required': True, 'min': 1},
+    'carga_horaria_semestral': {'type': 'integer', 'coerce': 'integer', 'required': True, 'min': 1},
+    'carga_horaria_semanal': {'type': 'integer', 'coerce': 'integer', 'required': True, 'min': 1},
     'perfil_docente': {'type': 'string', 'required': True},
     'area_tematica': {'type': 'string', 'required': True},
     'linha_eixo_extensao_pesquisa': {'type': 'string', 'required': True},
-    'competencias': {'type': 'list', 'required': True, 'schema': {'type': 'string'}},
-    'ementa': {'type': 'list', 'required': True, 'schema': {'type': 'string'}},
-    'objetivos': {'type': 'list', 'required': True, 'schema': {'type': 'string'}},
-    'objetivos_sociocomunitarios': {'type': 'list', 'required': True, 'schema': {'type': 'string'}},
+    'competencias': {'type': 'list', 'coerce': 'list', 'required': True, 'schema': {'type': 'string'}},
+    'ementa': {'type': 'list', 'coerce': 'list', 'required': True, 'schema': {'type': 'string'}},
+    'objetivos': {'type': 'list', 'coerce': 'list', 'required': True, 'schema': {'type': 'string'}},
+    'objetivos_sociocomunitarios': {'type': 'list', 'coerce': 'list', 'required': True, 'schema': {'type': 'string'}},
     'descricao_publico': {'type': 'string', 'required': True},
     'justificativa': {'type': 'string', 'required': True},
-    'procedimentos_ensino': {'type': 'list', 'required': True, 'schema': {'type': 'string'}},
-    'temas_aprendizagem': {'type': 'list', 'required': True, 'schema': {'type': 'string'}},
-    'procedimentos_avaliacao': {'type': 'list', 'required': True, 'schema': {'type': 'string'}},
-    'bibliografia_basica': {'type': 'list', 'required': True, 'schema': {'type': 'string'}},
-    'bibliografia_complementar': {'type': 'list', 'required': True, 'schema': {'type': 'string'}},
-    'data_inicio': {'type': 'datetime', 'coerce': 'datetime', 'min': datetime.now(), 'required': True},
+    'procedimentos_ensino': {'type': 'list', 'coerce': 'list', 'required': True, 'schema': {'type': 'string'}},
+    'temas_aprendizagem': {'type': 'list', 'coerce': 'list', 'required': True, 'schema': {'type': 'string'}},
+    'procedimentos_avaliacao': {'type': 'list', 'coerce': 'list', 'required': True, 'schema': {'type': 'string'}},
+    'bibliografia_basica': {'type': 'list', 'coerce': 'list', 'required': True, 'schema': {'type': 'string'}},
+    'bibliografia_complementar': {'type': 'list', 'coerce': 'list', 'required': True, 'schema': {'type': 'string'}},
+    # Checked against the current date on every validation, so a long-running server does not drift.
+    'data_inicio': {'type': 'datetime', 'coerce': 'datetime', 'not_in_past': True, 'required': True},
 }
 
+# Cerberus validators keep the state of the document being validated, so each thread reuses its own
+# one; the schema is only checked when a thread builds its validator.
+_validators = threading.local()
+
+def get_course_metadata_validator() -> CourseMetadataValidator:
+    """Returns the metadata validator of the current thread, building it on first use."""
+    validator = getattr(_validators, "validator", None)
+    if validator is None:
+        validator = _validators.validator = CourseMetadataValidator(course_metadata_schema)
+    return validator
+
 def validate_course_metadata(metadata: dict) -> dict:
     """Validates extracted metadata using Cerberus.
     metadata: The dictionary containing extracted metadata.
@@ -107,13 +557,56 @@ def validate_course_metadata(metadata: dict) -> dict:
     Raises:
         ValueError: If the metadata does not conform to the schema.
     """
-    # Creating a Cerberus validator with the defined schema.
-    validator = Validator(course_metadata_schema)
+    validator = get_course_metadata_validator()
     # Returning the validated metadata if it conforms to the schema.
-    if validator.validate(metadata):
+    if validator.validate(metadata or {}):
         return validator.document
     else:
         # Raising a ValueError if the metadata does not conform to the schema.
         raise ValueError(f"Metadados do curso inválidos: {validator.errors}")
-        
 
+def build_course_metadata(metadata: dict) -> MetadadosCurso:
+    """Validates the metadata and builds the MetadadosCurso model in a single pass.
+
+    The Cerberus schema enforces the same types and bounds as the model, so the model is built
+    from the validated document without running the pydantic validation again.
+    metadata: The dictionary containing the metadata.
+    Returns: The course metadata.
+    Raises:
+        ValueError: If the metadata does not conform to the schema.
+    """
+    return MetadadosCurso.model_construct(**validate_course_metadata(metadata))
+
+def validate_many(records: Iterable[dict]) -> List[dict]:
+    """Validates a batch of metadata records (e.g. a nightly import), without stopping at the first invalid one.
+    records: The metadata dictionaries.
+    Returns: For each record, in order, a dictionary with "valid", the validated "document" (None if
+        invalid) and the Cerberus "errors" (empty if valid).
+    """
+    validator = get_course_metadata_validator()
+    results = []
+    for record in records:
+        if validator.validate(record or {}):
+            results.append({"valid": True, "document": validator.document, "errors": {}})
+        else:
+            results.append({"valid": False, "document": None, "errors": validator.errors})
+    return results
+
+def course_data_from_texts(form_text: str, plan_text: str, form_data: Optional[dict] = None) -> CursoData:
+    """Builds the course data from the extracted texts of the form and of the plan.
+    form_text: The text of the form, from which the metadata is extracted.
+    plan_text: The text of the plan, from which the modules and núcleos are extracted.
+    form_data: Optional metadata fields taking precedence over the ones extracted from the form.
+    Returns: The validated course data.
+    Raises:
+        ValueError: If the metadata does not conform to the schema.
+    """
+    course_metadata_dict = {**parse_text_cached(extract_course_metadata, form_text), **(form_data or {})}
+    with stage_timer("validation"):
+        course_metadata = build_course_metadata(course_metadata_dict)
+    modulos_data = parse_text_cached(extract_modulos, plan_text)
+    modulos = [
+        Modulo(titulo=m['titulo'], nucleos_conceituais=[NucleoConceitual(**nc) for nc in m['nucleos_conceituais']])
+        for m in modulos_data
+    ]
+    return CursoData(metadata=course_metadata, modulos=modulos)
@@ -48,10 +48,10 @@ class MetadadosCurso(BaseModel):
 class NucleoConceitual(BaseModel):
     # Title of the conceptual nucleus.
     titulo: str = Field(..., description="Título do Núcleo Conceitual")
-    # Generated textual content.
-    conteudo: str = Field(..., description="Conteúdo textual gerado")
-    # Generated video script.
-    video_script: str = Field(..., description="Roteiro do vídeo gerado")
+    # Generated textual content. None until it is generated.
+    conteudo: Optional[str] = Field(None, description="Conteúdo textual gerado")
+    # Generated video script. None until it is generated.
+    video_script: Optional[str] = Field(None, description="Roteiro do vídeo gerado")
     # Optionally generated teleprompter text.
     teleprompter_text: Optional[str] = Field(None, description="Texto para teleprompter gerado")
 
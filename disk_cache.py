@@ -0,0 +1,171 @@
+######## Imports & Initializations #########
+import os
+# Importing os to manage the cache files and their access times.
+
+import json
+# Importing json to serialize the cached values.
+
+import hashlib
+# Importing hashlib to derive content-addressed keys (SHA-256).
+
+import time
+# Importing time to resynchronize the index with the directory periodically.
+
+import threading
+# Importing threading to protect the index, since the cache is used from worker threads too.
+
+from collections import OrderedDict
+# Importing OrderedDict to keep the entries in least-recently-used order.
+
+from typing import Any, Dict, Optional
+# Importing typing helpers for type hinting.
+
+import logging
+# Importing logging to report unreadable cache entries.
+
+######## make_cache_key Function ##########
+def make_cache_key(*parts: Any) -> str:
+    """Derives a content-addressed key from JSON-serializable parts.
+    parts: The values identifying the cached result (e.g. prompt, model id, parameters).
+    Returns: The SHA-256 hex digest of the canonical JSON of the parts.
+    """
+    canonical = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+######## DiskCache Class ##########
+class DiskCache:
+    """Persistent key/value cache storing one JSON file per entry, bounded in size.
+
+    When the total size of the entries exceeds `max_bytes`, the least recently used ones are
+    evicted. The recency order survives restarts through the modification time of the files,
+    which is refreshed on every hit.
+
+    Several processes (e.g. API workers) may share the directory: a key missing from the index of
+    this process is looked up on disk, and the index is rebuilt from the directory every
+    `sync_seconds` and before evicting, so the limit applies to the entries of every process.
+    """
+
+    def __init__(self, directory: str, max_bytes: int, sync_seconds: float = 30.0):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.sync_seconds = sync_seconds
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._total_bytes = 0
+        self._synced_at = 0.0
+        os.makedirs(directory, exist_ok=True)
+        self._load_index()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _load_index(self):
+        """Rebuilds the LRU index from the files in the cache directory, written by any process."""
+        files = []
+        for entry in os.scandir(self.directory):
+            try:
+                if entry.is_file() and entry.name.endswith(".json"):
+                    stat = entry.stat()
+                    files.append((stat.st_mtime, entry.name[:-len(".json")], stat.st_size))
+            except FileNotFoundError:
+                # Evicted by another process while scanning.
+                continue
+        self._entries.clear()
+        self._total_bytes = 0
+        for _, key, size in sorted(files):
+            self._entries[key] = size
+            self._total_bytes += size
+        self._synced_at = time.monotonic()
+
+    def _adopt(self, key: str) -> bool:
+        """Adds to the index an entry written by another process since the last synchronization."""
+        try:
+            size = os.stat(self._path(key)).st_size
+        except FileNotFoundError:
+            return False
+        self._entries[key] = size
+        self._total_bytes += size
+        return True
+
+    def get(self, key: str) -> Optional[Any]:
+        """Returns the cached value of a key, or None on a miss."""
+        with self._lock:
+            if key not in self._entries and not self._adopt(key):
+                self.misses += 1
+                return None
+            try:
+                with open(self._path(key), "r", encoding="utf-8") as f:
+                    value = json.load(f)
+            except FileNotFoundError:
+                # Evicted by another process.
+                self._remove(key)
+                self.misses += 1
+                return None
+            except (OSError, ValueError) as exc:
+                logging.warning("Discarding unreadable cache entry %s: %s", key, exc)
+                self._remove(key)
+                self.misses += 1
+                return None
+            # Marking the entry as the most recently used one, also on disk.
+            self._entries.move_to_end(key)
+            try:
+                os.utime(self._path(key))
+            except FileNotFoundError:
+                pass
+            self.hits += 1
+            return value
+
+    def set(self, key: str, value: Any):
+        """Stores a JSON-serializable value and evicts the least recently used entries if needed."""
+        data = json.dumps(value, ensure_ascii=False).encode("utf-8")
+        with self._lock:
+            # Writing to a temporary file first so a crash never leaves a truncated entry behind.
+            temp_path = f"{self._path(key)}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(temp_path, "wb") as f:
+                f.write(data)
+            os.replace(temp_path, self._path(key))
+            self._total_bytes += len(data) - self._entries.pop(key, 0)
+            self._entries[key] = len(data)
+            if self._total_bytes > self.max_bytes or time.monotonic() - self._synced_at > self.sync_seconds:
+                # The other processes' entries count towards the limit, and their hits towards the recency.
+                self._load_index()
+            while self._total_bytes > self.max_bytes and len(self._entries) > 1:
+                self._remove(next(iter(self._entries)))
+                self.evictions += 1
+
+    def _remove(self, key: str):
+        self._total_bytes -= self._entries.pop(key, 0)
+        try:
+            os.remove(self._path(key))
+        except FileNotFoundError:
+            pass
+
+    def invalidate(self, key: str) -> bool:
+        """Removes an entry. Returns: True if the entry existed."""
+        with self._lock:
+            existed = key in self._entries
+            self._remove(key)
+            return existed
+
+    def clear(self):
+        """Removes every entry of the cache."""
+        with self._lock:
+            for key in list(self._entries):
+                self._remove(key)
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns the hit/miss counters and the current size of the cache."""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._total_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
@@ -0,0 +1,71 @@
+######## Imports & Initializations #########
+import os
+# Importing os to read the cache configuration from the environment.
+
+from typing import Dict, List, Optional
+# Importing typing helpers for type hinting.
+
+from disk_cache import DiskCache, make_cache_key
+# Importing the persistent, size-bounded LRU cache and its content-addressed key derivation.
+
+from inference_worker import InferenceWorker, generate_texts, DEFAULT_WORKER_BATCH_SIZE, ARTIFACT_PARAM
+# Importing the helper that runs the prompts that are not cached yet, and the parameter naming the artifact of a call.
+
+###### Cache Configuration ######
+# Directory of the generation cache and maximum size of its entries (in bytes).
+GENERATION_CACHE_DIR = os.environ.get("EDU_GENERATION_CACHE_DIR", os.path.join(".cache", "generation"))
+GENERATION_CACHE_MAX_BYTES = int(os.environ.get("EDU_GENERATION_CACHE_MAX_BYTES", 512 * 1024 * 1024))
+
+_generation_cache: Optional[DiskCache] = None
+
+def get_generation_cache() -> DiskCache:
+    """Returns the generation cache, creating its directory on first use."""
+    global _generation_cache
+    if _generation_cache is None:
+        _generation_cache = DiskCache(GENERATION_CACHE_DIR, GENERATION_CACHE_MAX_BYTES)
+    return _generation_cache
+
+######## Cache Keys ##########
+def model_id_of(generator) -> str:
+    """Identifies the model behind a generator (an InferenceWorker or a text generation pipeline)."""
+    if isinstance(generator, InferenceWorker):
+        # The worker may not have loaded its model yet, so it is identified by the configured id.
+        if generator.model_id:
+            return generator.model_id
+        generator = generator.generator
+    model = getattr(generator, 'model', None)
+    return getattr(model, 'name_or_path', None) or type(generator).__name__
+
+def generation_cache_key(prompt: str, model_id: str, params: Dict) -> str:
+    """Derives the cache key of a generation from the rendered prompt, the model and the sampling parameters."""
+    # The artifact name only labels the metrics, so it does not change the key.
+    return make_cache_key(prompt, model_id, {key: value for key, value in params.items() if key != ARTIFACT_PARAM})
+
+######## generate_texts_cached Function ##########
+async def generate_texts_cached(
+    generator,
+    prompts: List[str],
+    params: Dict,
+    batch_size: int = DEFAULT_WORKER_BATCH_SIZE,
+    use_cache: bool = True
+) -> List[str]:
+    """Generates the texts of a list of prompts, skipping the model for the cached ones.
+    generator: An InferenceWorker, or a text generation pipeline.
+    prompts: The prompts, all generated with the same parameters.
+    params: The generation parameters (e.g. max_new_tokens, temperature).
+    batch_size: Maximum number of prompts per pipeline call when a plain pipeline is given.
+    use_cache: When False, the cache is bypassed and the fresh results replace the cached ones.
+    Returns: The generated text of each prompt, in order.
+    """
+    cache = get_generation_cache()
+    model_id = model_id_of(generator)
+    keys = [generation_cache_key(prompt, model_id, params) for prompt in prompts]
+
+    texts: List[Optional[str]] = [cache.get(key) if use_cache else None for key in keys]
+    missing = [index for index, text in enumerate(texts) if text is None]
+    if missing:
+        generated = await generate_texts(generator, [prompts[index] for index in missing], params, batch_size=batch_size)
+        for index, text in zip(missing, generated):
+            texts[index] = text
+            cache.set(keys[index], text)
+    return texts
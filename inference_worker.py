@@ -0,0 +1,498 @@
+######## Imports & Initializations #########
+import asyncio
+# Importing asyncio for the request queue and the awaitable futures returned to the callers.
+
+from concurrent.futures import ThreadPoolExecutor
+# Importing ThreadPoolExecutor to run the model on a dedicated thread, off the event loop.
+
+from dataclasses import dataclass, field
+# Importing dataclass to describe the requests waiting in the queue.
+
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Pattern, Tuple
+# Importing typing helpers for type hinting.
+
+from functools import lru_cache
+# Importing lru_cache to build the token streamer class only once.
+
+import logging
+# Importing logging to report worker errors.
+
+import re
+# Importing the regex library to end the completions at their stop patterns.
+
+import time
+# Importing time to measure the model calls and the time the requests wait in the queue.
+
+from metrics import STAGE_SECONDS, record_generation
+# Importing the metrics of the model calls and of the inference queue.
+
+# Default maximum number of requests waiting in the queue before submitters have to wait.
+DEFAULT_MAX_QUEUE_SIZE = 64
+# Default maximum number of queued prompts sent to the model in a single call.
+DEFAULT_WORKER_BATCH_SIZE = 8
+
+# Generation parameter holding the regex patterns that end a completion. It is handled here rather
+# than by the pipeline: a pattern matching the completion stops the generation of that sequence,
+# and the completion is cut at the start of the match (or at the end of its first group, if any).
+STOP_PATTERNS_PARAM = "stop_patterns"
+# Number of trailing tokens checked for a line break before matching the stop patterns.
+STOP_CHECK_TOKENS = 3
+# Generation parameter requesting assisted decoding with the draft model (see assisted_decoding); its
+# value names the statistics the call is counted in. Generators without a draft model ignore it.
+ASSISTED_PARAM = "assisted"
+# Generation parameter naming the artifact a call generates, so its token counts and throughput are
+# reported under that name (see metrics). It never reaches the pipeline.
+ARTIFACT_PARAM = "artifact"
+
+######## Stop Patterns ##########
+@lru_cache(maxsize=None)
+def compile_stop_patterns(patterns: Tuple[str, ...]) -> List[Pattern]:
+    return [re.compile(pattern, re.DOTALL) for pattern in patterns]
+
+def stop_position(completion: str, patterns: Tuple[str, ...]) -> Optional[int]:
+    """Returns where a completion ends according to the stop patterns, or None if none matches.
+
+    Matches before the first non-blank character are ignored, so a completion starting with what a
+    pattern stops at (e.g. a heading) is not cut down to nothing.
+    """
+    content_start = len(completion) - len(completion.lstrip())
+    positions = []
+    for pattern in compile_stop_patterns(patterns):
+        match = pattern.search(completion, content_start)
+        if match:
+            positions.append(match.end(1) if pattern.groups else match.start())
+    return min(positions) if positions else None
+
+def apply_stop_patterns(text: str, prompt: str, patterns: Tuple[str, ...]) -> str:
+    """Cuts a generated text at its stop patterns, which only apply to the completion (not to an echoed prompt)."""
+    start = len(prompt) if text.startswith(prompt) else 0
+    position = stop_position(text[start:], patterns) if patterns else None
+    return text if position is None else text[:start + position].rstrip()
+
+@lru_cache(maxsize=None)
+def stop_criteria_class():
+    """Builds a transformers StoppingCriteria ending each sequence of a batch at its stop patterns."""
+    # Imported here so that generators without a tokenizer (e.g. the stub) do not require transformers.
+    import torch
+    from transformers import StoppingCriteria
+
+    class StopPatternsCriteria(StoppingCriteria):
+        def __init__(self, tokenizer, patterns: Tuple[str, ...], prompt_length: Optional[int] = None):
+            self.tokenizer = tokenizer
+            self.patterns = patterns
+            self.prompt_length = prompt_length
+            self.start = 0
+            self.length = None
+
+        def for_prompt(self, prompt_length: int) -> "StopPatternsCriteria":
+            """Returns a copy of the criteria for a generate call whose (padded) prompt has `prompt_length` tokens."""
+            return type(self)(self.tokenizer, self.patterns, prompt_length)
+
+        def __call__(self, input_ids, scores, **kwargs):
+            if self.prompt_length is not None:
+                self.start = self.prompt_length
+            elif self.length is None or input_ids.shape[1] != self.length + 1:
+                # Without an explicit prompt length (calls through the pipeline, which decode one token
+                # per step), a call starts after its prompt, one token before the first length seen.
+                self.start = input_ids.shape[1] - 1
+            self.length = input_ids.shape[1]
+            done = torch.zeros(input_ids.shape[0], dtype=torch.bool, device=input_ids.device)
+            tails = self.tokenizer.batch_decode(input_ids[:, -STOP_CHECK_TOKENS:], skip_special_tokens=True)
+            for row, tail in enumerate(tails):
+                # The stop patterns end right after a line break, so the completion is only decoded
+                # and matched when one was just generated.
+                if "\n" in tail:
+                    completion = self.tokenizer.decode(input_ids[row, self.start:], skip_special_tokens=True)
+                    done[row] = stop_position(completion, self.patterns) is not None
+            return done
+
+    return StopPatternsCriteria
+
+def prepare_stop_patterns(generator, params: Dict) -> Tuple[Dict, Tuple[str, ...]]:
+    """Replaces the stop patterns of the generation parameters by a stopping criteria the pipeline understands.
+    The artifact name is dropped, and so is the assisted decoding request unless the generator has a draft model.
+    Returns: The pipeline parameters, and the stop patterns to cut the returned texts with.
+    """
+    params = dict(params)
+    params.pop(ARTIFACT_PARAM, None)
+    patterns = tuple(params.pop(STOP_PATTERNS_PARAM, ()))
+    if getattr(generator, 'assistant_model', None) is None:
+        params.pop(ASSISTED_PARAM, None)
+    tokenizer = getattr(generator, 'tokenizer', None)
+    if patterns and tokenizer is not None:
+        from transformers import StoppingCriteriaList
+        params['stopping_criteria'] = StoppingCriteriaList([stop_criteria_class()(tokenizer, patterns)])
+    return params, patterns
+
+def bind_prompt_length(params: Dict, prompt_length: int) -> Dict:
+    """Binds the stop criteria of the generation parameters to the prompt length of a direct model.generate call.
+
+    Generators calling model.generate themselves (prefix cache, assisted decoding) know the length of
+    the prompt, which the criteria cannot infer when several tokens are added per step.
+    Returns: The parameters with their own copy of the stop criteria.
+    """
+    criteria = params.get('stopping_criteria')
+    if not criteria:
+        return params
+    from transformers import StoppingCriteriaList
+    stop_criteria = stop_criteria_class()
+    return {**params, 'stopping_criteria': StoppingCriteriaList([
+        criterion.for_prompt(prompt_length) if isinstance(criterion, stop_criteria) else criterion
+        for criterion in criteria
+    ])}
+
+######## Generator Helpers ##########
+def prepare_generator_for_batching(generator):
+    """Configures a text generation pipeline so it can receive padded batches.
+    generator: The text generation pipeline.
+    Returns: The same generator, ready for batched calls.
+    """
+    tokenizer = getattr(generator, 'tokenizer', None)
+    if tokenizer is None:
+        return generator
+    # Decoder-only models (e.g. Mistral) have no padding token and must be padded on the left,
+    # otherwise the generated tokens would follow the padding instead of the prompt.
+    if tokenizer.pad_token_id is None:
+        tokenizer.pad_token_id = tokenizer.eos_token_id
+    tokenizer.padding_side = 'left'
+    return generator
+
+def run_generator_batch(generator, prompts: List[str], params: Dict) -> List[str]:
+    """Runs a list of prompts through the generator in a single call (blocking).
+    generator: The text generation pipeline.
+    prompts: The prompts, all generated with the same parameters.
+    params: The generation parameters (e.g. max_new_tokens, temperature).
+    Returns: The generated text of each prompt, in order.
+    """
+    artifact = params.get(ARTIFACT_PARAM)
+    params, patterns = prepare_stop_patterns(generator, params)
+    start = time.perf_counter()
+    results = generator(prompts, batch_size=len(prompts), **params)
+    # The pipeline returns one list of sequences per prompt.
+    texts = [apply_stop_patterns(result[0]['generated_text'], prompt, patterns) for prompt, result in zip(prompts, results)]
+    record_generation(
+        artifact, getattr(generator, 'tokenizer', None), prompts,
+        [completion_of(text, prompt) for prompt, text in zip(prompts, texts)], time.perf_counter() - start
+    )
+    return texts
+
+def completion_of(text: str, prompt: str) -> str:
+    """Returns the completion of a generated text, which may start with the echoed prompt."""
+    return text[len(prompt):] if text.startswith(prompt) else text
+
+######## Token Streaming Helpers ##########
+# Callback receiving the decoded text chunks of a streamed generation, called from the model thread.
+TextCallback = Callable[[str], None]
+
+@lru_cache(maxsize=None)
+def callback_streamer_class():
+    """Builds a transformers TextStreamer that hands each decoded chunk to a callback."""
+    # Imported here so that generators without a tokenizer (e.g. the stub) do not require transformers.
+    from transformers import TextStreamer
+
+    class CallbackTextStreamer(TextStreamer):
+        def __init__(self, tokenizer, on_text: TextCallback, **decode_kwargs):
+            super().__init__(tokenizer, skip_prompt=True, **decode_kwargs)
+            self.on_text = on_text
+
+        def on_finalized_text(self, text: str, stream_end: bool = False):
+            if text:
+                self.on_text(text)
+
+    return CallbackTextStreamer
+
+def run_generator_streamed(generator, prompt: str, params: Dict, on_text: TextCallback) -> str:
+    """Runs a single prompt through the generator, handing the text to `on_text` as it is decoded (blocking).
+    generator: The text generation pipeline.
+    prompt: The prompt to be sent to the generator.
+    params: The generation parameters (e.g. max_new_tokens, temperature).
+    on_text: Callback receiving each decoded chunk of the completion.
+    Returns: The generated text, as returned by run_generator_batch.
+    """
+    tokenizer = getattr(generator, 'tokenizer', None)
+    if tokenizer is None:
+        # Generators without a tokenizer cannot stream tokens: the completion is handed over at once.
+        text = run_generator_batch(generator, [prompt], params)[0]
+        on_text(completion_of(text, prompt))
+        return text
+    streamer = callback_streamer_class()(tokenizer, on_text, skip_special_tokens=True)
+    artifact = params.get(ARTIFACT_PARAM)
+    params, patterns = prepare_stop_patterns(generator, params)
+    start = time.perf_counter()
+    result = generator(prompt, streamer=streamer, **params)
+    # The last chunks streamed may go past the stop point; the returned text is cut like run_generator_batch's.
+    text = apply_stop_patterns(result[0]['generated_text'], prompt, patterns)
+    record_generation(artifact, tokenizer, [prompt], [completion_of(text, prompt)], time.perf_counter() - start)
+    return text
+
+######## InferenceRequest Dataclass ##########
+# A queued generation. Requests with an `on_text` callback are streamed, so they run one at a time.
+@dataclass
+class InferenceRequest:
+    prompt: str
+    params: Dict
+    future: asyncio.Future
+    on_text: Optional[TextCallback] = None
+    enqueued_at: float = field(default_factory=time.perf_counter)
+
+######## InferenceWorker Class ##########
+class InferenceWorker:
+    """Owns the text generation model and serves generation requests from the event loop.
+
+    Requests are put on a bounded asyncio queue (submitters wait when it is full) and a
+    consumer task drains it, grouping queued prompts with the same parameters into batches
+    that run on a single dedicated thread. Callers simply await the generated text.
+
+    Either a loaded generator or a `loader` can be given; with a loader, the model is loaded on
+    the worker thread on first use (or by `warm_up`), never on the event loop.
+    """
+
+    def __init__(
+        self,
+        generator=None,
+        max_queue_size: int = DEFAULT_MAX_QUEUE_SIZE,
+        batch_size: int = DEFAULT_WORKER_BATCH_SIZE,
+        loader: Optional[Callable[[], Any]] = None,
+        model_id: Optional[str] = None
+    ):
+        if generator is None and loader is None:
+            raise ValueError("Informe um generator ou um loader para o worker de inferência.")
+        self.generator = prepare_generator_for_batching(generator) if generator is not None else None
+        self.loader = loader
+        self.model_id = model_id
+        self.max_queue_size = max_queue_size
+        self.batch_size = batch_size
+        self._queue: Optional[asyncio.Queue] = None
+        self._consumer: Optional[asyncio.Task] = None
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._accepting = False
+        self._in_flight: List[InferenceRequest] = []
+
+    @property
+    def running(self) -> bool:
+        return self._consumer is not None and not self._consumer.done()
+
+    @property
+    def queue_size(self) -> int:
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def start(self):
+        """Starts the consumer task and the model thread. Must be called from the event loop."""
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="inference-worker")
+        self._accepting = True
+        self._consumer = asyncio.create_task(self._consume())
+
+    def _ensure_generator(self):
+        """Loads the generator through the loader if needed. Runs on the worker thread."""
+        if self.generator is None:
+            self.generator = prepare_generator_for_batching(self.loader())
+        return self.generator
+
+    async def warm_up(self):
+        """Loads the model on the worker thread ahead of the first request."""
+        if not self.running:
+            raise RuntimeError("O worker de inferência não está em execução.")
+        await asyncio.get_running_loop().run_in_executor(self._executor, self._ensure_generator)
+
+    async def submit(self, prompt: str, params: Dict) -> str:
+        """Queues a prompt for generation and waits for the generated text.
+        prompt: The prompt to be sent to the generator.
+        params: The generation parameters (e.g. max_new_tokens, temperature).
+        Returns: The generated text.
+        Raises:
+            RuntimeError: If the worker is not running.
+        """
+        return await self._enqueue(InferenceRequest(prompt, dict(params), None))
+
+    async def submit_streamed(self, prompt: str, params: Dict, on_text: TextCallback) -> str:
+        """Queues a prompt for streamed generation and waits for the generated text.
+        prompt: The prompt to be sent to the generator.
+        params: The generation parameters (e.g. max_new_tokens, temperature).
+        on_text: Callback receiving each decoded chunk, called from the model thread.
+        Returns: The generated text.
+        """
+        return await self._enqueue(InferenceRequest(prompt, dict(params), None, on_text))
+
+    async def _enqueue(self, request: InferenceRequest) -> str:
+        if not self._accepting:
+            raise RuntimeError("O worker de inferência não está em execução.")
+        request.future = asyncio.get_running_loop().create_future()
+        # Waits here while the queue is full, applying backpressure to the submitters.
+        await self._queue.put(request)
+        return await request.future
+
+    def _run_batch(self, prompts: List[str], params: Dict) -> List[str]:
+        return run_generator_batch(self._ensure_generator(), prompts, params)
+
+    def _run_streamed(self, request: InferenceRequest) -> List[str]:
+        return [run_generator_streamed(self._ensure_generator(), request.prompt, request.params, request.on_text)]
+
+    def _drain(self, first: InferenceRequest) -> List[InferenceRequest]:
+        """Collects the requests already waiting in the queue, up to the batch size."""
+        requests = [first]
+        while len(requests) < self.batch_size:
+            try:
+                requests.append(self._queue.get_nowait())
+            except asyncio.QueueEmpty:
+                break
+        return requests
+
+    async def _consume(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            requests = self._in_flight = self._drain(await self._queue.get())
+            groups: Dict[tuple, List[InferenceRequest]] = {}
+            for request in requests:
+                # Streamed requests are never batched, so each one gets a group of its own.
+                key = (id(request),) if request.on_text else tuple(sorted(request.params.items()))
+                groups.setdefault(key, []).append(request)
+
+            for group in groups.values():
+                pending = [request for request in group if not request.future.cancelled()]
+                if not pending:
+                    continue
+                now = time.perf_counter()
+                for request in pending:
+                    STAGE_SECONDS.observe(now - request.enqueued_at, stage="inference_queue_wait")
+                try:
+                    if pending[0].on_text:
+                        texts = await loop.run_in_executor(self._executor, self._run_streamed, pending[0])
+                    else:
+                        texts = await loop.run_in_executor(
+                            self._executor,
+                            self._run_batch,
+                            [request.prompt for request in pending],
+                            pending[0].params
+                        )
+                except Exception as exc:
+                    logging.exception(exc)
+                    for request in pending:
+                        if not request.future.done():
+                            request.future.set_exception(exc)
+                else:
+                    for request, text in zip(pending, texts):
+                        if not request.future.done():
+                            request.future.set_result(text)
+
+            self._in_flight = []
+            for _ in requests:
+                self._queue.task_done()
+
+    async def shutdown(self, timeout: Optional[float] = None):
+        """Stops accepting requests, finishes the queued ones and releases the model thread.
+        timeout: Maximum time (in seconds) to wait for the queued requests; the remaining ones are cancelled.
+        """
+        if not self.running:
+            return
+        self._accepting = False
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logging.warning("Inference worker shutdown timed out; cancelling queued requests.")
+        self._consumer.cancel()
+        try:
+            await self._consumer
+        except asyncio.CancelledError:
+            pass
+        # Cancelling the interrupted batch and whatever was still waiting in the queue.
+        for request in self._in_flight:
+            request.future.cancel()
+        while not self._queue.empty():
+            self._queue.get_nowait().future.cancel()
+        self._executor.shutdown(wait=True)
+        self._consumer = None
+
+######## generate_texts Function ##########
+async def generate_texts(generator, prompts: List[str], params: Dict, batch_size: int = DEFAULT_WORKER_BATCH_SIZE) -> List[str]:
+    """Generates the texts of a list of prompts without blocking the event loop.
+    generator: An InferenceWorker, or a text generation pipeline.
+    prompts: The prompts, all generated with the same parameters.
+    params: The generation parameters (e.g. max_new_tokens, temperature).
+    batch_size: Maximum number of prompts per pipeline call when a plain pipeline is given.
+    Returns: The generated text of each prompt, in order.
+    """
+    if isinstance(generator, InferenceWorker):
+        # The worker batches the queued prompts by itself.
+        return list(await asyncio.gather(*(generator.submit(prompt, params) for prompt in prompts)))
+
+    # Without a worker, each batch runs on a separate thread so the event loop stays free.
+    prepare_generator_for_batching(generator)
+    texts: List[str] = []
+    for start in range(0, len(prompts), batch_size):
+        texts.extend(await asyncio.to_thread(run_generator_batch, generator, prompts[start:start + batch_size], params))
+    return texts
+
+######## TextStream Class ##########
+class TextStream:
+    """Generates the text of a prompt, yielding the completion in chunks as it is decoded.
+
+    Iterate over it with `async for`; once the iteration ends, `text` holds the generated text
+    exactly as the non-streamed generation would return it, and the chunks yielded add up to its
+    completion. The model may decode past the stop point, so with stop patterns the text from the
+    last line break on (where every stop pattern starts) is held back until it can no longer be cut.
+    """
+
+    def __init__(self, generator, prompt: str, params: Dict):
+        self.generator = generator
+        self.prompt = prompt
+        self.params = dict(params)
+        self.text: Optional[str] = None
+
+    def __aiter__(self) -> AsyncIterator[str]:
+        return self._iterate()
+
+    async def _iterate(self) -> AsyncIterator[str]:
+        loop = asyncio.get_running_loop()
+        chunks: asyncio.Queue = asyncio.Queue()
+        finished = object()
+
+        def on_text(text: str):
+            # Called from the model thread: the chunk is handed to the event loop thread-safely.
+            loop.call_soon_threadsafe(chunks.put_nowait, text)
+
+        if isinstance(self.generator, InferenceWorker):
+            generation = asyncio.ensure_future(self.generator.submit_streamed(self.prompt, self.params, on_text))
+        else:
+            generation = asyncio.ensure_future(
+                asyncio.to_thread(run_generator_streamed, self.generator, self.prompt, self.params, on_text)
+            )
+        # The end marker is queued after every chunk already scheduled by the model thread.
+        generation.add_done_callback(lambda _: loop.call_soon(chunks.put_nowait, finished))
+
+        patterns = tuple(self.params.get(STOP_PATTERNS_PARAM, ()))
+        streamed = ""
+        sent = 0
+        stopped = False
+        try:
+            while True:
+                chunk = await chunks.get()
+                if chunk is finished:
+                    break
+                streamed += chunk
+                if stopped:
+                    continue
+                position = stop_position(streamed, patterns) if patterns else None
+                if position is not None:
+                    # Cut like apply_stop_patterns; the rest of the decoded text is never sent.
+                    end, stopped = len(streamed[:position].rstrip()), True
+                elif patterns:
+                    end = len(streamed[:max(streamed.rfind("\n"), 0)].rstrip())
+                else:
+                    end = len(streamed)
+                if end > sent:
+                    yield streamed[sent:end]
+                    sent = end
+            # Raises the generation error, if any.
+            self.text = generation.result()
+            completion = completion_of(self.text, self.prompt)
+            if completion.startswith(streamed[:sent]):
+                if len(completion) > sent:
+                    yield completion[sent:]
+            else:
+                logging.warning("The streamed chunks of an artifact differ from its generated text")
+        finally:
+            if not generation.done():
+                generation.cancel()
@@ -0,0 +1,370 @@
+######## Imports & Initializations #########
+import os
+# Importing os to read the job queue configuration from the environment.
+
+import json
+# Importing json to store the job payloads and results.
+
+import uuid
+# Importing uuid to generate the job ids.
+
+import socket
+# Importing socket to identify the host owning the running jobs.
+
+import sqlite3
+# Importing sqlite3 to persist the jobs, so queued work survives a restart.
+
+import asyncio
+# Importing asyncio to run the bounded pool of job workers.
+
+import threading
+# Importing threading to serialize the access to the SQLite connection.
+
+import logging
+# Importing logging to report failed jobs.
+
+from datetime import datetime, timedelta
+# Importing datetime to timestamp the jobs and to compute their lease expiration.
+
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+# Importing typing helpers for type hinting.
+
+from metrics import STAGE_SECONDS
+# Importing the stage histogram, to report the time the jobs wait before a worker picks them up.
+
+###### Job Queue Configuration ######
+# SQLite database holding the jobs, number of jobs processed at the same time and number of
+# attempts before a failing job is given up.
+JOBS_DB_PATH = os.environ.get("EDU_JOBS_DB", "jobs.db")
+JOB_CONCURRENCY = int(os.environ.get("EDU_JOB_CONCURRENCY", "2"))
+JOB_MAX_ATTEMPTS = int(os.environ.get("EDU_JOB_MAX_ATTEMPTS", "2"))
+# Several processes may share the store, so a running job is leased to the process running it,
+# which renews the lease every heartbeat. Only jobs whose lease expired (their process stopped or
+# crashed) are queued again by the other processes.
+JOB_LEASE_SECONDS = float(os.environ.get("EDU_JOB_LEASE_SECONDS", "120"))
+JOB_HEARTBEAT_SECONDS = float(os.environ.get("EDU_JOB_HEARTBEAT_SECONDS", "30"))
+
+# Job statuses. Finished jobs (succeeded, failed, cancelled) never change status again.
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+CANCELLED = "cancelled"
+FINISHED_STATUSES = (SUCCEEDED, FAILED, CANCELLED)
+
+# Signature of the coroutine processing a job: (job id, payload, progress callback) -> result.
+JobHandler = Callable[[str, Dict, Callable[[int, int], None]], Awaitable[Any]]
+
+######## JobStore Class ##########
+class JobStore:
+    """Persists the jobs, their status, progress and result in a SQLite table."""
+
+    def __init__(self, path: str = JOBS_DB_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        self._connection.row_factory = sqlite3.Row
+        with self._lock, self._connection:
+            self._connection.execute(
+                """CREATE TABLE IF NOT EXISTS jobs (
+                    id TEXT PRIMARY KEY,
+                    status TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    result TEXT,
+                    error TEXT,
+                    progress_done INTEGER NOT NULL DEFAULT 0,
+                    progress_total INTEGER NOT NULL DEFAULT 0,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    created_at TEXT NOT NULL,
+                    updated_at TEXT NOT NULL,
+                    owner TEXT,
+                    lease_expires_at TEXT
+                )"""
+            )
+            # Stores created before the leases lack their columns.
+            columns = {row["name"] for row in self._connection.execute("PRAGMA table_info(jobs)")}
+            for column in ("owner", "lease_expires_at"):
+                if column not in columns:
+                    self._connection.execute(f"ALTER TABLE jobs ADD COLUMN {column} TEXT")
+            self._connection.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at)")
+
+    @staticmethod
+    def _row_to_job(row: sqlite3.Row) -> Dict[str, Any]:
+        job = dict(row)
+        job["payload"] = json.loads(job["payload"])
+        job["result"] = json.loads(job["result"]) if job["result"] is not None else None
+        return job
+
+    def create(self, payload: Dict) -> str:
+        """Stores a new queued job. Returns: The job id."""
+        job_id = uuid.uuid4().hex
+        now = datetime.utcnow().isoformat()
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT INTO jobs (id, status, payload, created_at, updated_at) VALUES (?, ?, ?, ?, ?)",
+                (job_id, QUEUED, json.dumps(payload, ensure_ascii=False), now, now)
+            )
+        return job_id
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Returns a job, or None if it does not exist."""
+        with self._lock:
+            row = self._connection.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._row_to_job(row) if row is not None else None
+
+    def update(self, job_id: str, **fields):
+        """Updates the given columns of a job (the result is serialized to JSON)."""
+        if "result" in fields:
+            fields["result"] = json.dumps(fields["result"], ensure_ascii=False)
+        fields["updated_at"] = datetime.utcnow().isoformat()
+        assignments = ", ".join(f"{column} = ?" for column in fields)
+        with self._lock, self._connection:
+            self._connection.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+
+    def claim_next(self, owner: str, lease_seconds: float = JOB_LEASE_SECONDS) -> Optional[Dict[str, Any]]:
+        """Atomically marks the oldest queued job as running and returns it, or None if there is none.
+
+        Other processes may share the store, so the job is claimed by an UPDATE conditioned on its
+        status still being queued: when another process claimed it first, nothing is updated and
+        the next queued job is tried.
+        owner: The process claiming the job, which holds its lease.
+        lease_seconds: Duration of the lease, renewed by the owner with renew_leases.
+        """
+        with self._lock:
+            while True:
+                with self._connection:
+                    row = self._connection.execute(
+                        "SELECT id FROM jobs WHERE status = ? ORDER BY created_at LIMIT 1", (QUEUED,)
+                    ).fetchone()
+                    if row is None:
+                        return None
+                    now = datetime.utcnow()
+                    cursor = self._connection.execute(
+                        "UPDATE jobs SET status = ?, attempts = attempts + 1, updated_at = ?, owner = ?, lease_expires_at = ? "
+                        "WHERE id = ? AND status = ?",
+                        (RUNNING, now.isoformat(), owner, (now + timedelta(seconds=lease_seconds)).isoformat(), row["id"], QUEUED)
+                    )
+                    if cursor.rowcount == 0:
+                        continue
+                    job = self._connection.execute("SELECT * FROM jobs WHERE id = ?", (row["id"],)).fetchone()
+                return self._row_to_job(job)
+
+    def renew_leases(self, owner: str, job_ids: List[str], lease_seconds: float = JOB_LEASE_SECONDS):
+        """Extends the leases of the jobs an owner is still running."""
+        if not job_ids:
+            return
+        expires_at = (datetime.utcnow() + timedelta(seconds=lease_seconds)).isoformat()
+        placeholders = ", ".join("?" for _ in job_ids)
+        with self._lock, self._connection:
+            self._connection.execute(
+                f"UPDATE jobs SET lease_expires_at = ? WHERE owner = ? AND status = ? AND id IN ({placeholders})",
+                (expires_at, owner, RUNNING, *job_ids)
+            )
+
+    def statuses(self, job_ids: List[str]) -> Dict[str, str]:
+        """Returns the stored status of each job."""
+        if not job_ids:
+            return {}
+        placeholders = ", ".join("?" for _ in job_ids)
+        with self._lock:
+            rows = self._connection.execute(
+                f"SELECT id, status FROM jobs WHERE id IN ({placeholders})", tuple(job_ids)
+            ).fetchall()
+        return {row["id"]: row["status"] for row in rows}
+
+    def requeue_expired(self, max_attempts: int = JOB_MAX_ATTEMPTS) -> Tuple[int, int]:
+        """Puts the running jobs whose lease expired (their process stopped or crashed) back in the queue.
+
+        Jobs stored before the leases have no lease and are considered expired. Jobs that already
+        used their `max_attempts` fail instead, so a job crashing its process (e.g. out of memory on
+        a huge plan) is not retried forever.
+        Returns: The number of jobs requeued and the number of jobs failed.
+        """
+        now = datetime.utcnow().isoformat()
+        expired = "status = ? AND (lease_expires_at IS NULL OR lease_expires_at < ?)"
+        with self._lock, self._connection:
+            failed = self._connection.execute(
+                f"UPDATE jobs SET status = ?, error = ?, updated_at = ?, owner = NULL, lease_expires_at = NULL "
+                f"WHERE {expired} AND attempts >= ?",
+                (FAILED, "O processo que executava o job foi interrompido.", now, RUNNING, now, max_attempts)
+            ).rowcount
+            requeued = self._connection.execute(
+                f"UPDATE jobs SET status = ?, updated_at = ?, owner = NULL, lease_expires_at = NULL WHERE {expired}",
+                (QUEUED, now, RUNNING, now)
+            ).rowcount
+        return requeued, failed
+
+    def active_course_jobs(self, course_id: str) -> List[str]:
+        """Returns the ids of the jobs generating the content of a course: the queued and running ones, and
+        the cancelled ones whose process still holds their lease (it stops them at its next heartbeat)."""
+        with self._lock:
+            rows = self._connection.execute(
+                "SELECT id FROM jobs WHERE json_extract(payload, '$.course_id') = ? "
+                "AND (status IN (?, ?) OR (status = ? AND lease_expires_at > ?)) ORDER BY created_at",
+                (course_id, QUEUED, RUNNING, CANCELLED, datetime.utcnow().isoformat())
+            ).fetchall()
+        return [row["id"] for row in rows]
+
+    def count_by_status(self) -> Dict[str, int]:
+        """Returns the number of jobs in each status."""
+        with self._lock:
+            rows = self._connection.execute("SELECT status, COUNT(*) AS total FROM jobs GROUP BY status").fetchall()
+        return {row["status"]: row["total"] for row in rows}
+
+_job_store: Optional[JobStore] = None
+
+def get_job_store() -> JobStore:
+    """Returns the job store, opening its database on first use."""
+    global _job_store
+    if _job_store is None:
+        _job_store = JobStore()
+    return _job_store
+
+######## JobQueue Class ##########
+class JobQueue:
+    """Processes the stored jobs with a bounded pool of asyncio workers.
+
+    At most `concurrency` jobs run at the same time; the others wait in the store, so bursts of
+    submissions never overload the model. The running jobs are leased to this queue and their
+    leases renewed every heartbeat; jobs whose lease expired (their process crashed) are queued
+    again, and failing jobs are retried until they reach `max_attempts`.
+    """
+
+    def __init__(
+        self,
+        store: Optional[JobStore],
+        handler: JobHandler,
+        concurrency: int = JOB_CONCURRENCY,
+        max_attempts: int = JOB_MAX_ATTEMPTS
+    ):
+        # Without a store, the default one is opened on first use (see get_job_store).
+        self._store = store
+        self.handler = handler
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self._workers: List[asyncio.Task] = []
+        self._running: Dict[str, asyncio.Task] = {}
+        self._wake_up: Optional[asyncio.Event] = None
+        self._heartbeat: Optional[asyncio.Task] = None
+        self._stopping = False
+        # Identifies this queue as the owner of the jobs it claims.
+        self.owner = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+    @property
+    def store(self) -> JobStore:
+        if self._store is None:
+            self._store = get_job_store()
+        return self._store
+
+    async def start(self):
+        """Requeues the interrupted jobs and starts the workers. Must be called from the event loop."""
+        self._requeue_expired()
+        self._stopping = False
+        self._wake_up = asyncio.Event()
+        self._workers = [asyncio.create_task(self._work()) for _ in range(self.concurrency)]
+        self._heartbeat = asyncio.create_task(self._renew_leases())
+
+    def _requeue_expired(self):
+        requeued, failed = self.store.requeue_expired(self.max_attempts)
+        if failed:
+            logging.warning("Failed %d interrupted jobs that used all their attempts", failed)
+        if requeued:
+            logging.info("Requeued %d interrupted jobs", requeued)
+            if self._wake_up is not None:
+                self._wake_up.set()
+
+    async def _renew_leases(self):
+        while not self._stopping:
+            await asyncio.sleep(JOB_HEARTBEAT_SECONDS)
+            try:
+                # Jobs cancelled through another process (whose cancel() cannot reach the task) are stopped here.
+                for job_id, status in self.store.statuses(list(self._running)).items():
+                    if status == CANCELLED and job_id in self._running:
+                        self._running[job_id].cancel()
+                self.store.renew_leases(self.owner, list(self._running))
+                # Also picks up the jobs of the processes that stopped while this one keeps running.
+                self._requeue_expired()
+            except sqlite3.Error:
+                logging.exception("Could not renew the job leases")
+
+    def enqueue(self, payload: Dict) -> str:
+        """Stores a new job and wakes up an idle worker. Returns: The job id."""
+        job_id = self.store.create(payload)
+        if self._wake_up is not None:
+            self._wake_up.set()
+        return job_id
+
+    def cancel(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Cancels a queued or running job. Returns: The job, or None if it does not exist."""
+        job = self.store.get(job_id)
+        if job is None or job["status"] in FINISHED_STATUSES:
+            return job
+        self.store.update(job_id, status=CANCELLED)
+        task = self._running.get(job_id)
+        if task is not None:
+            task.cancel()
+        return self.store.get(job_id)
+
+    async def _work(self):
+        while not self._stopping:
+            job = self.store.claim_next(self.owner)
+            if job is None:
+                self._wake_up.clear()
+                try:
+                    # Polling as well, in case another process enqueued jobs in the same store.
+                    await asyncio.wait_for(self._wake_up.wait(), timeout=5)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            await self._process(job)
+
+    async def _process(self, job: Dict[str, Any]):
+        job_id = job["id"]
+        if job["attempts"] == 1:
+            # Retried jobs are left out, since their wait would include their previous attempts.
+            waited = datetime.utcnow() - datetime.fromisoformat(job["created_at"])
+            STAGE_SECONDS.observe(waited.total_seconds(), stage="job_queue_wait")
+
+        def report_progress(done: int, total: int):
+            self.store.update(job_id, progress_done=done, progress_total=total)
+
+        task = asyncio.ensure_future(self.handler(job_id, job["payload"], report_progress))
+        self._running[job_id] = task
+        try:
+            result = await task
+        except asyncio.CancelledError:
+            if self._stopping:
+                # Interrupted by the shutdown: the job is queued again for the other processes or the next start.
+                self.store.update(job_id, status=QUEUED, owner=None, lease_expires_at=None)
+                raise
+            # Cancelled through cancel() or the heartbeat, and the status is already stored: the job
+            # no longer runs here, so its lease is released.
+            self.store.update(job_id, owner=None, lease_expires_at=None)
+        except Exception as exc:
+            logging.exception(exc)
+            if job["attempts"] < self.max_attempts and self.store.get(job_id)["status"] == RUNNING:
+                self.store.update(job_id, status=QUEUED, error=str(exc), owner=None, lease_expires_at=None)
+            else:
+                self.store.update(job_id, status=FAILED, error=str(exc))
+        else:
+            if self.store.get(job_id)["status"] == RUNNING:
+                self.store.update(job_id, status=SUCCEEDED, result=result, error=None)
+        finally:
+            self._running.pop(job_id, None)
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns the number of jobs per status and the number of jobs running in this process."""
+        return {"concurrency": self.concurrency, "running": len(self._running), "jobs": self.store.count_by_status()}
+
+    async def shutdown(self):
+        """Stops the workers; the jobs they were running are queued again for the next start."""
+        self._stopping = True
+        if self._heartbeat is not None:
+            self._heartbeat.cancel()
+        for worker in self._workers:
+            worker.cancel()
+        for task in list(self._running.values()):
+            task.cancel()
+        await asyncio.gather(*self._workers, *([self._heartbeat] if self._heartbeat else []), return_exceptions=True)
+        self._workers = []
+        self._heartbeat = None
@@ -1,42 +1,89 @@
 ######## Imports & Initializations #########
-from fastapi import FastAPI, File, UploadFile, HTTPException, BackgroundTasks, Request
-# Importing FastAPI and other necessary classes to create a web API, handle file uploads, exceptions, and background tasks.
+from fastapi import FastAPI, File, Form, UploadFile, HTTPException, Request
+# Importing FastAPI and other necessary classes to create a web API, handle file uploads and exceptions.
 
-from fastapi.responses import JSONResponse
-# Importing JSONResponse to send JSON responses.
+from fastapi.responses import JSONResponse, StreamingResponse, Response
+# Importing JSONResponse to send JSON responses, StreamingResponse to stream generated tokens (Server-Sent Events)
+# and Response to serve the metrics in the Prometheus text format.
 
 from fastapi.middleware.cors import CORSMiddleware
 # Importing CORSMiddleware to handle Cross-Origin Resource Sharing (CORS).
 
-from data_models import CursoData, MetadadosCurso, Modulo, NucleoConceitual
+from data_models import CursoData
 # Importing data models to structure the course data.
 
 from data_extraction import (
-    extract_text_from_pdf,
-    extract_text_from_docx,
-    extract_course_metadata,
-    extract_modulos, 
-    validate_course_metadata 
+    extract_text_cached,
+    file_sha256,
+    course_data_from_texts,
+    get_extraction_cache,
+    shutdown_extraction_pool,
+    TEXT_EXTRACTORS
 )
 # Importing functions for data extraction and validation from various file types.
 
 from content_generation import (
     generate_content_for_nucleo_conceitual,
     generate_video_script,
-    generate_teleprompter_text,
-    generator
+    generate_teleprompter_text
 )
 # Importing content generation functions for different components of the course.
 
-from utils import process_and_generate_content, store_course_data
+from model_registry import model_registry, MODEL_EAGER_LOAD
+# Importing the registry that loads the configured model lazily, or at startup when eager loading is enabled.
+
+from utils import (
+    process_and_generate_content,
+    stream_and_generate_content,
+    carry_over_generated_content,
+    store_course_data,
+    course_data_to_dict
+)
 # Importing utility functions to process and store course data.
 
+from course_storage import get_course_store
+# Importing the per-course storage, to read whole courses, modules or núcleos.
+
+from model_server import create_inference_worker, RemoteInferenceWorker
+# Importing the inference worker that owns the model (or talks to the shared model server) and serves
+# generation requests off the event loop.
+
+from generation_cache import get_generation_cache
+# Importing the persistent cache of generated artifacts.
+
+from job_queue import JobQueue, SUCCEEDED
+# Importing the persistent job queue that runs the course generations with bounded concurrency.
+
+from prompt_templates import get_prompt_engine
+# Importing the prompt engine, to compile the templates at startup and report the prompt token counts.
+
+from bulk_ingestion import ingest, discover_items, BULK_EXTRACTION_CONCURRENCY, BULK_GENERATION_CONCURRENCY
+# Importing the bulk ingestion of batches of form/plan pairs.
+
+from metrics import metrics_registry, stage_timer, trace_id, HTTP_REQUEST_SECONDS, JOBS_IN_FLIGHT
+# Importing the metrics of the application, the stage timer and the trace id of the requests and jobs.
+
+import os
+# Importing os to read the upload limits from the environment.
+
+import time
+# Importing time to measure the requests.
+
+import uuid
+# Importing uuid to identify the traced requests.
+
 import asyncio
 # Importing asyncio for asynchronous programming.
 
 import logging
 # Importing logging to log information and errors.
 
+import json
+# Importing json to serialize the streamed events and to read the form data.
+
+from typing import Optional
+# Importing Optional for the optional form fields.
+
 ###### App Initialization and CORS Configuration #####
 # Initializing the FastAPI application.
 app = FastAPI()
@@ -60,6 +107,124 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+###### Upload Limits ######
+# Maximum size of each uploaded file. Requests declaring a body larger than two maximum size files
+# (plus the form overhead) are rejected from their Content-Length, before their body is read.
+UPLOAD_MAX_BYTES = int(os.environ.get("EDU_UPLOAD_MAX_BYTES", 50 * 1024 * 1024))
+REQUEST_MAX_BYTES = 2 * UPLOAD_MAX_BYTES + 1024 * 1024
+
+# Directory holding the batches that can be ingested through the API.
+BULK_INGESTION_ROOT = os.environ.get("EDU_BULK_INGESTION_ROOT", "ingestion")
+
+UPLOAD_TOO_LARGE_DETAIL = f"Arquivo excede o tamanho máximo permitido ({UPLOAD_MAX_BYTES // (1024 * 1024)} MB)."
+
+@app.middleware("http")
+async def limit_request_size(request: Request, call_next):
+    # Rejecting oversized uploads from their Content-Length, before the multipart body is parsed.
+    content_length = request.headers.get("content-length")
+    if content_length is not None and content_length.isdigit() and int(content_length) > REQUEST_MAX_BYTES:
+        return JSONResponse(status_code=413, content={"detail": UPLOAD_TOO_LARGE_DETAIL})
+    return await call_next(request)
+
+@app.middleware("http")
+async def observe_request(request: Request, call_next):
+    # Timing the request by route, and tracing its stages under its X-Request-ID (or a new id), returned
+    # in the response. Streamed responses are timed until their headers are sent.
+    request_id = request.headers.get("x-request-id") or uuid.uuid4().hex
+    token = trace_id.set(request_id)
+    start = time.perf_counter()
+    status = 500
+    try:
+        response = await call_next(request)
+        status = response.status_code
+    finally:
+        route = request.scope.get("route")
+        HTTP_REQUEST_SECONDS.observe(
+            time.perf_counter() - start,
+            method=request.method, route=route.path if route is not None else "unmatched", status=status
+        )
+        trace_id.reset(token)
+    response.headers["X-Request-ID"] = request_id
+    return response
+
+####### Inference Worker Lifecycle ############
+# The worker owns the generator: every generation request is queued to it and awaited, so the
+# event loop stays free to serve other requests while the model is running. The model is loaded
+# by the worker thread on the first generation, or at startup when eager loading is enabled.
+# With a model server configured (EDU_MODEL_SERVER), the model is loaded once by the server and
+# shared by every worker process of the API, which then only loads the tokenizer.
+inference_worker = create_inference_worker()
+
+def current_model_status() -> dict:
+    """Returns the status of the model: the one last reported by the model server when it runs there."""
+    if isinstance(inference_worker, RemoteInferenceWorker):
+        return inference_worker.model_status or {**model_registry.status(), "ready": False}
+    return model_registry.status()
+
+####### Course Generation Jobs ############
+async def run_course_job(job_id: str, payload: dict, report_progress) -> dict:
+    """Generates the content of the stored course of a job; each artifact is stored as soon as it is ready."""
+    course_id = payload["course_id"]
+    course_data = get_course_store().get_course(course_id)
+    if course_data is None:
+        raise ValueError(f"Curso não encontrado: {course_id}")
+    await process_and_generate_content(
+        course_data,
+        inference_worker,
+        use_cache=payload.get("use_cache", True),
+        on_progress=report_progress,
+        course_id=course_id
+    )
+    return {"course_id": course_id}
+
+async def run_ingestion_job(job_id: str, payload: dict, report_progress) -> dict:
+    """Ingests a batch of courses; the progress is reported in courses. Retried jobs resume the batch."""
+    report = await ingest(
+        payload["source"],
+        inference_worker,
+        extraction_concurrency=payload["extraction_concurrency"],
+        generation_concurrency=payload["generation_concurrency"],
+        use_cache=payload.get("use_cache", True),
+        on_progress=report_progress
+    )
+    return {key: report[key] for key in ("total", "done", "failed", "duration_seconds", "report_path")}
+
+# Handler of each kind of job; course generations have no kind, as they predate the others.
+JOB_HANDLERS = {"course": run_course_job, "ingestion": run_ingestion_job}
+
+async def run_job(job_id: str, payload: dict, report_progress):
+    kind = payload.get("kind", "course")
+    # Each job runs in a task of its own, where its stages are traced under the job id.
+    trace_id.set(job_id)
+    JOBS_IN_FLIGHT.inc(kind=kind)
+    try:
+        with stage_timer(f"{kind}_job"):
+            return await JOB_HANDLERS[kind](job_id, payload, report_progress)
+    finally:
+        JOBS_IN_FLIGHT.dec(kind=kind)
+
+# Jobs are persisted in SQLite, so queued and interrupted courses are resumed after a restart.
+# The store is opened on first use, so importing the application does not create the database.
+job_queue = JobQueue(store=None, handler=run_job)
+
+####### Application Lifecycle ############
+@app.on_event("startup")
+async def start_background_services():
+    # The templates are compiled (and the tokenizer loaded) once, before the first prompt is built.
+    await asyncio.to_thread(get_prompt_engine)
+    await inference_worker.start()
+    if MODEL_EAGER_LOAD:
+        await inference_worker.warm_up()
+    await job_queue.start()
+
+@app.on_event("shutdown")
+async def stop_background_services():
+    # The running jobs are interrupted first (they are queued again for the next start), then the
+    # worker finishes the generations already queued before releasing the model thread.
+    await job_queue.shutdown()
+    await inference_worker.shutdown()
+    await asyncio.to_thread(shutdown_extraction_pool)
+
 ####### Exception Handlers ############
 # This function handles ValueError exceptions, returning a JSON response 
 # with a 400 status code and the exception message.
@@ -82,78 +247,348 @@ async def general_exception_handler(request: Request, exc: Exception):
         content={"message": "An internal server error occurred. Please check the logs."},
     )
 
+########### Course Data Construction ##############
+async def build_course_data(form_file: UploadFile, plan_file: UploadFile, form_data: Optional[str]) -> CursoData:
+    """Extracts and validates the course metadata and modules from the uploaded files."""
+    # Extract text from the uploaded form and plan files.
+    form_text = await extract_text_from_file(form_file)
+    plan_text = await extract_text_from_file(plan_file)    
+    
+    # The fields sent with the form data take precedence over the ones extracted from the form file.
+    try:
+        form_fields = json.loads(form_data) if form_data else {}
+    except ValueError:
+        raise HTTPException(status_code=400, detail="form_data deve ser um objeto JSON.")
+    if not isinstance(form_fields, dict):
+        raise HTTPException(status_code=400, detail="form_data deve ser um objeto JSON.")
+    # Extract the metadata and modules, validating the metadata once.
+    try:
+        return course_data_from_texts(form_text, plan_text, form_fields)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
 ########### Course Generation Endpoint ##############
 @app.post("/generate_course/")
 async def generate_course(
-    background_tasks: BackgroundTasks,
     form_file: UploadFile = File(...), 
     plan_file: UploadFile = File(...),
-    form_data: dict = None # Receiving form data directly
+    form_data: Optional[str] = Form(None), # JSON object with metadata fields, overriding the extracted ones
+    use_cache: bool = True, # False regenerates every artifact, refreshing the generation cache
+    course_id: str = None, # Id of a stored course to be replaced by this new version
+    incremental: bool = True # With a course_id, only regenerate the núcleos whose inputs changed
 ):
     """Processes uploaded form and plan files to generate course content."""
     # Endpoint to generate course content from uploaded form and plan files.
 
     try:
-        # Extract text from the uploaded form file.
-        form_text = await extract_text_from_file(form_file)
-        # Extract metadata data from the plan text.
-        course_metadata_dict = extract_course_metadata(form_text)
-        # Validate the extracted course metadata.
-        validated_metadata = validate_course_metadata(course_metadata_dict)
-        
-        # Extract text from the uploaded plan file.
-        plan_text = await extract_text_from_file(plan_file)    
-        # Extract module data from the plan text.
-        modulos_data = extract_modulos(plan_text)
-        
-        # Validate the form data against the MetadadosCurso model
-        validated_metadata = validate_course_metadata(form_data)
-        # Create a MetadadosCurso object with the validated metadata.
-        course_metadata = MetadadosCurso(**validated_metadata)
-        
-        
-        # Create a list of Modulo objects with their respective NucleoConceitual objects.
-        modulos = [Modulo(titulo=m['titulo'], nucleos_conceituais=[NucleoConceitual(**nc) for nc in m['nucleos_conceituais']]) for m in modulos_data]
-        # Create a CursoData object with the course metadata and modules.
-        course_data = CursoData(metadata=course_metadata, modulos=modulos)
+        course_data = await build_course_data(form_file, plan_file, form_data)
+
+        regeneration = None
+        if course_id is not None:
+            previous = get_course_store().get_course(course_id)
+            if previous is None:
+                raise HTTPException(status_code=404, detail="Curso não encontrado.")
+            # A job still generating the previous version would store its artifacts in the new núcleos.
+            active_jobs = job_queue.store.active_course_jobs(course_id)
+            if active_jobs:
+                raise HTTPException(status_code=409, detail=(
+                    f"O curso ainda está sendo gerado pelo job {active_jobs[0]}. "
+                    f"Aguarde sua conclusão ou cancele-o (DELETE /jobs/{active_jobs[0]}) antes de substituí-lo."
+                ))
+            if incremental:
+                # Reuse the artifacts of the núcleos whose titles and prompt metadata did not change.
+                regeneration = carry_over_generated_content(previous, course_data)
 
         # Store the course data asynchronously for later retrieval
-        await store_course_data(course_data) 
-        # Add a background task to process and generate content for the course.
-        background_tasks.add_task(
-            process_and_generate_content, 
-            course_data, 
-            generator
-        )
+        course_id = await store_course_data(course_data, course_id) 
+        # Enqueue a job to process and generate content for the course.
+        job_id = job_queue.enqueue({"course_id": course_id, "use_cache": use_cache})
 
         # Return a JSON response indicating that the course processing has started.
         return JSONResponse(
             status_code=202, 
-            content={"message": "Processamento do curso iniciado. Os resultados serão retornados quando disponíveis."}
+            content={
+                "message": "Processamento do curso iniciado. Os resultados serão retornados quando disponíveis.",
+                "job_id": job_id,
+                "course_id": course_id,
+                "status_url": f"/jobs/{job_id}",
+                "course_url": f"/courses/{course_id}",
+                "regeneration": regeneration,
+            }
         )
 
+    except HTTPException:
+        raise
     # Raise an HTTPException if an error occurs.
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Ocorreu um erro: {str(e)}")
-        
+
+########### Streaming Course Generation Endpoint ##############
+def format_sse(event: str, data: dict) -> str:
+    """Formats an event in the Server-Sent Events wire format."""
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+@app.post("/generate_course/stream")
+async def generate_course_stream(
+    form_file: UploadFile = File(...), 
+    plan_file: UploadFile = File(...),
+    form_data: Optional[str] = Form(None), # JSON object with metadata fields, overriding the extracted ones
+    use_cache: bool = True # False regenerates every artifact, refreshing the generation cache
+):
+    """Generates the course content, streaming the tokens of each núcleo and artifact as Server-Sent Events."""
+    try:
+        course_data = await build_course_data(form_file, plan_file, form_data)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Ocorreu um erro: {str(e)}")
+
+    # The course is stored first, so each artifact can be stored as soon as it has been streamed.
+    course_id = await store_course_data(course_data)
+
+    async def events():
+        try:
+            yield format_sse("course", {"course_id": course_id})
+            async for event, data in stream_and_generate_content(
+                course_data, inference_worker, use_cache=use_cache, course_id=course_id
+            ):
+                yield format_sse(event, data)
+        except Exception as exc:
+            logging.exception(exc)
+            yield format_sse("error", {"message": f"Ocorreu um erro: {str(exc)}"})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+########### Bulk Ingestion Endpoint ##############
+@app.post("/ingestions/")
+async def create_ingestion(
+    source: str, # Manifest or directory of the batch, relative to the ingestion root
+    extraction_concurrency: int = BULK_EXTRACTION_CONCURRENCY,
+    generation_concurrency: int = BULK_GENERATION_CONCURRENCY,
+    use_cache: bool = True
+):
+    """Queues the ingestion of a batch of form/plan pairs stored on the server, under the ingestion root."""
+    root = os.path.realpath(BULK_INGESTION_ROOT)
+    path = os.path.realpath(os.path.join(root, source))
+    if os.path.commonpath([root, path]) != root or not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Lote não encontrado.")
+    if extraction_concurrency < 1 or generation_concurrency < 1:
+        raise HTTPException(status_code=400, detail="Os limites de concorrência devem ser positivos.")
+    # The batch is listed now, so an invalid manifest or directory is reported right away.
+    items = discover_items(path)
+    job_id = job_queue.enqueue({
+        "kind": "ingestion",
+        "source": path,
+        "extraction_concurrency": extraction_concurrency,
+        "generation_concurrency": generation_concurrency,
+        "use_cache": use_cache,
+    })
+    return JSONResponse(
+        status_code=202,
+        content={"job_id": job_id, "total": len(items), "status_url": f"/jobs/{job_id}"}
+    )
+
+########### Job Endpoints ##############
+def job_status(job: dict) -> dict:
+    """Public view of a job: its status and progress, without the payload and result."""
+    return {
+        "job_id": job["id"],
+        "course_id": job["payload"].get("course_id"),
+        "status": job["status"],
+        "progress": {"done": job["progress_done"], "total": job["progress_total"]},
+        "attempts": job["attempts"],
+        "error": job["error"],
+        "created_at": job["created_at"],
+        "updated_at": job["updated_at"],
+    }
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str):
+    """Returns the status and progress (núcleos done/total) of a course generation job."""
+    job = job_queue.store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job não encontrado.")
+    return job_status(job)
+
+@app.get("/jobs/{job_id}/result")
+async def get_job_result(job_id: str):
+    """Returns the result of a finished job: the generated course, or the report of an ingestion."""
+    job = job_queue.store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job não encontrado.")
+    if job["status"] != SUCCEEDED:
+        raise HTTPException(status_code=409, detail=f"O job ainda não foi concluído (status: {job['status']}).")
+    if job["payload"].get("kind", "course") == "ingestion":
+        return job["result"]
+    return await get_course(job["result"]["course_id"])
+
+@app.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    """Cancels a queued or running job."""
+    job = job_queue.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job não encontrado.")
+    return job_status(job)
+
+########### Course Endpoints ##############
+@app.get("/courses/")
+async def list_courses():
+    """Lists the stored courses, most recent first."""
+    return get_course_store().list_courses()
+
+@app.get("/courses/{course_id}")
+async def get_course(course_id: str):
+    """Returns a whole course, with the artifacts generated so far."""
+    course_data = get_course_store().get_course(course_id)
+    if course_data is None:
+        raise HTTPException(status_code=404, detail="Curso não encontrado.")
+    return course_data_to_dict(course_data)
+
+@app.get("/courses/{course_id}/modulos/{modulo_index}")
+async def get_modulo(course_id: str, modulo_index: int):
+    """Returns a single module of a course, without loading the others."""
+    modulo = get_course_store().get_modulo(course_id, modulo_index)
+    if modulo is None:
+        raise HTTPException(status_code=404, detail="Módulo não encontrado.")
+    return modulo
+
+@app.get("/courses/{course_id}/modulos/{modulo_index}/nucleos/{nucleo_index}")
+async def get_nucleo(course_id: str, modulo_index: int, nucleo_index: int):
+    """Returns a single núcleo of a course, without loading the rest of the course."""
+    nucleo = get_course_store().get_nucleo(course_id, modulo_index, nucleo_index)
+    if nucleo is None:
+        raise HTTPException(status_code=404, detail="Núcleo conceitual não encontrado.")
+    return nucleo
+
+########### Health Endpoint ##############
+@app.get("/health")
+async def health():
+    """Reports whether the model is loaded, its load time and the inference worker queue."""
+    if isinstance(inference_worker, RemoteInferenceWorker):
+        try:
+            await inference_worker.refresh_status()
+        except OSError as exc:
+            logging.warning("Model server unreachable: %s", exc)
+    model_status = current_model_status()
+    if model_status["ready"]:
+        status = "ready"
+    elif model_status["loading"]:
+        status = "loading"
+    else:
+        status = "idle"
+    return {
+        "status": status,
+        "model": model_status,
+        "inference_worker": {
+            "running": inference_worker.running,
+            "queue_size": inference_worker.queue_size,
+        },
+        "jobs": job_queue.stats(),
+    }
+
+########### Generation Cache Endpoints ##############
+@app.get("/generation_cache/")
+async def generation_cache_stats():
+    """Returns the hit/miss counters and the size of the generation cache."""
+    return get_generation_cache().stats()
+
+@app.delete("/generation_cache/")
+async def clear_generation_cache():
+    """Invalidates every cached generation."""
+    get_generation_cache().clear()
+    return get_generation_cache().stats()
+
+########### Prompt Endpoint ##############
+@app.get("/prompts/")
+async def prompt_stats():
+    """Returns the token budgets of the prompts and the token counts of the prompts built so far."""
+    return get_prompt_engine().stats()
+
+########### Metrics Endpoint ##############
+def cache_metric_families(caches: dict) -> list:
+    """Reports the hit/miss counters of the caches, by cache name."""
+    ratios = [
+        ({"cache": name}, stats["hits"] / (stats["hits"] + stats["misses"]) if stats["hits"] + stats["misses"] else 0.0)
+        for name, stats in caches.items()
+    ]
+    return [
+        ("edu_cache_hits_total", "counter", "Lookups served from each cache.",
+         [({"cache": name}, stats["hits"]) for name, stats in caches.items()]),
+        ("edu_cache_misses_total", "counter", "Lookups missing from each cache.",
+         [({"cache": name}, stats["misses"]) for name, stats in caches.items()]),
+        ("edu_cache_hit_ratio", "gauge", "Fraction of the lookups served from each cache since the start.", ratios),
+        ("edu_cache_bytes", "gauge", "Size of the entries of each disk cache.",
+         [({"cache": name}, stats["bytes"]) for name, stats in caches.items() if "bytes" in stats]),
+    ]
+
+def collect_application_metrics() -> list:
+    """Reports, when the metrics are scraped, the values kept by the caches, the model and the queues."""
+    caches = {"generation": get_generation_cache().stats(), "extraction": get_extraction_cache().stats()}
+    model_status = current_model_status()
+    # The prompt prefix cache lives in the generator, possibly wrapped for assisted decoding.
+    generator_stats = model_status["generator_stats"] or {}
+    prefix_stats = generator_stats.get("wrapped", generator_stats) or {}
+    if "hits" in prefix_stats:
+        caches["prefix"] = prefix_stats
+    model_labels = {"model": model_status["identity"]}
+    families = cache_metric_families(caches) + [
+        ("edu_model_ready", "gauge", "Whether the model is loaded.", [(model_labels, 1 if model_status["ready"] else 0)]),
+        ("edu_model_load_seconds", "gauge", "Time the model took to load.",
+         [(model_labels, model_status["load_seconds"])] if model_status["load_seconds"] is not None else []),
+        ("edu_inference_queue_size", "gauge", "Generation requests waiting for the inference worker.",
+         [({}, inference_worker.queue_size)]),
+        ("edu_jobs", "gauge", "Stored jobs, by status.",
+         [({"status": status}, count) for status, count in job_queue.store.count_by_status().items()]),
+    ]
+    return families
+
+metrics_registry.add_collector(collect_application_metrics)
+
+@app.get("/metrics")
+async def metrics():
+    """Returns the metrics of the application in the Prometheus text format."""
+    return Response(content=metrics_registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+@app.get("/model_server/metrics")
+async def model_server_metrics():
+    """Returns the metrics of the model server process (token counts, throughput, inference queue), to be scraped apart."""
+    if not isinstance(inference_worker, RemoteInferenceWorker):
+        raise HTTPException(status_code=404, detail="Nenhum servidor de modelo configurado.")
+    return Response(content=await inference_worker.metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+########### Extraction Cache Endpoints ##############
+@app.get("/extraction_cache/")
+async def extraction_cache_stats():
+    """Returns the hit/miss counters and the size of the extraction cache."""
+    return get_extraction_cache().stats()
+
+@app.delete("/extraction_cache/")
+async def clear_extraction_cache():
+    """Invalidates every cached extraction."""
+    get_extraction_cache().clear()
+    return get_extraction_cache().stats()
 
 ####### Text Extraction Function ##########
 async def extract_text_from_file(file: UploadFile):
     """Extracts text from different file types."""
     # Function to extract text from various file types.
 
-    # Read the contents of the uploaded file.
-    contents = await file.read()
     # Get the file extension.
     file_extension = file.filename.split(".")[-1].lower()
-
-    if file_extension == "pdf":
-        return extract_text_from_pdf(io.BytesIO(contents)) # Extract text from a PDF file.
-
-    elif file_extension in ["doc", "docx"]:
-        return extract_text_from_docx(io.BytesIO(contents)) # Extract text from a DOC or DOCX file.
-    
     # Raise an HTTPException if the file type is not supported.
-    else:
+    if file_extension not in TEXT_EXTRACTORS:
         raise HTTPException(status_code=400, detail="Tipo de arquivo não suportado.")
-    
+
+    # Starlette spooled the upload to a temporary file while parsing the form (oversized requests were
+    # rejected from their Content-Length before that), so it is hashed and extracted in place.
+    if file.size is not None and file.size > UPLOAD_MAX_BYTES:
+        raise HTTPException(status_code=413, detail=UPLOAD_TOO_LARGE_DETAIL)
+    with stage_timer("upload"):
+        sha256 = await asyncio.to_thread(file_sha256, file.file)
+    # The extraction runs in a thread (the PDF pages and the OCR in a process pool), so the event loop keeps
+    # serving requests. Files already uploaded with the same contents are served from the extraction cache.
+    return await asyncio.to_thread(extract_text_cached, file.file, file_extension, sha256)
@@ -0,0 +1,253 @@
+######## Imports & Initializations #########
+import os
+# Importing os to read the tracing configuration from the environment.
+
+import math
+# Importing math to format the infinite histogram bucket and to estimate token counts.
+
+import time
+# Importing time to measure the stages.
+
+import logging
+# Importing logging to write the per-request trace logs.
+
+import threading
+# Importing threading to protect the metrics, since they are updated from worker threads too.
+
+from contextlib import contextmanager
+# Importing contextmanager to time the stages with a `with` block.
+
+from contextvars import ContextVar
+# Importing ContextVar to follow the trace id of a request through its tasks and threads.
+
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+# Importing typing helpers for type hinting.
+
+###### Metrics Configuration ######
+# With EDU_TRACE_REQUESTS enabled, every timed stage of a request (or of a job) is also logged with
+# its trace id, so the time of a single slow course can be followed stage by stage.
+TRACE_REQUESTS = os.environ.get("EDU_TRACE_REQUESTS", "").lower() in ("1", "true", "yes")
+
+# Buckets (in seconds) of the stage histograms: from the regex parsers (milliseconds) to whole
+# course generations (tens of minutes).
+STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300, 600, 1200, 2400, 3600)
+# Buckets of the generation throughput histogram, in new tokens per second.
+TOKENS_PER_SECOND_BUCKETS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000)
+
+# A sample of a metric: its label values and its value.
+Sample = Tuple[Dict[str, str], float]
+
+def format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value))
+
+def escape_label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{escape_label_value(str(value))}"' for name, value in labels.items()) + "}"
+
+def format_family(name: str, kind: str, description: str, samples: Iterable[Tuple[str, Dict[str, str], float]]) -> List[str]:
+    """Formats a metric family in the Prometheus text format: its HELP and TYPE lines, then its samples."""
+    lines = [f"# HELP {name} {description}", f"# TYPE {name} {kind}"]
+    lines.extend(f"{sample_name}{format_labels(labels)} {format_value(value)}" for sample_name, labels, value in samples)
+    return lines
+
+######## Metric Classes ##########
+class Metric:
+    """A metric family: one value (or histogram) per combination of label values."""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, description: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values: Dict[Tuple[str, ...], Any] = {}
+
+    def _key(self, labels: Dict[str, Any]) -> Tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"A métrica {self.name} requer os rótulos {self.labelnames}, recebeu {sorted(labels)}.")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _samples(self) -> List[Tuple[str, Dict[str, str], float]]:
+        with self._lock:
+            return [(self.name, dict(zip(self.labelnames, key)), value) for key, value in sorted(self._values.items())]
+
+    def render(self) -> List[str]:
+        return format_family(self.name, self.kind, self.description, self._samples())
+
+class Counter(Metric):
+    kind = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+class Gauge(Metric):
+    kind = "gauge"
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def dec(self, amount: float = 1, **labels):
+        self.inc(-amount, **labels)
+
+class Histogram(Metric):
+    kind = "histogram"
+
+    def __init__(self, name: str, description: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = STAGE_BUCKETS):
+        super().__init__(name, description, labelnames)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            # Per bucket counts (not cumulative), then the sum and the count of the observations.
+            counts, total, count = self._values.get(key) or ([0] * len(self.buckets), 0.0, 0)
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[index] += 1
+                    break
+            self._values[key] = (counts, total + value, count + 1)
+
+    def _samples(self) -> List[Tuple[str, Dict[str, str], float]]:
+        samples = []
+        with self._lock:
+            for key, (counts, total, count) in sorted(self._values.items()):
+                labels = dict(zip(self.labelnames, key))
+                cumulative = 0
+                for bound, bucket_count in zip(self.buckets, counts):
+                    cumulative += bucket_count
+                    samples.append((f"{self.name}_bucket", {**labels, "le": format_value(bound)}, cumulative))
+                samples.append((f"{self.name}_sum", labels, total))
+                samples.append((f"{self.name}_count", labels, count))
+        return samples
+
+######## MetricsRegistry Class ##########
+# A collector reports values kept elsewhere (e.g. the cache counters) when the metrics are scraped,
+# as a list of (name, kind, description, samples) families.
+Collector = Callable[[], List[Tuple[str, str, str, List[Sample]]]]
+
+class MetricsRegistry:
+    """Holds the metrics of the application and renders them in the Prometheus text format."""
+
+    def __init__(self):
+        self._metrics: List[Metric] = []
+        self._collectors: List[Collector] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name: str, description: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, description, labelnames))
+
+    def gauge(self, name: str, description: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, description, labelnames))
+
+    def histogram(self, name: str, description: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = STAGE_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, description, labelnames, buckets))
+
+    def add_collector(self, collector: Collector):
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for collector in self._collectors:
+            try:
+                families = collector()
+            except Exception:
+                # A failing collector must not take the other metrics down with it.
+                logging.exception("Metrics collector %s failed", getattr(collector, "__name__", collector))
+                continue
+            for name, kind, description, samples in families:
+                lines.extend(format_family(name, kind, description, ((name, labels, value) for labels, value in samples)))
+        return "\n".join(lines) + "\n"
+
+# The metrics of the application, exposed by the /metrics endpoint.
+metrics_registry = MetricsRegistry()
+
+STAGE_SECONDS = metrics_registry.histogram(
+    "edu_stage_duration_seconds",
+    "Duration of each stage of the course pipeline (extraction, parsing, validation, queues, generation, storage).",
+    ("stage",)
+)
+HTTP_REQUEST_SECONDS = metrics_registry.histogram(
+    "edu_http_request_duration_seconds", "Duration of the HTTP requests, by route and status.", ("method", "route", "status")
+)
+PROMPT_TOKENS = metrics_registry.counter(
+    "edu_prompt_tokens_total", "Prompt tokens sent to the model, by artifact.", ("artifact",)
+)
+COMPLETION_TOKENS = metrics_registry.counter(
+    "edu_completion_tokens_total", "Tokens generated by the model, by artifact.", ("artifact",)
+)
+GENERATION_SECONDS = metrics_registry.counter(
+    "edu_generation_seconds_total", "Time spent by the model generating, by artifact.", ("artifact",)
+)
+GENERATION_TOKENS_PER_SECOND = metrics_registry.histogram(
+    "edu_generation_tokens_per_second", "Generated tokens per second of each model call, by artifact.", ("artifact",),
+    buckets=TOKENS_PER_SECOND_BUCKETS
+)
+JOBS_IN_FLIGHT = metrics_registry.gauge("edu_jobs_in_flight", "Jobs running in this process, by kind.", ("kind",))
+
+######## Request Tracing ##########
+# Trace id of the request (or job) being served by the current task or thread.
+trace_id: ContextVar[Optional[str]] = ContextVar("trace_id", default=None)
+
+def trace(event: str, **fields):
+    """Logs an event of the current request when tracing is enabled."""
+    current = trace_id.get()
+    if TRACE_REQUESTS and current is not None:
+        logging.info("trace=%s event=%s %s", current, event, " ".join(f"{name}={value}" for name, value in fields.items()))
+
+@contextmanager
+def stage_timer(stage: str):
+    """Times a stage of the pipeline into the stage histogram (and the trace of the current request)."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        STAGE_SECONDS.observe(seconds, stage=stage)
+        trace("stage", stage=stage, seconds=f"{seconds:.4f}")
+
+######## Generation Metrics ##########
+def count_tokens(tokenizer, texts: List[str]) -> int:
+    """Counts the tokens of texts with the model tokenizer, or estimates them like the prompt engine without one."""
+    if tokenizer is None:
+        # Imported here, since the prompt engine depends on the model registry, which depends on the generators.
+        from prompt_templates import CHARS_PER_TOKEN
+        return sum(math.ceil(len(text) / CHARS_PER_TOKEN) for text in texts)
+    return sum(len(ids) for ids in tokenizer(texts, add_special_tokens=False)["input_ids"])
+
+def record_generation(artifact: Optional[str], tokenizer, prompts: List[str], completions: List[str], seconds: float):
+    """Records the token counts and the throughput of a model call.
+    artifact: The artifact generated (calls without one are counted as "other").
+    tokenizer: The tokenizer of the model, or None to estimate the token counts.
+    prompts: The prompts of the call.
+    completions: The generated texts, without the prompts.
+    seconds: The duration of the call.
+    """
+    artifact = artifact or "other"
+    completion_tokens = count_tokens(tokenizer, completions)
+    PROMPT_TOKENS.inc(count_tokens(tokenizer, prompts), artifact=artifact)
+    COMPLETION_TOKENS.inc(completion_tokens, artifact=artifact)
+    GENERATION_SECONDS.inc(seconds, artifact=artifact)
+    if seconds > 0:
+        GENERATION_TOKENS_PER_SECOND.observe(completion_tokens / seconds, artifact=artifact)
+    trace("generation", artifact=artifact, prompts=len(prompts), completion_tokens=completion_tokens, seconds=f"{seconds:.3f}")
@@ -0,0 +1,190 @@
+######## Imports & Initializations #########
+import os
+# Importing os to read the model configuration from the environment.
+
+import time
+# Importing time to measure how long the model takes to load.
+
+import hashlib
+# Importing hashlib to derive the deterministic output of the stub generator.
+
+import threading
+# Importing threading so concurrent first uses load the model only once.
+
+import logging
+# Importing logging to report model loading.
+
+from typing import Any, Callable, Dict, List, Optional, Union
+# Importing typing helpers for type hinting.
+
+from prefix_cache import PrefixCachingGenerator, PREFIX_CACHE_ENABLED
+# Importing the pipeline wrapper reusing the key/values of the prompt prefixes shared by a course.
+
+from assisted_decoding import with_assistant
+# Importing the wrapper decoding the assisted artifacts with the draft model, when one is configured.
+
+from cpu_inference import load_cpu_pipeline, memory_report, QUANTIZATION_NONE, QUANTIZATION_DYNAMIC_INT8
+# Importing the CPU-tuned pipeline loader (thread configuration, int8 quantization) and the memory report.
+
+###### Model Configuration ######
+# The model used for generation and the backend that loads it. The "transformers" backend accepts
+# any Hugging Face model id or local path (e.g. a tiny model for development); the "cpu" and
+# "cpu-int8" backends load it for CPU-only nodes (explicit thread pools, fp32 or dynamic int8 linear
+# layers, see cpu_inference); the "stub" backend returns deterministic text without loading any
+# model, for tests and CI.
+# The Mistral model requires export HUGGING_FACE_HUB_TOKEN="", since all powerful LLMs became gated models.
+MODEL_ID = os.environ.get("EDU_MODEL_ID", "mistralai/Mistral-7B-Instruct-v0.3")
+MODEL_BACKEND = os.environ.get("EDU_MODEL_BACKEND", "transformers")
+# When enabled, the model is loaded at application startup instead of on the first generation.
+MODEL_EAGER_LOAD = os.environ.get("EDU_MODEL_EAGER_LOAD", "0") == "1"
+
+######## Stub Generator ##########
+class StubModel:
+    def __init__(self, name_or_path: str):
+        self.name_or_path = name_or_path
+
+class StubGenerator:
+    """Deterministic stand-in for a text generation pipeline.
+
+    It accepts the same call signature as the pipeline and returns, for each prompt, a short
+    text derived from the prompt's hash, so the same prompt always yields the same output.
+    """
+
+    tokenizer = None
+
+    def __init__(self, model_id: str = "stub"):
+        self.model = StubModel(model_id)
+
+    def _complete(self, prompt: str, return_full_text: bool = True) -> str:
+        digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:12]
+        completion = f"\nTexto gerado automaticamente ({self.model.name_or_path} {digest})."
+        return prompt + completion if return_full_text else completion
+
+    def __call__(self, prompts: Union[str, List[str]], **kwargs) -> List:
+        return_full_text = kwargs.get("return_full_text", True)
+        if isinstance(prompts, str):
+            return [{"generated_text": self._complete(prompts, return_full_text)}]
+        return [[{"generated_text": self._complete(prompt, return_full_text)}] for prompt in prompts]
+
+######## Model Loaders ##########
+def load_transformers_generator(model_id: str):
+    """Loads a Hugging Face text generation pipeline, reusing shared prompt prefixes unless disabled,
+    with the draft model of assisted decoding if configured."""
+    # Imported here so that the stub backend does not require transformers at all.
+    from transformers import pipeline
+    generator = pipeline('text-generation', model=model_id)
+    return with_assistant(PrefixCachingGenerator(generator) if PREFIX_CACHE_ENABLED else generator)
+
+def load_cpu_generator(model_id: str):
+    """Loads the model for CPU inference in fp32, with the configured thread pools."""
+    generator = load_cpu_pipeline(model_id, QUANTIZATION_NONE)
+    return with_assistant(PrefixCachingGenerator(generator) if PREFIX_CACHE_ENABLED else generator)
+
+def load_cpu_int8_generator(model_id: str):
+    """Loads the model for CPU inference with its linear layers dynamically quantized to int8."""
+    generator = load_cpu_pipeline(model_id, QUANTIZATION_DYNAMIC_INT8)
+    return with_assistant(PrefixCachingGenerator(generator) if PREFIX_CACHE_ENABLED else generator)
+
+def load_stub_generator(model_id: str):
+    """Returns the deterministic stub generator."""
+    return StubGenerator(model_id)
+
+def load_transformers_tokenizer(model_id: str):
+    """Loads only the tokenizer of a Hugging Face model (a few MB), e.g. to count prompt tokens."""
+    from transformers import AutoTokenizer
+    return AutoTokenizer.from_pretrained(model_id)
+
+# Backends available to the registry, by name.
+MODEL_BACKENDS: Dict[str, Callable[[str], Any]] = {
+    "transformers": load_transformers_generator,
+    "cpu": load_cpu_generator,
+    "cpu-int8": load_cpu_int8_generator,
+    "stub": load_stub_generator,
+}
+
+# Tokenizer loaders of the backends that have one, by name (the stub backend has none).
+TOKENIZER_LOADERS: Dict[str, Callable[[str], Any]] = {
+    "transformers": load_transformers_tokenizer,
+    "cpu": load_transformers_tokenizer,
+    "cpu-int8": load_transformers_tokenizer,
+}
+
+######## ModelRegistry Class ##########
+class ModelRegistry:
+    """Loads the configured generator lazily, on first use, and reports its readiness."""
+
+    def __init__(self, model_id: str = MODEL_ID, backend: str = MODEL_BACKEND):
+        if backend not in MODEL_BACKENDS:
+            raise ValueError(f"Backend de modelo desconhecido: {backend}. Opções: {sorted(MODEL_BACKENDS)}")
+        self.model_id = model_id
+        self.backend = backend
+        self.load_seconds: Optional[float] = None
+        self.memory: Optional[Dict[str, Any]] = None
+        self.error: Optional[str] = None
+        self._generator = None
+        self._tokenizer = None
+        self._loading = False
+        self._lock = threading.Lock()
+        self._tokenizer_lock = threading.Lock()
+
+    @property
+    def ready(self) -> bool:
+        return self._generator is not None
+
+    @property
+    def identity(self) -> str:
+        """Identifies the generated outputs: the model id, prefixed by the backend unless it is transformers."""
+        return self.model_id if self.backend == "transformers" else f"{self.backend}:{self.model_id}"
+
+    def get(self):
+        """Returns the generator, loading it on the first call (blocking)."""
+        if self._generator is not None:
+            return self._generator
+        with self._lock:
+            if self._generator is None:
+                self._loading = True
+                logging.info("Loading model %s (%s backend)", self.model_id, self.backend)
+                start = time.perf_counter()
+                try:
+                    self._generator = MODEL_BACKENDS[self.backend](self.model_id)
+                except Exception as exc:
+                    self.error = str(exc)
+                    raise
+                finally:
+                    self._loading = False
+                self.load_seconds = time.perf_counter() - start
+                self.error = None
+                self.memory = memory_report(self._generator)
+                logging.info("Model %s loaded in %.1fs (weights: %s MB %s, process: %s MB)", self.model_id,
+                             self.load_seconds, self.memory["weights_mb"], self.memory["weights_by_dtype_mb"],
+                             self.memory["process_rss_mb"])
+        return self._generator
+
+    def get_tokenizer(self):
+        """Returns the tokenizer of the model, without loading the model itself (None for the stub backend)."""
+        tokenizer = getattr(self._generator, "tokenizer", None)
+        if tokenizer is not None:
+            return tokenizer
+        if self._tokenizer is None and self.backend in TOKENIZER_LOADERS:
+            with self._tokenizer_lock:
+                if self._tokenizer is None:
+                    self._tokenizer = TOKENIZER_LOADERS[self.backend](self.model_id)
+        return self._tokenizer
+
+    def status(self) -> Dict[str, Any]:
+        """Returns the configuration, readiness, load time and memory footprint of the model."""
+        return {
+            "model_id": self.model_id,
+            "backend": self.backend,
+            "identity": self.identity,
+            "ready": self.ready,
+            "loading": self._loading,
+            "load_seconds": self.load_seconds,
+            "memory": self.memory,
+            "error": self.error,
+            # Statistics of the generator wrappers: prefix reuse and assisted decoding acceptance.
+            "generator_stats": self._generator.stats() if hasattr(self._generator, "stats") else None,
+        }
+
+# The registry of the configured model, shared by the application.
+model_registry = ModelRegistry()
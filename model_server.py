@@ -0,0 +1,352 @@
+######## Imports & Initializations #########
+import os
+# Importing os to read the model server configuration from the environment and to manage its socket file.
+
+import json
+# Importing json to encode the messages exchanged with the model server.
+
+import asyncio
+# Importing asyncio to serve and multiplex the requests over the socket connections.
+
+import logging
+# Importing logging to report the connections and the failed requests.
+
+import argparse
+# Importing argparse to configure the model server from the command line.
+
+import itertools
+# Importing itertools to number the requests of a connection.
+
+from typing import Any, Callable, Dict, Optional, Tuple
+# Importing typing helpers for type hinting.
+
+from inference_worker import InferenceWorker, InferenceRequest, TextCallback, DEFAULT_MAX_QUEUE_SIZE, DEFAULT_WORKER_BATCH_SIZE
+# Importing the inference worker that batches the queued prompts, served by the model server.
+
+from model_registry import model_registry
+# Importing the registry that loads the configured model in the model server process.
+
+from metrics import metrics_registry
+# Importing the metrics of the model server process (token counts, throughput, inference queue).
+
+###### Model Server Configuration ######
+# Address of the model server shared by the API worker processes: "unix:<path>" for a Unix socket,
+# or "<host>:<port>" for a loopback TCP port. When empty, each process loads the model itself.
+MODEL_SERVER_ADDRESS = os.environ.get("EDU_MODEL_SERVER", "")
+# Maximum number of queued prompts the model server sends to the model in a single call. The prompts
+# of every API worker wait in the same queue, so its batches are larger than those of a single process.
+MODEL_SERVER_BATCH_SIZE = int(os.environ.get("EDU_MODEL_SERVER_BATCH_SIZE", "16"))
+MODEL_SERVER_MAX_QUEUE_SIZE = int(os.environ.get("EDU_MODEL_SERVER_MAX_QUEUE_SIZE", str(4 * DEFAULT_MAX_QUEUE_SIZE)))
+# Maximum number of queued prompts sent to the model in a single call by the worker of an API process
+# loading the model itself (the batch size given to the generation functions applies to plain pipelines).
+WORKER_BATCH_SIZE = int(os.environ.get("EDU_WORKER_BATCH_SIZE", str(DEFAULT_WORKER_BATCH_SIZE)))
+
+# Maximum size of a message (a prompt with its parameters, or a generated text), in bytes.
+MESSAGE_LIMIT = 16 * 1024 * 1024
+LOOPBACK_HOSTS = ("127.0.0.1", "localhost", "::1")
+
+######## Protocol ##########
+# Each message is a JSON object on a line of its own. Requests carry an "id" (unique in their
+# connection) and an "op": "generate" (with "prompt", "params" and "stream"), "warm_up", "status",
+# "metrics" or "cancel" (which has no reply). Every request gets one reply with its id and either a
+# "result" or an "error"; streamed generations are preceded by "chunk" messages with the decoded text.
+# Many requests are in flight on the same connection at once, and their replies arrive in any order.
+
+def encode_message(message: Dict[str, Any]) -> bytes:
+    return json.dumps(message, ensure_ascii=False).encode("utf-8") + b"\n"
+
+def params_from_json(params: Dict[str, Any]) -> Dict[str, Any]:
+    """Restores the tuples of the generation parameters (e.g. the stop patterns) turned into lists by JSON.
+    The worker groups the prompts by their parameters, so these must be hashable."""
+    return {key: tuple(value) if isinstance(value, list) else value for key, value in params.items()}
+
+def parse_address(address: str) -> Tuple[Optional[str], Optional[str], Optional[int]]:
+    """Parses a model server address. Returns: (socket path, None, None) or (None, host, port)."""
+    if address.startswith("unix:"):
+        return address[len("unix:"):], None, None
+    host, _, port = address.rpartition(":")
+    if not host or not port.isdigit():
+        raise ValueError(f"Endereço do servidor de modelo inválido: {address}. Use unix:<caminho> ou <host>:<porta>.")
+    return None, host.strip("[]"), int(port)
+
+async def open_connection(address: str) -> Tuple[asyncio.StreamReader, asyncio.StreamWriter]:
+    path, host, port = parse_address(address)
+    if path is not None:
+        return await asyncio.open_unix_connection(path, limit=MESSAGE_LIMIT)
+    return await asyncio.open_connection(host, port, limit=MESSAGE_LIMIT)
+
+######## ModelServer Class ##########
+class ModelServer:
+    """Serves the model of this process to the API workers, through a single InferenceWorker.
+
+    Every request received, from any connection, is submitted to the worker as soon as it arrives,
+    so the prompts of all the API workers wait in the same queue and are batched together whenever
+    the model is free: a batch starts with whatever is queued at that moment, whichever process it
+    came from. Streamed generations run one at a time, as in the worker.
+    """
+
+    def __init__(self, worker: InferenceWorker):
+        self.worker = worker
+        self.connections = 0
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.connections += 1
+        tasks: Dict[Any, asyncio.Task] = {}
+
+        def send(message: Dict[str, Any]):
+            if not writer.is_closing():
+                writer.write(encode_message(message))
+
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                message = json.loads(line)
+                if message["op"] == "cancel":
+                    task = tasks.get(message["id"])
+                    if task is not None:
+                        task.cancel()
+                    continue
+                task = asyncio.create_task(self._reply(message, send, writer))
+                tasks[message["id"]] = task
+                task.add_done_callback(lambda _, request_id=message["id"]: tasks.pop(request_id, None))
+        except (ConnectionError, ValueError) as exc:
+            logging.warning("Model server connection closed: %s", exc)
+        finally:
+            # The requests of a client that went away are no longer awaited by anyone.
+            for task in list(tasks.values()):
+                task.cancel()
+            self.connections -= 1
+            writer.close()
+
+    async def _reply(self, message: Dict[str, Any], send: Callable[[Dict[str, Any]], None], writer: asyncio.StreamWriter):
+        try:
+            result = await self._run(message, send)
+        except asyncio.CancelledError:
+            raise
+        except Exception as exc:
+            logging.exception(exc)
+            send({"id": message["id"], "error": str(exc)})
+        else:
+            send({"id": message["id"], "result": result})
+        try:
+            await writer.drain()
+        except ConnectionError:
+            pass
+
+    async def _run(self, message: Dict[str, Any], send: Callable[[Dict[str, Any]], None]) -> Any:
+        op = message["op"]
+        if op == "generate":
+            params = params_from_json(message["params"])
+            if not message.get("stream"):
+                return await self.worker.submit(message["prompt"], params)
+            loop = asyncio.get_running_loop()
+            # Called from the model thread; the chunks are sent in order, before the reply.
+            on_text = lambda text: loop.call_soon_threadsafe(send, {"id": message["id"], "chunk": text})
+            return await self.worker.submit_streamed(message["prompt"], params, on_text)
+        if op == "warm_up":
+            await self.worker.warm_up()
+            return None
+        if op == "status":
+            return self.status()
+        if op == "metrics":
+            return metrics_registry.render()
+        raise ValueError(f"Operação desconhecida no servidor de modelo: {op}")
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "model": model_registry.status(),
+            "inference_worker": {"running": self.worker.running, "queue_size": self.worker.queue_size},
+            "connections": self.connections,
+        }
+
+async def serve(address: str, batch_size: int = MODEL_SERVER_BATCH_SIZE, max_queue_size: int = MODEL_SERVER_MAX_QUEUE_SIZE):
+    """Loads the configured model and serves it on the address until cancelled."""
+    worker = InferenceWorker(
+        loader=model_registry.get, model_id=model_registry.identity, batch_size=batch_size, max_queue_size=max_queue_size
+    )
+    await worker.start()
+    # The server exists to hold the model, so it is loaded before the first connection.
+    await worker.warm_up()
+    model_server = ModelServer(worker)
+
+    path, host, port = parse_address(address)
+    if path is not None:
+        if os.path.exists(path):
+            os.remove(path)
+        server = await asyncio.start_unix_server(model_server.handle_connection, path=path, limit=MESSAGE_LIMIT)
+        # Only processes of the same user can submit prompts.
+        os.chmod(path, 0o600)
+    else:
+        if host not in LOOPBACK_HOSTS:
+            logging.warning("The model server listens on %s, which is not a loopback address; its protocol has no authentication.", host)
+        server = await asyncio.start_server(model_server.handle_connection, host=host, port=port, limit=MESSAGE_LIMIT)
+    logging.info("Model server for %s listening on %s", model_registry.identity, address)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        await worker.shutdown()
+        if path is not None and os.path.exists(path):
+            os.remove(path)
+
+######## RemoteInferenceWorker Class ##########
+class RemoteInferenceWorker(InferenceWorker):
+    """An InferenceWorker whose model runs in the model server, shared by every API worker process.
+
+    It is used like the local worker (submit, submit_streamed, warm_up), so the API processes
+    never load the model. All the requests of the process share one connection, on which they
+    are in flight at the same time; the connection is opened on start, and opened again if the
+    model server restarts (the requests in flight at that moment fail).
+    """
+
+    def __init__(self, address: str = MODEL_SERVER_ADDRESS, model_id: Optional[str] = None):
+        # Nothing of the local worker (queue, model thread, loader) is used, so its constructor is not called.
+        parse_address(address)
+        self.address = address
+        # The generation cache keys use the model identity: the configured one until the server reports its own.
+        self.model_id = model_id or model_registry.identity
+        self.model_status: Optional[Dict[str, Any]] = None
+        self._accepting = False
+        self._ids = itertools.count()
+        self._pending: Dict[int, Tuple[asyncio.Future, Optional[TextCallback]]] = {}
+        self._writer: Optional[asyncio.StreamWriter] = None
+        self._reader_task: Optional[asyncio.Task] = None
+        self._connect_lock: Optional[asyncio.Lock] = None
+
+    @property
+    def running(self) -> bool:
+        return self._accepting
+
+    @property
+    def queue_size(self) -> int:
+        # The requests sent to the model server and not answered yet.
+        return len(self._pending)
+
+    async def start(self):
+        """Connects to the model server; if it is not up yet, the connection is retried on the first request."""
+        self._accepting = True
+        self._connect_lock = asyncio.Lock()
+        try:
+            await self.refresh_status()
+        except OSError as exc:
+            logging.warning("Model server %s unreachable (%s); connecting on the first request.", self.address, exc)
+
+    async def _connection(self) -> asyncio.StreamWriter:
+        async with self._connect_lock:
+            if self._writer is None or self._writer.is_closing():
+                reader, self._writer = await open_connection(self.address)
+                self._reader_task = asyncio.create_task(self._read_replies(reader, self._writer))
+                logging.info("Connected to the model server at %s", self.address)
+            return self._writer
+
+    async def _read_replies(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        error: Exception = ConnectionError("Conexão com o servidor de modelo encerrada.")
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                message = json.loads(line)
+                pending = self._pending.get(message["id"])
+                if pending is None:
+                    continue
+                future, on_text = pending
+                if "chunk" in message:
+                    if on_text is not None:
+                        on_text(message["chunk"])
+                elif not future.done():
+                    if "error" in message:
+                        future.set_exception(RuntimeError(f"Erro no servidor de modelo: {message['error']}"))
+                    else:
+                        future.set_result(message.get("result"))
+        except (ConnectionError, ValueError) as exc:
+            error = ConnectionError(f"Conexão com o servidor de modelo perdida: {exc}")
+        finally:
+            writer.close()
+            if self._writer is writer:
+                self._writer = None
+            for future, _ in list(self._pending.values()):
+                if not future.done():
+                    future.set_exception(error)
+
+    async def _call(self, message: Dict[str, Any], on_text: Optional[TextCallback] = None) -> Any:
+        writer = await self._connection()
+        request_id = next(self._ids)
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = (future, on_text)
+        try:
+            writer.write(encode_message({**message, "id": request_id}))
+            await writer.drain()
+            return await future
+        except asyncio.CancelledError:
+            # The model server drops the request, unless its generation already started.
+            if not writer.is_closing():
+                writer.write(encode_message({"op": "cancel", "id": request_id}))
+            raise
+        finally:
+            self._pending.pop(request_id, None)
+
+    async def _enqueue(self, request: InferenceRequest) -> str:
+        if not self._accepting:
+            raise RuntimeError("O worker de inferência não está em execução.")
+        return await self._call(
+            {"op": "generate", "prompt": request.prompt, "params": request.params, "stream": request.on_text is not None},
+            request.on_text
+        )
+
+    async def warm_up(self):
+        """Asks the model server to load its model, if it has not yet."""
+        await self._call({"op": "warm_up"})
+
+    async def refresh_status(self) -> Dict[str, Any]:
+        """Fetches the status of the model server, and the identity of its model."""
+        status = await self._call({"op": "status"})
+        self.model_status = status["model"]
+        if self.model_status["identity"] != self.model_id:
+            logging.warning("The model server runs %s, not the configured %s; using its identity.",
+                            self.model_status["identity"], self.model_id)
+            self.model_id = self.model_status["identity"]
+        return status
+
+    async def metrics(self) -> str:
+        """Returns the metrics of the model server process in the Prometheus text format."""
+        return await self._call({"op": "metrics"})
+
+    async def shutdown(self, timeout: Optional[float] = None):
+        """Stops accepting requests, waits for the ones in flight and closes the connection.
+        timeout: Maximum time (in seconds) to wait for the requests in flight; the remaining ones are cancelled.
+        """
+        self._accepting = False
+        futures = [future for future, _ in self._pending.values()]
+        if futures:
+            await asyncio.wait(futures, timeout=timeout)
+        if self._writer is not None:
+            self._writer.close()
+        if self._reader_task is not None:
+            await asyncio.gather(self._reader_task, return_exceptions=True)
+            self._reader_task = None
+
+def create_inference_worker() -> InferenceWorker:
+    """Returns the worker of this process: a client of the model server when one is configured,
+    otherwise a worker loading the configured model itself."""
+    if MODEL_SERVER_ADDRESS:
+        return RemoteInferenceWorker(MODEL_SERVER_ADDRESS)
+    return InferenceWorker(loader=model_registry.get, model_id=model_registry.identity, batch_size=WORKER_BATCH_SIZE)
+
+######## Command Line Interface ##########
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Loads the configured model once and serves it to the API worker processes (set EDU_MODEL_SERVER on them)."
+    )
+    parser.add_argument("--address", default=MODEL_SERVER_ADDRESS or "unix:model_server.sock",
+                        help="unix:<path> for a Unix socket, or <host>:<port> for a loopback TCP port.")
+    parser.add_argument("--batch-size", type=int, default=MODEL_SERVER_BATCH_SIZE)
+    parser.add_argument("--max-queue-size", type=int, default=MODEL_SERVER_MAX_QUEUE_SIZE)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    try:
+        asyncio.run(serve(args.address, args.batch_size, args.max_queue_size))
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,246 @@
+######## Imports & Initializations #########
+import os
+# Importing os to read the prefix cache configuration from the environment.
+
+import copy
+# Importing copy to hand each generation its own copy of a cached prefix (generate extends it in place).
+
+from collections import OrderedDict
+# Importing OrderedDict to keep the cached prefixes in least-recently-used order.
+
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Union
+# Importing typing helpers for type hinting.
+
+from inference_worker import bind_prompt_length
+# Importing the helper starting the stop criteria after the prompt of each generate call.
+
+###### Prefix Cache Configuration ######
+# Whether the transformers backend reuses the key/values of shared prompt prefixes, the minimum
+# length (in tokens) of a prefix worth caching and the number of prefixes kept (each one holds the
+# key/values of every layer, so a few modules' worth is enough).
+PREFIX_CACHE_ENABLED = os.environ.get("EDU_PREFIX_CACHE", "1") == "1"
+PREFIX_CACHE_MIN_TOKENS = int(os.environ.get("EDU_PREFIX_CACHE_MIN_TOKENS", "32"))
+PREFIX_CACHE_ENTRIES = int(os.environ.get("EDU_PREFIX_CACHE_ENTRIES", "4"))
+
+# Pipeline arguments that model.generate does not accept.
+PIPELINE_ONLY_PARAMS = ("return_full_text", "batch_size", "clean_up_tokenization_spaces")
+
+######## Token Prefix Helpers ##########
+def common_prefix_length(first: Sequence[int], second: Sequence[int]) -> int:
+    """Returns the number of leading tokens two token sequences share."""
+    length = 0
+    for a, b in zip(first, second):
+        if a != b:
+            break
+        length += 1
+    return length
+
+def shared_prefixes(sequences: List[List[int]], min_tokens: int) -> List[Tuple[int, ...]]:
+    """Finds the prefixes shared by the token sequences of a batch.
+
+    Once sorted, sequences sharing a prefix are adjacent, so each sequence's longest shared prefix
+    is its longest common prefix with one of its neighbours.
+    sequences: The token ids of the prompts.
+    min_tokens: Minimum length of the prefixes returned.
+    Returns: The distinct shared prefixes of at least `min_tokens` tokens.
+    """
+    ordered = sorted(sequences)
+    prefixes = set()
+    for index, sequence in enumerate(ordered):
+        neighbours = ordered[max(index - 1, 0):index] + ordered[index + 1:index + 2]
+        length = max((common_prefix_length(sequence, neighbour) for neighbour in neighbours), default=0)
+        # At least one token of the prompt must remain to be encoded by generate.
+        length = min(length, len(sequence) - 1)
+        if length >= min_tokens:
+            prefixes.add(tuple(sequence[:length]))
+    return sorted(prefixes)
+
+def expand_past_key_values(past_key_values: Any, batch_size: int) -> Any:
+    """Returns a copy of the key/values of one sequence repeated for a batch (generate extends it in place).
+
+    Handles both the legacy tuples of (key, value) tensors and the transformers Cache objects.
+    """
+    if isinstance(past_key_values, tuple):
+        return tuple(
+            tuple(tensor.repeat_interleave(batch_size, dim=0) for tensor in layer) for layer in past_key_values
+        )
+    expanded = copy.deepcopy(past_key_values)
+    if batch_size > 1:
+        expanded.batch_repeat_interleave(batch_size)
+    return expanded
+
+######## PrefixKVCache Class ##########
+class PrefixKVCache:
+    """Keeps the past key/values of the most recently used prompt prefixes, keyed by their token ids."""
+
+    def __init__(self, max_entries: int = PREFIX_CACHE_ENTRIES):
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.reused_tokens = 0
+        self._entries: "OrderedDict[Tuple[int, ...], Any]" = OrderedDict()
+
+    def __contains__(self, prefix: Tuple[int, ...]) -> bool:
+        return prefix in self._entries
+
+    def use(self, prefix: Tuple[int, ...], prompts: int = 1) -> Any:
+        """Returns the key/values of a cached prefix, counting its reuse by `prompts` prompts."""
+        self._entries.move_to_end(prefix)
+        self.hits += prompts
+        self.reused_tokens += len(prefix) * prompts
+        return self._entries[prefix]
+
+    def longest_shared_prefix(self, token_ids: Sequence[int]) -> Tuple[int, ...]:
+        """Returns the longest prefix `token_ids` shares with a cached prefix, leaving at least one token."""
+        length = max((common_prefix_length(prefix, token_ids) for prefix in self._entries), default=0)
+        return tuple(token_ids[:min(length, len(token_ids) - 1)])
+
+    def store(self, prefix: Tuple[int, ...], past_key_values: Any):
+        self._entries[prefix] = past_key_values
+        self._entries.move_to_end(prefix)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "reused_tokens": self.reused_tokens,
+        }
+
+######## PrefixCachingGenerator Class ##########
+class PrefixCachingGenerator:
+    """Wraps a transformers text generation pipeline to reuse the key/values of shared prompt prefixes.
+
+    The prompts of a course share their course and module context (see content_generation), so
+    when a batch holds several prompts starting with the same tokens, that prefix is encoded once
+    and its key/values are reused by every prompt starting with it, in this batch and the next
+    ones, instead of re-encoding it for each núcleo. Prompts with the same prefix are generated
+    together, one prefix at a time, from the prefix key/values repeated for the batch, their
+    suffixes left-padded; the others go through the pipeline, batched as well.
+    It is called like the pipeline and exposes its model and tokenizer.
+    """
+
+    def __init__(
+        self,
+        pipeline,
+        min_prefix_tokens: int = PREFIX_CACHE_MIN_TOKENS,
+        max_entries: int = PREFIX_CACHE_ENTRIES
+    ):
+        self.pipeline = pipeline
+        self.min_prefix_tokens = min_prefix_tokens
+        self.cache = PrefixKVCache(max_entries)
+
+    @property
+    def model(self):
+        return self.pipeline.model
+
+    @property
+    def tokenizer(self):
+        return self.pipeline.tokenizer
+
+    def _encode(self, prompt: str) -> List[int]:
+        return self.tokenizer(prompt)["input_ids"]
+
+    def _encode_prefix(self, prefix: Tuple[int, ...]):
+        """Runs the model over a prefix and caches its key/values."""
+        # Imported here so that importing this module does not require torch.
+        import torch
+        with torch.no_grad():
+            outputs = self.model(input_ids=torch.tensor([prefix], device=self.model.device), use_cache=True)
+        self.cache.store(prefix, outputs.past_key_values)
+
+    def _generate_from_prefix(self, prompts: List[str], token_ids: List[List[int]], prefix_length: int,
+                              past_key_values: Any, params: Dict) -> List[str]:
+        """Generates a batch of prompts starting with the same cached prefix.
+
+        The prefix key/values are repeated for each prompt and the suffixes left-padded after the
+        prefix; the attention mask hides the padding, so each prompt's positions stay contiguous.
+        """
+        import torch
+        pad_token_id = self.tokenizer.pad_token_id if self.tokenizer.pad_token_id is not None else 0
+        suffix_length = max(len(ids) - prefix_length for ids in token_ids)
+        rows, masks = [], []
+        for ids in token_ids:
+            padding = suffix_length - (len(ids) - prefix_length)
+            rows.append(ids[:prefix_length] + [pad_token_id] * padding + ids[prefix_length:])
+            masks.append([1] * prefix_length + [0] * padding + [1] * (len(ids) - prefix_length))
+        input_ids = torch.tensor(rows, device=self.model.device)
+        generate_params = bind_prompt_length(
+            {key: value for key, value in params.items() if key not in PIPELINE_ONLY_PARAMS}, input_ids.shape[1]
+        )
+        with torch.no_grad():
+            # generate only encodes the tokens after the cached prefix.
+            outputs = self.model.generate(
+                input_ids=input_ids,
+                attention_mask=torch.tensor(masks, device=self.model.device),
+                past_key_values=expand_past_key_values(past_key_values, len(rows)),
+                pad_token_id=self.tokenizer.pad_token_id,
+                **generate_params
+            )
+        texts = []
+        for prompt, output in zip(prompts, outputs):
+            completion = self.tokenizer.decode(output[input_ids.shape[1]:], skip_special_tokens=True)
+            texts.append(prompt + completion if params.get("return_full_text", True) else completion)
+        return texts
+
+    def __call__(self, prompts: Union[str, List[str]], **params) -> List:
+        single = isinstance(prompts, str)
+        prompt_list = [prompts] if single else list(prompts)
+        if params.get("num_return_sequences", 1) != 1:
+            return self.pipeline(prompts, **params)
+
+        token_ids = [self._encode(prompt) for prompt in prompt_list]
+        # The prefixes shared inside the batch, and the ones shared with the cached prefixes (e.g. the
+        # module context of another artifact's prompts) are encoded once.
+        prefixes = set(shared_prefixes(token_ids, self.min_prefix_tokens))
+        for ids in token_ids:
+            prefix = self.cache.longest_shared_prefix(ids)
+            if len(prefix) >= self.min_prefix_tokens:
+                prefixes.add(prefix)
+
+        # Each prompt is generated from the longest of those prefixes it starts with.
+        texts: List[Optional[str]] = [None] * len(prompt_list)
+        uncached = []
+        groups: Dict[Tuple[int, ...], List[int]] = {}
+        for index, ids in enumerate(token_ids):
+            starts = [prefix for prefix in prefixes if len(prefix) < len(ids) and tuple(ids[:len(prefix)]) == prefix]
+            if starts:
+                groups.setdefault(max(starts, key=len), []).append(index)
+            else:
+                uncached.append(index)
+        self.cache.misses += len(uncached)
+
+        # One prefix group at a time: its prefix is encoded (if needed) right before its prompts are
+        # generated, so a batch with more prefixes than cache entries never evicts a prefix unused.
+        batch_size = params.get("batch_size") or len(prompt_list)
+        for prefix in sorted(groups):
+            indexes = groups[prefix]
+            if prefix not in self.cache:
+                self._encode_prefix(prefix)
+            past_key_values = self.cache.use(prefix, len(indexes))
+            for start in range(0, len(indexes), batch_size):
+                batch = indexes[start:start + batch_size]
+                generated = self._generate_from_prefix(
+                    [prompt_list[index] for index in batch], [token_ids[index] for index in batch],
+                    len(prefix), past_key_values, params
+                )
+                for index, text in zip(batch, generated):
+                    texts[index] = text
+
+        if uncached:
+            results = self.pipeline([prompt_list[index] for index in uncached], **params)
+            for index, result in zip(uncached, results):
+                texts[index] = result[0]['generated_text']
+
+        if single:
+            return [{'generated_text': texts[0]}]
+        return [[{'generated_text': text}] for text in texts]
+
+    def stats(self) -> Dict[str, Any]:
+        return self.cache.stats()
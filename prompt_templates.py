@@ -0,0 +1,283 @@
+######## Imports & Initializations #########
+import os
+# Importing os to locate the templates file and to read the token budgets from the environment.
+
+import re
+# Importing the regex library to split the templates file in sections.
+
+import math
+# Importing math to round up the estimated token counts.
+
+import logging
+# Importing logging to report the token count of each prompt.
+
+import threading
+# Importing threading so concurrent first uses load the templates only once.
+
+from functools import lru_cache
+# Importing lru_cache to count the tokens of the repeated texts (course and module context) only once.
+
+from string import Formatter
+# Importing Formatter to parse the template fields once, when the templates are loaded.
+
+from typing import Any, Dict, List, Optional, Tuple
+# Importing typing helpers for type hinting.
+
+from data_models import MetadadosCurso, Modulo, NucleoConceitual
+# Importing data models for course metadata, modules, and conceptual nuclei.
+
+from model_registry import model_registry
+# Importing the model registry, which provides the tokenizer of the configured model.
+
+###### Template Configuration ######
+# The templates file, with one section per prompt (see prompts.txt).
+PROMPTS_PATH = os.environ.get("EDU_PROMPTS_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "prompts.txt"))
+
+# Section prepended to every artifact prompt: the course and module context.
+PREFIX_SECTION = "course_prefix"
+
+# Fields a template may use.
+TEMPLATE_FIELDS = (
+    "codigo_nome", "area_tematica", "descricao_publico", "objetivos", "modulo_titulo", "nucleo_titulo", "conteudo"
+)
+
+# Maximum number of tokens of the whole prompt of each artifact. The núcleo content embedded in the
+# teleprompter prompt gets whatever the rest of the prompt leaves of its budget.
+PROMPT_TOKEN_BUDGETS: Dict[str, int] = {
+    "conteudo": int(os.environ.get("EDU_PROMPT_BUDGET_CONTEUDO", "1024")),
+    "video_script": int(os.environ.get("EDU_PROMPT_BUDGET_VIDEO_SCRIPT", "1024")),
+    "teleprompter_text": int(os.environ.get("EDU_PROMPT_BUDGET_TELEPROMPTER_TEXT", "2048")),
+}
+
+# Maximum number of tokens of the course fields, which are part of every prompt.
+FIELD_TOKEN_BUDGETS: Dict[str, int] = {
+    "objetivos": int(os.environ.get("EDU_PROMPT_BUDGET_OBJETIVOS", "192")),
+    "descricao_publico": int(os.environ.get("EDU_PROMPT_BUDGET_DESCRICAO_PUBLICO", "128")),
+}
+
+# Tokens per character estimate used when the backend has no tokenizer (the stub backend).
+CHARS_PER_TOKEN = 4
+
+# Marks the place of the text dropped from a field.
+TRUNCATION_MARKER = "[...]"
+
+# Section header of the templates file: a line holding [[name]].
+SECTION_PATTERN = re.compile(r"^\[\[(\w+)\]\]\s*$", re.MULTILINE)
+
+######## PromptTemplate Class ##########
+class PromptTemplate:
+    """A template compiled once: its literal parts and fields are parsed when it is loaded."""
+
+    def __init__(self, name: str, text: str):
+        self.name = name
+        self.parts: List[Tuple[str, Optional[str]]] = []
+        for literal, field, format_spec, conversion in Formatter().parse(text):
+            if field is not None and (field not in TEMPLATE_FIELDS or format_spec or conversion):
+                raise ValueError(
+                    f"Campo inválido '{{{field}}}' no template '{name}'. Campos disponíveis: {', '.join(TEMPLATE_FIELDS)}"
+                )
+            self.parts.append((literal, field))
+        self.fields = {field for _, field in self.parts if field is not None}
+
+    def render(self, values: Dict[str, str]) -> str:
+        return "".join(literal + (values[field] if field is not None else "") for literal, field in self.parts)
+
+def load_templates(path: str = PROMPTS_PATH) -> Dict[str, PromptTemplate]:
+    """Loads and compiles the templates of a templates file.
+    path: The templates file: sections starting with a [[name]] line (the lines before the first
+        section are comments).
+    Returns: The compiled templates, by section name.
+    Raises:
+        ValueError: If a template uses an unknown field, or the prefix or an artifact template is missing.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        text = f.read()
+    headers = list(SECTION_PATTERN.finditer(text))
+    templates = {}
+    for index, header in enumerate(headers):
+        end = headers[index + 1].start() if index + 1 < len(headers) else len(text)
+        templates[header.group(1)] = PromptTemplate(header.group(1), text[header.end():end].strip("\n") + "\n")
+
+    missing = {PREFIX_SECTION, *PROMPT_TOKEN_BUDGETS} - set(templates)
+    if missing:
+        raise ValueError(f"Templates ausentes em {path}: {sorted(missing)}")
+    return templates
+
+######## TokenCounter Class ##########
+class TokenCounter:
+    """Counts and truncates text in tokens of the model tokenizer, or estimates them without one."""
+
+    def __init__(self, tokenizer=None):
+        self.tokenizer = tokenizer
+        # The course and module context is counted for every núcleo, so the counts are memoized.
+        self.count = lru_cache(maxsize=4096)(self._count)
+
+    def _count(self, text: str) -> int:
+        if self.tokenizer is None:
+            return math.ceil(len(text) / CHARS_PER_TOKEN)
+        return len(self.tokenizer(text, add_special_tokens=False)["input_ids"])
+
+    def truncate(self, text: str, max_tokens: int) -> str:
+        """Keeps the first `max_tokens` tokens of a text."""
+        if max_tokens <= 0:
+            return ""
+        if self.tokenizer is None:
+            return text[:max_tokens * CHARS_PER_TOKEN]
+        token_ids = self.tokenizer(text, add_special_tokens=False)["input_ids"]
+        return self.tokenizer.decode(token_ids[:max_tokens], skip_special_tokens=True)
+
+######## Field Budgets ##########
+def fit_text(text: str, max_tokens: int, counter: TokenCounter) -> Tuple[str, bool]:
+    """Shortens a text to a token budget, keeping its outline.
+
+    The lines are kept in order while they fit; once one does not, only the markdown headings of
+    the remaining lines are kept (while they fit), so the prompt still lists every section of the
+    text. A single line larger than the budget is cut at the budget.
+    Returns: The text, and whether it was shortened.
+    """
+    if counter.count(text) <= max_tokens:
+        return text, False
+    budget = max_tokens - counter.count(TRUNCATION_MARKER) - 1
+    kept: List[str] = []
+    used = 0
+    outline = False
+    for line in text.splitlines():
+        if outline and not line.lstrip().startswith("#"):
+            continue
+        # Each line also costs its line break.
+        tokens = counter.count(line) + 1
+        if used + tokens <= budget:
+            kept.append(line)
+            used += tokens
+        elif not outline:
+            outline = True
+            if not kept:
+                kept.append(counter.truncate(line, budget - 1))
+                used = budget
+    while len(kept) > 1 and counter.count("\n".join(kept + [TRUNCATION_MARKER])) > max_tokens:
+        kept.pop()
+    return "\n".join(kept + [TRUNCATION_MARKER]), True
+
+def fit_list(items: List[str], max_tokens: int, counter: TokenCounter, separator: str = ", ") -> Tuple[str, bool]:
+    """Joins the items of a list that fit in a token budget, in order.
+    Returns: The joined items, and whether some were dropped or cut.
+    """
+    text = separator.join(items)
+    if counter.count(text) <= max_tokens:
+        return text, False
+    budget = max_tokens - counter.count(separator + TRUNCATION_MARKER)
+    kept: List[str] = []
+    for item in items:
+        if counter.count(separator.join(kept + [item])) > budget:
+            break
+        kept.append(item)
+    if not kept and items:
+        kept.append(counter.truncate(items[0], budget))
+    return separator.join(kept + [TRUNCATION_MARKER]), True
+
+######## PromptEngine Class ##########
+class PromptEngine:
+    """Renders the artifact prompts from the compiled templates, within their token budgets.
+
+    Every prompt is the course prefix followed by the artifact template. The course fields are
+    fitted to their own budgets, so the prefix stays identical for every prompt of a module; the
+    núcleo content gets what the rest of the prompt leaves of the artifact budget. The token count
+    of each rendered prompt is logged and aggregated per artifact.
+    """
+
+    def __init__(
+        self,
+        templates: Dict[str, PromptTemplate],
+        counter: TokenCounter,
+        budgets: Dict[str, int] = PROMPT_TOKEN_BUDGETS,
+        field_budgets: Dict[str, int] = FIELD_TOKEN_BUDGETS
+    ):
+        self.templates = templates
+        self.counter = counter
+        self.budgets = budgets
+        self.field_budgets = field_budgets
+        self._stats: Dict[str, Dict[str, Any]] = {}
+
+    def _record(self, name: str, tokens: int, truncated: List[str]):
+        stats = self._stats.setdefault(
+            name, {"calls": 0, "total_tokens": 0, "max_tokens": 0, "last_tokens": 0, "over_budget": 0, "truncated": {}}
+        )
+        stats["calls"] += 1
+        stats["total_tokens"] += tokens
+        stats["max_tokens"] = max(stats["max_tokens"], tokens)
+        stats["last_tokens"] = tokens
+        if tokens > self.budgets[name]:
+            stats["over_budget"] += 1
+        for field in truncated:
+            stats["truncated"][field] = stats["truncated"].get(field, 0) + 1
+
+    def render(
+        self,
+        name: str,
+        metadata: MetadadosCurso,
+        modulo: Modulo,
+        nucleo_conceitual: NucleoConceitual,
+        conteudo: Optional[str] = None
+    ) -> str:
+        """Renders the prompt of an artifact for a Nucleo Conceitual.
+        name: The artifact (a template of the templates file).
+        conteudo: The núcleo content, for the templates using it.
+        Returns: The prompt.
+        """
+        truncated = []
+        objetivos, shortened = fit_list(metadata.objetivos, self.field_budgets["objetivos"], self.counter)
+        if shortened:
+            truncated.append("objetivos")
+        descricao_publico, shortened = fit_text(metadata.descricao_publico, self.field_budgets["descricao_publico"], self.counter)
+        if shortened:
+            truncated.append("descricao_publico")
+        values = {
+            "codigo_nome": metadata.codigo_nome,
+            "area_tematica": metadata.area_tematica,
+            "descricao_publico": descricao_publico,
+            "objetivos": objetivos,
+            "modulo_titulo": modulo.titulo,
+            "nucleo_titulo": nucleo_conceitual.titulo,
+            "conteudo": "",
+        }
+
+        template = self.templates[name]
+        prefix = self.templates[PREFIX_SECTION].render(values)
+        if "conteudo" in template.fields:
+            available = self.budgets[name] - self.counter.count(prefix + template.render(values))
+            values["conteudo"], shortened = fit_text(conteudo or "", available, self.counter)
+            if shortened:
+                truncated.append("conteudo")
+
+        prompt = prefix + template.render(values)
+        tokens = self.counter.count(prompt)
+        self._record(name, tokens, truncated)
+        logging.debug("Prompt %s for núcleo '%s': %d tokens", name, nucleo_conceitual.titulo, tokens)
+        if tokens > self.budgets[name]:
+            logging.warning("Prompt %s for núcleo '%s' exceeds its budget: %d > %d tokens",
+                            name, nucleo_conceitual.titulo, tokens, self.budgets[name])
+        return prompt
+
+    def stats(self) -> Dict[str, Any]:
+        """Returns the budgets and the prompt token counts per artifact."""
+        return {
+            "tokenizer": "model" if self.counter.tokenizer is not None else "estimate",
+            "budgets": dict(self.budgets),
+            "field_budgets": dict(self.field_budgets),
+            "prompts": {
+                name: {**stats, "mean_tokens": stats["total_tokens"] / stats["calls"]}
+                for name, stats in self._stats.items()
+            },
+        }
+
+_prompt_engine: Optional[PromptEngine] = None
+_prompt_engine_lock = threading.Lock()
+
+def get_prompt_engine() -> PromptEngine:
+    """Returns the prompt engine, loading the templates and the model tokenizer on first use."""
+    global _prompt_engine
+    if _prompt_engine is None:
+        with _prompt_engine_lock:
+            if _prompt_engine is None:
+                _prompt_engine = PromptEngine(load_templates(), TokenCounter(model_registry.get_tokenizer()))
+    return _prompt_engine
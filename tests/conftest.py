@@ -0,0 +1,47 @@
+import string
+
+import pytest
+
+# Characters of the tiny test tokenizer: one token per character, so any Portuguese prompt encodes.
+TINY_CHARACTERS = string.printable + "áàâãéêíóôõúçÁÀÂÃÉÊÍÓÔÕÚÇ"
+
+def build_tiny_tokenizer():
+    """Builds a character-level tokenizer in memory, so the model tests never download anything."""
+    from tokenizers import Regex, Tokenizer, decoders, models, pre_tokenizers
+    from transformers import PreTrainedTokenizerFast
+
+    vocab = {"[PAD]": 0, "[UNK]": 1, "[EOS]": 2}
+    for character in TINY_CHARACTERS:
+        vocab.setdefault(character, len(vocab))
+    tokenizer = Tokenizer(models.WordLevel(vocab, unk_token="[UNK]"))
+    tokenizer.pre_tokenizer = pre_tokenizers.Split(Regex("(?s)."), behavior="isolated")
+    tokenizer.decoder = decoders.Fuse()
+    return PreTrainedTokenizerFast(tokenizer_object=tokenizer, pad_token="[PAD]", unk_token="[UNK]", eos_token="[EOS]")
+
+def build_tiny_model(vocab_size: int, seed: int):
+    """Builds a randomly initialized two-layer GPT-2, small enough to run on any CPU in milliseconds."""
+    import torch
+    from transformers import GPT2Config, GPT2LMHeadModel
+
+    torch.manual_seed(seed)
+    config = GPT2Config(vocab_size=vocab_size, n_positions=1024, n_embd=32, n_layer=2, n_head=2, bos_token_id=2, eos_token_id=2)
+    return GPT2LMHeadModel(config).eval()
+
+@pytest.fixture(scope="session")
+def tiny_tokenizer():
+    pytest.importorskip("torch")
+    pytest.importorskip("transformers")
+    return build_tiny_tokenizer()
+
+@pytest.fixture(scope="session")
+def tiny_pipeline(tiny_tokenizer):
+    """A text generation pipeline over the tiny model, prepared for batching like the inference worker's."""
+    from transformers import pipeline
+    from inference_worker import prepare_generator_for_batching
+
+    model = build_tiny_model(len(tiny_tokenizer), seed=0)
+    return prepare_generator_for_batching(pipeline("text-generation", model=model, tokenizer=tiny_tokenizer, device="cpu"))
+
+@pytest.fixture(scope="session")
+def tiny_draft_model(tiny_tokenizer):
+    return build_tiny_model(len(tiny_tokenizer), seed=1)
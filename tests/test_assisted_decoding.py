@@ -0,0 +1,28 @@
+from assisted_decoding import AssistedGenerator
+from inference_worker import ASSISTED_PARAM, STOP_PATTERNS_PARAM, prepare_stop_patterns
+
+PROMPT = "**Nome do Curso:** Cálculo I\n## Introdução\n"
+
+def test_assisted_call_does_not_pass_the_marker_to_generate(tiny_pipeline, tiny_draft_model):
+    generator = AssistedGenerator(tiny_pipeline, tiny_draft_model)
+    params, _ = prepare_stop_patterns(generator, {
+        "max_new_tokens": 8, "do_sample": False, "return_full_text": False,
+        ASSISTED_PARAM: "conteudo", STOP_PATTERNS_PARAM: (r"\n[ \t]*#",),
+    })
+    assert params[ASSISTED_PARAM] == "conteudo"
+
+    result = generator(PROMPT, **params)
+
+    assert isinstance(result[0]["generated_text"], str)
+    stats = generator.stats()["assisted_decoding"]["conteudo"]
+    assert stats["calls"] == 1
+    assert stats["new_tokens"] > 0
+
+def test_greedy_assisted_output_matches_the_baseline(tiny_pipeline, tiny_draft_model):
+    generator = AssistedGenerator(tiny_pipeline, tiny_draft_model)
+    params = {"max_new_tokens": 8, "do_sample": False, "return_full_text": False}
+
+    baseline = generator(PROMPT, **params)[0]["generated_text"]
+    assisted = generator(PROMPT, **params, **{ASSISTED_PARAM: "conteudo"})[0]["generated_text"]
+
+    assert assisted == baseline
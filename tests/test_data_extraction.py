@@ -0,0 +1,106 @@
+import io
+
+from docx import Document
+
+from data_extraction import ModulosParser, extract_course_metadata, extract_modulos, extract_text_from_docx
+
+# A form and a plan in the format the first parsers read: "### <n> <heading>" sections, and
+# "### <n> <module>" headings followed by "<n>.<m> <núcleo>" lines.
+FORM_TEXT = """### 1 Código e nome da disciplina
+MAT101 - Cálculo I
+### 2 Natureza
+Extensão
+### 3 Carga horária semestral
+60 horas
+### 4 Carga horária semanal
+4
+### 8 Competências
+- Calcular limites
+- Derivar funções
+### 9 Ementa
+Limites; derivadas; integrais
+### 19 Data de início
+16/07/2030
+"""
+
+PLAN_TEXT = """### 1 Limites
+1.1 Definição de limite
+1.2 Limites laterais
+### 2 Derivadas
+2.1 Regras de derivação
+2.2 Regra da cadeia
+"""
+
+def titles(modulos):
+    return [(modulo['titulo'], [nucleo['titulo'] for nucleo in modulo['nucleos_conceituais']]) for modulo in modulos]
+
+def test_form_sections_are_extracted_with_their_types():
+    metadata = extract_course_metadata(FORM_TEXT)
+    assert metadata == {
+        'codigo_nome': "MAT101 - Cálculo I",
+        'natureza': "Extensão",
+        'carga_horaria_semestral': 60,
+        'carga_horaria_semanal': 4,
+        'competencias': ["Calcular limites", "Derivar funções"],
+        'ementa': ["Limites", "derivadas", "integrais"],
+        'data_inicio': "2030-07-16",
+    }
+
+def test_headings_are_matched_regardless_of_accents_and_case():
+    metadata = extract_course_metadata("### 3 CARGA HORARIA SEMESTRAL\n45\n## Observações\nnão é uma seção\n")
+    assert metadata == {'carga_horaria_semestral': 45}
+
+def test_first_section_of_a_repeated_heading_wins():
+    metadata = extract_course_metadata("### 2 Natureza\nExtensão\n### 2 Natureza\nOutro\n")
+    assert metadata == {'natureza': "Extensão"}
+
+def test_plan_modules_and_nucleos_are_extracted_with_their_lines():
+    modulos = extract_modulos(PLAN_TEXT)
+    assert titles(modulos) == [
+        ("Limites", ["Definição de limite", "Limites laterais"]),
+        ("Derivadas", ["Regras de derivação", "Regra da cadeia"]),
+    ]
+    assert modulos[1]['linha'] == 4
+    assert modulos[1]['nucleos_conceituais'][0]['linha'] == 5
+
+def test_metadata_headings_in_a_plan_close_the_module_instead_of_opening_one():
+    text = PLAN_TEXT + "### 9 Ementa\n9.1 Não é um núcleo\n"
+    assert titles(extract_modulos(text)) == titles(extract_modulos(PLAN_TEXT))
+
+def test_form_feeds_between_pages_are_ignored():
+    text = "### 1 Limites\n1.1 Definição de limite\n\x0c1.2 Limites laterais\n\x0c### 2 Derivadas\n2.1 Regras de derivação\n"
+    assert titles(extract_modulos(text)) == [
+        ("Limites", ["Definição de limite", "Limites laterais"]),
+        ("Derivadas", ["Regras de derivação"]),
+    ]
+
+def test_plan_fed_in_pieces_matches_the_whole_text():
+    parser = ModulosParser()
+    for start in range(0, len(PLAN_TEXT), 7):
+        parser.feed(PLAN_TEXT[start:start + 7])
+    assert parser.close() == extract_modulos(PLAN_TEXT)
+
+def test_docx_form_sections_kept_in_tables_are_read():
+    document = Document()
+    document.add_paragraph("### 1 Código e nome da disciplina")
+    document.add_paragraph("MAT101 - Cálculo I")
+    table = document.add_table(rows=3, cols=2)
+    table.cell(0, 0).text = "Natureza"
+    table.cell(0, 1).text = "Extensão"
+    table.cell(1, 0).text = "Competências"
+    table.cell(1, 1).text = "Calcular limites\nDerivar funções"
+    # A merged row is read once.
+    merged = table.cell(2, 0).merge(table.cell(2, 1))
+    merged.text = "Justificativa: Base para as disciplinas seguintes."
+    buffer = io.BytesIO()
+    document.save(buffer)
+    buffer.seek(0)
+
+    metadata = extract_course_metadata(extract_text_from_docx(buffer))
+
+    assert metadata == {
+        'codigo_nome': "MAT101 - Cálculo I",
+        'natureza': "Extensão",
+        'competencias': ["Calcular limites", "Derivar funções"],
+        'justificativa': "Base para as disciplinas seguintes.",
+    }
@@ -0,0 +1,66 @@
+import os
+import time
+
+from disk_cache import DiskCache, make_cache_key
+
+VALUE = "x" * 40
+
+def age(cache: DiskCache, key: str, seconds: float):
+    """Backdates the last use of an entry, so the eviction order does not depend on the clock resolution."""
+    timestamp = time.time() - seconds
+    os.utime(cache._path(key), (timestamp, timestamp))
+
+def test_keys_depend_on_every_part():
+    assert make_cache_key("prompt", {"a": 1, "b": 2}) == make_cache_key("prompt", {"b": 2, "a": 1})
+    assert make_cache_key("prompt", 1) != make_cache_key("prompt", 2)
+
+def test_entries_written_by_another_process_are_hits(tmp_path):
+    reader = DiskCache(str(tmp_path), max_bytes=1000)
+    writer = DiskCache(str(tmp_path), max_bytes=1000)
+
+    writer.set("a", {"texto": "conteúdo"})
+
+    assert reader.get("a") == {"texto": "conteúdo"}
+    assert reader.get("b") is None
+    assert (reader.stats()["hits"], reader.stats()["misses"]) == (1, 1)
+
+def test_the_least_recently_used_entry_is_evicted(tmp_path):
+    cache = DiskCache(str(tmp_path), max_bytes=100)
+    cache.set("a", VALUE)
+    cache.set("b", VALUE)
+    age(cache, "a", 20)
+    age(cache, "b", 10)
+
+    assert cache.get("a") == VALUE
+    cache.set("c", VALUE)
+
+    assert cache.get("b") is None
+    assert cache.get("a") == VALUE and cache.get("c") == VALUE
+    assert cache.stats()["evictions"] == 1
+    assert sorted(os.listdir(tmp_path)) == ["a.json", "c.json"]
+
+def test_the_size_limit_counts_the_entries_of_every_process(tmp_path):
+    first = DiskCache(str(tmp_path), max_bytes=100)
+    second = DiskCache(str(tmp_path), max_bytes=100, sync_seconds=0)
+    first.set("a", VALUE)
+    first.set("b", VALUE)
+    age(first, "a", 20)
+    age(first, "b", 10)
+
+    second.set("c", VALUE)
+
+    assert sorted(os.listdir(tmp_path)) == ["b.json", "c.json"]
+    assert second.stats()["entries"] == 2
+    # The entry evicted by the other process is a miss here.
+    assert first.get("a") is None
+    assert first.get("b") == VALUE
+
+def test_unreadable_entries_are_discarded(tmp_path):
+    cache = DiskCache(str(tmp_path), max_bytes=1000)
+    cache.set("a", VALUE)
+    with open(cache._path("a"), "w", encoding="utf-8") as f:
+        f.write("{truncado")
+
+    assert cache.get("a") is None
+    assert not os.path.exists(cache._path("a"))
+    assert cache.stats()["entries"] == 0
@@ -0,0 +1,124 @@
+import asyncio
+
+import job_queue
+from job_queue import CANCELLED, FAILED, QUEUED, RUNNING, SUCCEEDED, JobQueue, JobStore
+
+def wait_until(condition, timeout: float = 5.0):
+    """Waits, from the event loop, until a condition holds."""
+    async def waiting():
+        while not condition():
+            await asyncio.sleep(0.01)
+    return asyncio.wait_for(waiting(), timeout)
+
+def test_each_queued_job_is_claimed_by_a_single_process(tmp_path):
+    path = str(tmp_path / "jobs.db")
+    first, second = JobStore(path), JobStore(path)
+    oldest = first.create({"course_id": "c1"})
+    newest = second.create({"course_id": "c2"})
+
+    claimed = [first.claim_next("a"), second.claim_next("b"), first.claim_next("a")]
+
+    assert [job["id"] for job in claimed[:2]] == [oldest, newest]
+    assert claimed[2] is None
+    assert claimed[0]["status"] == RUNNING and claimed[0]["owner"] == "a" and claimed[0]["attempts"] == 1
+
+def test_only_the_owner_renews_a_lease(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.db"))
+    job_id = store.create({})
+    lease = store.claim_next("a", lease_seconds=60)["lease_expires_at"]
+
+    store.renew_leases("b", [job_id], lease_seconds=600)
+    assert store.get(job_id)["lease_expires_at"] == lease
+
+    store.renew_leases("a", [job_id], lease_seconds=600)
+    assert store.get(job_id)["lease_expires_at"] > lease
+
+def test_expired_jobs_are_requeued_until_they_use_their_attempts(tmp_path):
+    store = JobStore(str(tmp_path / "jobs.db"))
+    job_id = store.create({})
+    running = store.create({})
+    store.claim_next("a", lease_seconds=-1)
+    store.claim_next("b", lease_seconds=60)
+
+    assert store.requeue_expired(max_attempts=2) == (1, 0)
+    job = store.get(job_id)
+    assert job["status"] == QUEUED and job["owner"] is None
+    assert store.get(running)["status"] == RUNNING
+
+    store.claim_next("a", lease_seconds=-1)
+    assert store.requeue_expired(max_attempts=2) == (0, 1)
+    job = store.get(job_id)
+    assert job["status"] == FAILED and job["attempts"] == 2 and job["error"]
+
+def test_failing_jobs_are_retried(tmp_path):
+    calls = []
+
+    async def handler(job_id, payload, report_progress):
+        calls.append(job_id)
+        if len(calls) == 1:
+            raise RuntimeError("falhou")
+        report_progress(1, 1)
+        return {"ok": True}
+
+    async def scenario():
+        queue = JobQueue(JobStore(str(tmp_path / "jobs.db")), handler, concurrency=1, max_attempts=2)
+        await queue.start()
+        job_id = queue.enqueue({"course_id": "c1"})
+        await wait_until(lambda: queue.store.get(job_id)["status"] == SUCCEEDED)
+        await queue.shutdown()
+        return queue.store.get(job_id)
+
+    job = asyncio.run(scenario())
+
+    assert job["attempts"] == 2 and job["result"] == {"ok": True}
+    assert (job["progress_done"], job["progress_total"]) == (1, 1)
+
+def test_shutdown_queues_the_running_jobs_again(tmp_path):
+    started = []
+
+    async def handler(job_id, payload, report_progress):
+        started.append(job_id)
+        await asyncio.sleep(60)
+
+    async def scenario():
+        queue = JobQueue(JobStore(str(tmp_path / "jobs.db")), handler, concurrency=1)
+        await queue.start()
+        job_id = queue.enqueue({})
+        await wait_until(lambda: started)
+        await queue.shutdown()
+        return queue.store.get(job_id)
+
+    job = asyncio.run(scenario())
+
+    assert job["status"] == QUEUED and job["owner"] is None
+
+def test_a_job_cancelled_through_another_process_stops_at_the_next_heartbeat(tmp_path, monkeypatch):
+    monkeypatch.setattr(job_queue, "JOB_HEARTBEAT_SECONDS", 0.05)
+    path = str(tmp_path / "jobs.db")
+    started, stopped = [], []
+
+    async def handler(job_id, payload, report_progress):
+        started.append(job_id)
+        try:
+            await asyncio.sleep(60)
+        except asyncio.CancelledError:
+            stopped.append(job_id)
+            raise
+
+    async def scenario():
+        running, other = JobQueue(JobStore(path), handler, concurrency=1), JobQueue(JobStore(path), handler)
+        await running.start()
+        job_id = running.enqueue({"course_id": "c1"})
+        await wait_until(lambda: started)
+        assert other.cancel(job_id)["status"] == CANCELLED
+        assert other.store.active_course_jobs("c1") == [job_id]
+        await wait_until(lambda: not running.stats()["running"])
+        await running.shutdown()
+        return job_id, other.store
+
+    job_id, store = asyncio.run(scenario())
+
+    assert stopped == [job_id]
+    job = store.get(job_id)
+    assert job["status"] == CANCELLED and job["owner"] is None and job["lease_expires_at"] is None
+    assert store.active_course_jobs("c1") == []
@@ -0,0 +1,60 @@
+from prefix_cache import PrefixCachingGenerator, shared_prefixes
+
+CONTEXTS = [
+    "### Materiais educacionais de um curso universitário.\n**Nome do Curso:** Cálculo I\n**Título do Módulo:** Limites\n",
+    "### Materiais educacionais de um curso universitário.\n**Nome do Curso:** Cálculo I\n**Título do Módulo:** Derivadas\n",
+    "### Materiais educacionais de um curso universitário.\n**Nome do Curso:** Física I\n**Título do Módulo:** Cinemática\n",
+]
+NUCLEOS = ["Núcleo: Definição\n", "Núcleo: Propriedades e exemplos\n"]
+PROMPTS = [context + nucleo for context in CONTEXTS for nucleo in NUCLEOS] + ["Um prompt sem contexto.\n"]
+
+class CharacterTokenizer:
+    pad_token_id = 0
+
+    def __call__(self, prompt):
+        return {"input_ids": [ord(character) for character in prompt]}
+
+class EchoPipeline:
+    """Stands in for the pipeline: the prompts it receives are the ones without a cached prefix."""
+
+    tokenizer = CharacterTokenizer()
+    model = None
+
+    def __init__(self):
+        self.prompts = []
+
+    def __call__(self, prompts, **params):
+        self.prompts.extend(prompts)
+        return [[{"generated_text": "pipeline"}] for _ in prompts]
+
+def test_shared_prefixes_leave_a_token_to_generate():
+    sequences = [[1, 2, 3, 4], [1, 2, 3, 4], [1, 2, 9]]
+    assert shared_prefixes(sequences, 2) == [(1, 2), (1, 2, 3)]
+
+def test_every_prefix_group_is_generated_with_a_cache_smaller_than_the_batch():
+    pipeline = EchoPipeline()
+    generator = PrefixCachingGenerator(pipeline, min_prefix_tokens=16, max_entries=1)
+    encoded, generated = [], []
+    generator._encode_prefix = lambda prefix: (encoded.append(prefix), generator.cache.store(prefix, object()))
+    generator._generate_from_prefix = lambda prompts, token_ids, length, past, params: (
+        generated.append(length), ["prefixed"] * len(prompts)
+    )[1]
+
+    result = generator(PROMPTS, batch_size=8)
+
+    texts = [item[0]["generated_text"] for item in result]
+    assert texts == ["prefixed"] * 6 + ["pipeline"]
+    assert pipeline.prompts == ["Um prompt sem contexto.\n"]
+    # Each module context is encoded once and used right away, despite the single cache entry.
+    assert len(encoded) == len(CONTEXTS) == len(generated)
+    assert generator.stats()["hits"] == 6
+
+def test_prefixed_generation_matches_the_plain_pipeline(tiny_pipeline):
+    generator = PrefixCachingGenerator(tiny_pipeline, min_prefix_tokens=16, max_entries=1)
+    params = {"max_new_tokens": 6, "do_sample": False, "return_full_text": False}
+    expected = [tiny_pipeline(prompt, **params)[0]["generated_text"] for prompt in PROMPTS]
+
+    result = generator(PROMPTS, batch_size=4, **params)
+
+    assert [item[0]["generated_text"] for item in result] == expected
+    assert generator.stats()["hits"] == 6
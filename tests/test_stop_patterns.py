@@ -0,0 +1,46 @@
+from content_generation import CONCLUSION_END_PATTERN, GENERATION_PARAMS, PROMPT_LABEL_PATTERN
+from inference_worker import STOP_PATTERNS_PARAM, apply_stop_patterns, stop_position
+
+TELEPROMPTER_PATTERNS = GENERATION_PARAMS['teleprompter_text'][STOP_PATTERNS_PARAM]
+CONTENT_PATTERNS = (CONCLUSION_END_PATTERN, PROMPT_LABEL_PATTERN)
+
+def test_completion_starting_with_a_heading_is_not_emptied():
+    completion = "\n# Introdução\nTexto da aula.\n# Outro tópico\nRepetição."
+    assert apply_stop_patterns(completion, "", TELEPROMPTER_PATTERNS) == "\n# Introdução\nTexto da aula."
+
+def test_completion_starting_with_blank_lines_and_a_bold_label():
+    completion = "\n\n  **Roteiro:** Olá.\n**Informações:** repetidas"
+    assert stop_position(completion, TELEPROMPTER_PATTERNS) == len("\n\n  **Roteiro:** Olá.")
+
+def test_content_is_cut_after_the_conclusion():
+    completion = "## Conceitos\nTexto.\n## Conclusão\nResumo final.\n## Exercícios\nMais texto."
+    assert apply_stop_patterns(completion, "", CONTENT_PATTERNS) == "## Conceitos\nTexto.\n## Conclusão\nResumo final."
+
+def test_echoed_prompt_is_left_untouched():
+    prompt = "**Conteúdo:**\n"
+    text = prompt + "\n# Título\nTexto."
+    assert apply_stop_patterns(text, prompt, TELEPROMPTER_PATTERNS) == text
+
+def test_blank_completion_has_no_stop():
+    assert stop_position("\n  \n", TELEPROMPTER_PATTERNS) is None
+
+def test_bold_text_inside_the_conclusion_is_kept():
+    completion = "## Conceitos\nTexto.\n## Conclusão\n**Em resumo**, vimos os conceitos.\n\n## Exercícios\nMais texto."
+    assert apply_stop_patterns(completion, "", CONTENT_PATTERNS) == (
+        "## Conceitos\nTexto.\n## Conclusão\n**Em resumo**, vimos os conceitos."
+    )
+
+def test_video_script_conclusion_with_bold_cues_is_kept():
+    completion = (
+        "## Abertura (0:00-0:30)\n**Visual:** Logo do curso.\n"
+        "## Conclusão (4:00-4:30)\n**Visual:** Apresentador.\n**Narração:** Até a próxima!\n"
+        "## Cena extra\nlixo"
+    )
+    assert apply_stop_patterns(completion, "", CONTENT_PATTERNS) == (
+        "## Abertura (0:00-0:30)\n**Visual:** Logo do curso.\n"
+        "## Conclusão (4:00-4:30)\n**Visual:** Apresentador.\n**Narração:** Até a próxima!"
+    )
+
+def test_prompt_labels_still_end_the_conclusion():
+    completion = "## Conclusão\n**Em resumo**, fim.\n**Conteúdo:** repetido"
+    assert apply_stop_patterns(completion, "", CONTENT_PATTERNS) == "## Conclusão\n**Em resumo**, fim."
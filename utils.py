@@ -2,12 +2,30 @@
 from data_models import CursoData, Modulo, NucleoConceitual
 # Importing data models representing the course data structure.
 
-from content_generation import (
-    generate_content_for_nucleo_conceitual,
-    generate_video_script,
-    generate_teleprompter_text
-)
-# Importing functions for generating educational content, video scripts, and teleprompter text.
+from content_generation import ARTIFACT_SPECS
+# Importing the declaration of the artifacts (educational content, video script and teleprompter text) generated for each conceptual nucleus.
+
+from artifact_scheduler import ArtifactScheduler, carry_over_artifacts
+# Importing the scheduler that generates the artifacts following their dependencies.
+
+from generation_cache import get_generation_cache, generation_cache_key, model_id_of
+# Importing the generation cache, so streamed artifacts are reused and stored like the batched ones.
+
+from inference_worker import TextStream, completion_of
+# Importing the token stream used to hand the generated text over as it is decoded, and the helper
+# removing the echoed prompt from a generated text.
+
+from typing import AsyncIterator, Callable, Dict, Optional, Tuple
+# Importing typing helpers for type hinting.
+
+from batch_inference import DEFAULT_BATCH_SIZE
+# Importing the default number of prompts sent to the generator in a single call.
+
+from course_storage import get_course_store
+# Importing the per-course storage, where each generated artifact is written as soon as it is ready.
+
+from metrics import stage_timer
+# Importing the stage timer, to report the time spent generating and storing the courses.
 
 import asyncio
 # Importing the asyncio module for writing asynchronous programs.
@@ -16,57 +34,144 @@ import json
 # Importing the json module for reading and writing JSON data.
 
 ####### process_and_generate_content Function #######
-async def process_and_generate_content(course_data: CursoData, generator):
+async def process_and_generate_content(
+    course_data: CursoData,
+    generator,
+    batch_size: int = DEFAULT_BATCH_SIZE,
+    use_cache: bool = True,
+    on_progress: Optional[Callable[[int, int], None]] = None,
+    course_id: Optional[str] = None
+):
     """
     Processes course data to generate content for each conceptual nucleus using the provided generator.
     Args:
         course_data (CursoData): The course data containing metadata and modules.
         generator: The text generation model or function.
+        batch_size (int): Maximum number of prompts sent to the generator in a single call.
+        use_cache (bool): Whether previously generated artifacts with the same prompt can be reused.
+        on_progress (callable): Optional callback receiving (núcleos done, total núcleos).
+        course_id (str): Id of the stored course; when given, each artifact is stored as soon as it is generated.
+    """
+    on_result = None
+    if course_id is not None:
+        on_result = lambda modulo_index, nucleo_index, artifact, text: get_course_store().save_artifact(
+            course_id, modulo_index, nucleo_index, artifact, text
+        )
+    # Content and video scripts are independent and generated together; the teleprompter texts
+    # are generated afterwards, from the content stored on each núcleo.
+    with stage_timer("generation"):
+        await ArtifactScheduler(ARTIFACT_SPECS).run(
+            course_data, generator, batch_size=batch_size, use_cache=use_cache,
+            on_result=on_result, on_progress=on_progress
+        )
+
+####### carry_over_generated_content Function #######
+def carry_over_generated_content(previous: CursoData, course_data: CursoData) -> Dict[str, int]:
+    """
+    Reuses the artifacts of the previous version of a course whose inputs did not change.
+    Args:
+        previous (CursoData): The stored version of the course, with its generated artifacts.
+        course_data (CursoData): The new version of the course, filled in place.
+    Returns:
+        dict: The number of artifacts carried over and of artifacts left to generate.
+    """
+    carried_over = carry_over_artifacts(previous, course_data, ARTIFACT_SPECS)
+    to_generate = len(ArtifactScheduler(ARTIFACT_SPECS).plan(course_data))
+    return {"carried_over": carried_over, "to_generate": to_generate}
+
+####### stream_and_generate_content Function #######
+async def stream_and_generate_content(
+    course_data: CursoData,
+    generator,
+    use_cache: bool = True,
+    course_id: Optional[str] = None
+) -> AsyncIterator[Tuple[str, Dict]]:
     """
-    for modulo in course_data.modulos:
-        for nucleo_conceitual in modulo.nucleos_conceituais:
-            # Generating educational content for each conceptual nucleus.
-            nucleo_conceitual.conteudo = await generate_content_for_nucleo_conceitual(
-                generator, course_data.metadata, modulo, nucleo_conceitual
-            )
-            # Generating a video script for each conceptual nucleus.
-            nucleo_conceitual.video_script = await generate_video_script(
-                generator, course_data.metadata, modulo, nucleo_conceitual
-            )
-            nucleo_conceitual.teleprompter_text = await generate_teleprompter_text(
-                generator, course_data.metadata, modulo, nucleo_conceitual
-            )
-    
-    # TODO: add logic to store the generated course_data
-    # Define how to save it to a database and return it in a specific format.
-    print("Course data processed and generated:")
-    print(course_data)
-
-###### store_course_data, get_course_data & store_course_feedback Functions #######
-async def store_course_data(course_data: CursoData):
+    Generates the content of each conceptual nucleus one artifact at a time, yielding the text as it is decoded.
+    Args:
+        course_data (CursoData): The course data containing metadata and modules.
+        generator: The text generation model or function (or the inference worker).
+        use_cache (bool): Whether previously generated artifacts with the same prompt can be reused.
+        course_id (str): Id of the stored course; when given, each artifact is stored as soon as it is generated.
+    Yields:
+        (event, data) pairs: "artifact_start", "token" (with the decoded "text"), "artifact_end" (with the
+        "text" stored, which the tokens add up to) and, at the end, "done".
+    """
+    cache = get_generation_cache()
+    model_id = model_id_of(generator)
+    scheduler = ArtifactScheduler(ARTIFACT_SPECS)
+    planned = scheduler.plan(course_data)
+    # The artifacts of each núcleo in dependency order: the teleprompter text comes after the content.
+    specs = [spec for level in scheduler.levels for spec in level]
+    params = {spec.name: spec.params_for(course_data) for spec in specs}
+
+    for modulo_index, modulo in enumerate(course_data.modulos):
+        for nucleo_index, nucleo_conceitual in enumerate(modulo.nucleos_conceituais):
+            for spec in specs:
+                if (modulo_index, nucleo_index, spec.name) not in planned:
+                    continue
+                event_data = {
+                    "modulo": modulo_index,
+                    "nucleo": nucleo_index,
+                    "titulo": nucleo_conceitual.titulo,
+                    "artifact": spec.name,
+                }
+                yield "artifact_start", event_data
+
+                prompt = spec.build_prompt(course_data.metadata, modulo, nucleo_conceitual)
+                key = generation_cache_key(prompt, model_id, params[spec.name])
+                text = cache.get(key) if use_cache else None
+                if text is not None:
+                    # A cached artifact is sent at once, without the echoed prompt.
+                    yield "token", {**event_data, "text": completion_of(text, prompt)}
+                else:
+                    stream = TextStream(generator, prompt, params[spec.name])
+                    async for chunk in stream:
+                        yield "token", {**event_data, "text": chunk}
+                    text = stream.text
+                    cache.set(key, text)
+
+                setattr(nucleo_conceitual, spec.name, text)
+                if course_id is not None:
+                    get_course_store().save_artifact(course_id, modulo_index, nucleo_index, spec.name, text)
+                yield "artifact_end", {**event_data, "text": completion_of(text, prompt)}
+
+    yield "done", {"artifacts": len(planned)}
+
+###### course_data_to_dict, store_course_data, get_course_data & store_course_feedback Functions #######
+def course_data_to_dict(course_data: CursoData) -> dict:
     """
-    Stores the course data in a JSON file.
+    Converts the course data to a JSON-serializable dictionary (dates become strings).
+    Args:
+        course_data (CursoData): The course data to be converted.
+    """
+    return json.loads(json.dumps(course_data.dict(), ensure_ascii=False, default=str))
+
+async def store_course_data(course_data: CursoData, course_id: Optional[str] = None) -> str:
+    """
+    Stores the course data, one row per course, module and núcleo.
     Args:
         course_data (CursoData): The course data to be stored.
+        course_id (str): Id of the course to replace; a new course is created when omitted.
+    Returns:
+        str: The course id.
     """
-    # Storing the course data in a JSON file with UTF-8 encoding and pretty printing (just for now!).
-    with open("course_data.json", "w", encoding="utf-8") as f:
-        json.dump(course_data.dict(), f, ensure_ascii=False, indent=4)
+    with stage_timer("store_course"):
+        return get_course_store().save_course(course_data, course_id)
 
-async def get_course_data():
+async def get_course_data(course_id: Optional[str] = None):
     """
-    Retrieves course data from the JSON file.
+    Retrieves course data from the storage.
+    Args:
+        course_id (str): Id of the course; the most recently created course when omitted.
     Returns:
-        CursoData: The retrieved course data.
+        CursoData: The retrieved course data, or None if the course does not exist.
     """
-    try:
-         # Reading the course data from the JSON file and returning it as a CursoData object.
-        with open("course_data.json", "r", encoding="utf-8") as f:
-            data = json.load(f)
-            return CursoData(**data)
-    except FileNotFoundError:
-        # Returning None if the JSON file is not found.
+    store = get_course_store()
+    course_id = course_id or store.latest_course_id()
+    if course_id is None:
         return None
+    return store.get_course(course_id)
 
 async def store_course_feedback(rating: int, comments: str, course_data: CursoData):
     """